@@ -1,3 +1,4 @@
 from .spider_benchmark import SpiderBenchmark
+from .microbenchmarks import MicroBenchmark
 
-__all__ = ["SpiderBenchmark"]
\ No newline at end of file
+__all__ = ["SpiderBenchmark", "MicroBenchmark"]
\ No newline at end of file
@@ -0,0 +1,88 @@
+import json
+import os
+from typing import Dict, Tuple
+
+class BenchmarkCheckpoint:
+    """
+    Append-only JSONL log of per-example benchmark records
+
+    Every record is flushed to disk as soon as it is written, so a run that
+    dies part-way can be resumed without redoing finished examples. A
+    partially written last line (from a crash mid-write) is ignored on load.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        """
+        Args:
+            path: Checkpoint file
+            resume: Keep existing records; otherwise start a fresh file
+        """
+        self.path = path
+        self.records: Dict[Tuple, Dict] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def key(record: Dict) -> Tuple:
+        """Identify a record by example, model and prompt strategy"""
+        return (record["index"], record["model"], record["strategy"])
+
+    @classmethod
+    def read(cls, path: str) -> Dict[Tuple, Dict]:
+        """
+        Read the records of a checkpoint file without changing it
+
+        Args:
+            path: Checkpoint or predictions JSONL file
+
+        Returns:
+            Records by key (the last one wins), skipping a partially written line
+        """
+        with open(path, 'r') as f:
+            return cls._parse(f.read())
+
+    @classmethod
+    def _parse(cls, content: str) -> Dict[Tuple, Dict]:
+        records = {}
+        for line in content.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[cls.key(record)] = record
+        return records
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r') as f:
+            content = f.read()
+        self.records = self._parse(content)
+
+        # Cut a partially written last line so new records start on a fresh line
+        if content and not content.endswith("\n"):
+            with open(self.path, 'r+') as f:
+                f.truncate(len(content[:content.rfind("\n") + 1].encode()))
+
+    def get(self, index: int, model: str, strategy: str):
+        """Get a finished record, or None"""
+        return self.records.get((index, model, strategy))
+
+    def append(self, record: Dict):
+        """Write a finished record and flush it to disk"""
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[self.key(record)] = record
+
+    def __len__(self):
+        return len(self.records)
@@ -0,0 +1,59 @@
+import os
+import pickle
+from typing import Dict, Tuple
+from src.database.connection import DatabaseConnection
+
+class GoldResultCache:
+    """
+    On-disk cache of gold query results for one Spider database
+
+    Results are stored per database as a pickle next to the other benchmark
+    artifacts and are invalidated when the database file changes (size or
+    modification time).
+    """
+
+    def __init__(self, cache_dir: str, db_id: str, db_path: str):
+        self.path = os.path.join(cache_dir, f"{db_id}.pkl")
+        stat = os.stat(db_path)
+        self.fingerprint = (stat.st_size, stat.st_mtime_ns)
+        self.results: Dict[str, Tuple] = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                cached = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+
+        if cached.get("fingerprint") == self.fingerprint:
+            self.results = cached["results"]
+
+    def get(self, gold_sql: str, db_conn: DatabaseConnection) -> Tuple:
+        """
+        Get the (result, error) of a gold query, executing it on a cache miss
+
+        Args:
+            gold_sql: Gold SQL
+            db_conn: Open connection to the database
+        """
+        if gold_sql not in self.results:
+            self.results[gold_sql] = db_conn.execute_query(gold_sql)
+            self.dirty = True
+        return self.results[gold_sql]
+
+    def save(self):
+        """Write the cache if anything new was executed"""
+        if not self.dirty:
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"fingerprint": self.fingerprint, "results": self.results}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
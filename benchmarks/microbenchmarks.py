@@ -0,0 +1,524 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+from config.settings import Settings
+from benchmarks import sql_normalizer
+from benchmarks.spider_benchmark import SpiderBenchmark
+from src.chain.chain_manager import ChainManager
+from src.chain.text_to_sql_chain import TextToSQLChain
+from src.database.connection import DatabaseConnection
+from src.database.profiler import ColumnProfiler
+from src.database.schema_format import SCHEMA_FORMATS
+from src.handlers.feedback_handler import FeedbackHandler
+from src.handlers.feedback_learning import FeedbackLearningSystem
+from src.llm.metered_llm import MeteredLLM
+from src.query.cost_guard import QueryCostGuard
+from src.query.executor import QueryExecutor
+from src.query.exporter import QueryExporter
+from src.query.validator import SQLValidator
+from src.utils.lazy_imports import lazy_import
+from src.utils.prompt_builder import estimate_tokens
+
+class StubLLM:
+    """Offline LLM that answers every prompt with a fixed completion"""
+
+    def __init__(self, completion: str):
+        self.completion = completion
+
+    def invoke(self, prompt: str) -> str:
+        return self.completion
+
+class MicroBenchmark:
+    """
+    Offline microbenchmarks for the non-LLM hot paths
+
+    Everything runs against temporary SQLite databases and a stubbed LLM,
+    so results measure the application's own overhead and are repeatable
+    without Ollama.
+    """
+
+    def __init__(self, result_sizes: List[int] = None, feedback_sizes: List[int] = None,
+                 repeat: int = 5, memory_rows: int = 1000000):
+        self.result_sizes = result_sizes or [10, 1000, 100000]
+        self.feedback_sizes = feedback_sizes or [10000, 100000, 1000000]
+        self.memory_rows = memory_rows
+        self.repeat = repeat
+        self.results: Dict[str, Dict] = {}
+        self.work_dir = None
+
+    def measure(self, name: str, func: Callable, number: int = 1, **info):
+        """
+        Time `func` and store per-call statistics under `name`
+
+        Args:
+            name: Benchmark name
+            func: Callable to time
+            number: Calls per timed sample (use > 1 for very fast functions)
+            info: Extra fields stored with the result (e.g., row counts)
+        """
+        func()  # warm-up
+
+        samples = []
+        for _ in range(self.repeat):
+            start_time = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start_time) / number)
+
+        self.results[name] = {
+            "min": min(samples),
+            "median": statistics.median(samples),
+            "mean": statistics.mean(samples),
+            "repeat": self.repeat,
+            "number": number,
+            **info
+        }
+        print(f"  {name:<48} median {self.results[name]['median'] * 1000:10.3f} ms")
+
+    def _create_result_table(self, db_path: str, rows: int):
+        """Add a wide table with `rows` rows to the benchmark database"""
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS measurements (
+                id INTEGER PRIMARY KEY,
+                sensor TEXT,
+                value REAL,
+                status TEXT,
+                recorded_at TEXT
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO measurements VALUES (?, ?, ?, ?, ?)",
+            (
+                (idx, f"sensor_{idx % 50}", idx * 0.5, "ok" if idx % 7 else None,
+                 f"2024-01-{idx % 28 + 1:02d}")
+                for idx in range(rows)
+            )
+        )
+        conn.commit()
+        conn.close()
+
+    def _create_feedback_db(self, path: str, rows: int) -> FeedbackHandler:
+        """Create a feedback database with `rows` feedback entries"""
+        handler = FeedbackHandler(path)
+
+        conn = sqlite3.connect(path)
+        conn.executemany(
+            "INSERT INTO feedback (question, sql_query, rating, comment, timestamp) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (f"How many employees work in department {idx}?",
+                 f"SELECT COUNT(*) FROM employees WHERE department_id = {idx}",
+                 idx % 5 + 1, None, f"2024-01-01T00:00:{idx % 60:02d}")
+                for idx in range(rows)
+            )
+        )
+        conn.executemany(
+            "INSERT INTO corrections (feedback_id, original_query, corrected_query, timestamp) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                (idx + 1, "SELECT * FROM employee", "SELECT * FROM employees",
+                 "2024-01-01T00:00:00")
+                for idx in range(0, rows, 100)
+            )
+        )
+        conn.commit()
+        conn.close()
+
+        return handler
+
+    def bench_database(self):
+        """Schema extraction and query execution at several result sizes"""
+        print("\n📦 Database")
+        db_path = os.path.join(self.work_dir, "bench.db")
+        db = DatabaseConnection(db_path)
+        self._create_result_table(db_path, max(self.result_sizes))
+        db.connect()
+
+        self.measure("database.get_schema", db.get_schema, number=100)
+        self.measure(f"profiler.compute[{max(self.result_sizes)}]",
+                     ColumnProfiler(db_path).compute, rows=max(self.result_sizes))
+        profiler = db.start_profiler(background=False)
+        self.measure("value_index.lookup",
+                     lambda: profiler.value_index.lookup("Which readings from sensor_42 are ok?"),
+                     number=1000, values=len(profiler.value_index))
+
+        for size in self.result_sizes:
+            query = f"SELECT * FROM measurements LIMIT {size}"
+            self.measure(f"database.execute_query[{size}]",
+                         lambda: db.execute_query(query), rows=size)
+
+        executor = QueryExecutor(db)
+        for size in self.result_sizes:
+            (columns, rows), _ = db.execute_query(f"SELECT * FROM measurements LIMIT {size}")
+            self.measure(f"executor.format_results[{size}]",
+                         lambda: executor.format_results(columns, rows), number=10, rows=size)
+
+        # Result comparison as done for Spider execution accuracy
+        spider = SpiderBenchmark(data_path=self.work_dir)
+        for size in self.result_sizes:
+            gold = f"SELECT * FROM measurements LIMIT {size}"
+            predicted = f"SELECT * FROM measurements WHERE id < {size} ORDER BY value DESC"
+            self.measure(f"spider.execution_match[{size}]",
+                         lambda: spider.execution_match(predicted, gold, db_path, db_conn=db),
+                         rows=size)
+
+        # Pre-execution plan check added to every query the chain runs
+        guard = QueryCostGuard(db)
+        self.measure("cost_guard.check[filter]",
+                     lambda: guard.check("SELECT * FROM measurements WHERE value > 10"), number=100)
+        self.measure("cost_guard.check[cross_join]",
+                     lambda: guard.check("SELECT * FROM measurements a, measurements b"), number=100)
+
+        db.disconnect()
+
+    def _create_wide_database(self, db_path: str, tables: int = 20, columns: int = 15):
+        """Spider-style schema: many text columns per table, tables chained by foreign keys"""
+        conn = sqlite3.connect(db_path)
+        for idx in range(tables):
+            attributes = ", ".join(f"attribute_{col} varchar(255)" for col in range(columns))
+            parent = f", parent_id INTEGER REFERENCES table_{idx - 1}(id)" if idx else ""
+            conn.execute(f"CREATE TABLE table_{idx} (id INTEGER PRIMARY KEY, {attributes}{parent})")
+        conn.commit()
+        conn.close()
+
+    def bench_schema_formats(self):
+        """Schema prompt size and rendering time per SCHEMA_FORMAT (sample and Spider databases)"""
+        print("\n🗂️  Schema formats")
+        wide_path = os.path.join(self.work_dir, "wide.db")
+        self._create_wide_database(wide_path)
+        databases = {
+            "sample": [os.path.join(self.work_dir, "formats.db")],
+            "wide": [wide_path]
+        }
+        spider_path = SpiderBenchmark(data_path=Settings.SPIDER_DATA_PATH).db_base_path
+        if os.path.isdir(spider_path):
+            databases["spider"] = [
+                os.path.join(spider_path, db_id, f"{db_id}.sqlite")
+                for db_id in sorted(os.listdir(spider_path))
+                if os.path.exists(os.path.join(spider_path, db_id, f"{db_id}.sqlite"))
+            ]
+
+        for label, paths in databases.items():
+            connections = []
+            for path in paths:
+                db = DatabaseConnection(path)
+                db.start_profiler(background=False)
+                connections.append(db)
+
+            def render(fmt):
+                for db in connections:
+                    db._schema_cache = None
+                    db.get_schema(fmt)
+
+            verbose_tokens = None
+            for fmt in SCHEMA_FORMATS:
+                tokens = sum(estimate_tokens(db.get_schema(fmt)) for db in connections)
+                verbose_tokens = verbose_tokens or tokens
+                self.measure(f"schema.render[{label},{fmt}]", lambda: render(fmt),
+                             databases=len(connections), tokens=tokens)
+                print(f"    {'~tokens':<46} {tokens:12,} ({tokens / verbose_tokens - 1:+.0%} vs verbose)")
+
+            for db in connections:
+                db.disconnect()
+
+    def measure_memory(self, name: str, func: Callable, **info):
+        """
+        Run `func` once under tracemalloc and store its time and memory under `name`
+
+        `retained_bytes` is what the returned value still holds; `peak_bytes`
+        is the high-water mark while building it.
+        """
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        value = func()
+        elapsed = time.perf_counter() - start_time
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del value
+
+        self.results[name] = {
+            "min": elapsed,
+            "median": elapsed,
+            "mean": elapsed,
+            "repeat": 1,
+            "number": 1,
+            "retained_bytes": retained,
+            "peak_bytes": peak,
+            **info
+        }
+        print(f"  {name:<48} {elapsed:8.2f} s  retained {retained / 1e6:8.1f} MB  "
+              f"peak {peak / 1e6:8.1f} MB")
+
+    def bench_result_memory(self):
+        """Row lists vs columnar results (through to a DataFrame) and streaming export"""
+        print("\n🧱 Result memory")
+        db_path = os.path.join(self.work_dir, "memory.db")
+        db = DatabaseConnection(db_path)
+        self._create_result_table(db_path, self.memory_rows)
+        db.connect()
+        pd = lazy_import("pandas")
+        query = "SELECT * FROM measurements"
+
+        def row_lists():
+            (columns, rows), _ = db.execute_query(query)
+            return rows, pd.DataFrame(rows, columns=columns)
+
+        def columnar():
+            (_, rows), _ = db.execute_query(query, columnar=True)
+            return rows, rows.to_dataframe()
+
+        self.measure_memory(f"results.rows+dataframe[{self.memory_rows}]", row_lists,
+                            rows=self.memory_rows)
+        self.measure_memory(f"results.columnar+dataframe[{self.memory_rows}]", columnar,
+                            rows=self.memory_rows)
+
+        # Streaming export should stay flat regardless of the row count
+        exporter = QueryExporter(db)
+        for fmt in ("csv", "jsonl"):
+            export_path = os.path.join(self.work_dir, f"export.{fmt}")
+            self.measure_memory(f"export.{fmt}[{self.memory_rows}]",
+                                lambda: exporter.export(query, export_path), rows=self.memory_rows)
+        db.disconnect()
+
+    def bench_validator(self):
+        """SQL validation and cleaning"""
+        print("\n🔍 Validator")
+        validator = SQLValidator()
+        simple = "SELECT name FROM employees WHERE salary > 70000"
+        complex_sql = (
+            "SELECT d.name, COUNT(e.id) AS staff, AVG(e.salary) FROM departments d "
+            "JOIN employees e ON e.department_id = d.id LEFT JOIN projects p "
+            "ON p.department_id = d.id WHERE p.status = 'active' GROUP BY d.name "
+            "HAVING COUNT(e.id) > 1 ORDER BY staff DESC LIMIT 10"
+        )
+        raw_completion = f"```sql\n-- Count staff per department\n{complex_sql}\n```"
+
+        self.measure("validator.validate_syntax[simple]",
+                     lambda: validator.validate_syntax(simple), number=200)
+        self.measure("validator.validate_syntax[complex]",
+                     lambda: validator.validate_syntax(complex_sql), number=200)
+        self.measure("validator.clean_sql",
+                     lambda: validator.clean_sql(raw_completion), number=1000)
+
+    def bench_normalizer(self):
+        """Exact-match scoring throughput (uncached, memoized and batch)"""
+        print("\n🧮 SQL normalizer")
+        templates = [
+            "SELECT count(*) FROM singer WHERE age > {n}",
+            "select T1.name as n, avg(T2.age) AS a from singer AS T1 join concert t2 "
+            "on t1.id = t2.sid where t1.year = {n} group by t1.name;",
+            "SELECT name FROM employees -- top earners\n WHERE salary >= {n} ORDER BY name",
+            "SELECT a , b FROM t WHERE c < (SELECT max(d) FROM u WHERE e = {n})",
+        ]
+        # Spider-like workload: few distinct gold queries, each scored many times
+        gold = [template.format(n=idx) for idx in range(50) for template in templates]
+        pairs = [(sql.lower(), sql) for sql in gold] * 10
+        sqls = [sql for pair in pairs for sql in pair]
+
+        def uncached():
+            for sql in sqls:
+                sql_normalizer.remove_aliases(sql_normalizer.normalize_sql(sql))
+
+        self.measure("normalizer.normalize[uncached]", uncached, sqls=len(sqls))
+        self.measure("normalizer.normalize_batch[memoized]",
+                     lambda: sql_normalizer.normalize_batch(sqls), number=10, sqls=len(sqls))
+        self.measure("normalizer.exact_match_batch[memoized]",
+                     lambda: sql_normalizer.exact_match_batch(pairs), number=10, pairs=len(pairs))
+
+        for name in ("normalizer.normalize[uncached]", "normalizer.normalize_batch[memoized]"):
+            self.results[name]["sqls_per_second"] = len(sqls) / self.results[name]["median"]
+            print(f"    {name:<46} {self.results[name]['sqls_per_second']:12,.0f} SQL/s")
+
+    def bench_feedback(self):
+        """Feedback lookups used on every generation"""
+        print("\n📝 Feedback lookups")
+        for size in self.feedback_sizes:
+            path = os.path.join(self.work_dir, f"feedback_{size}.db")
+            handler = self._create_feedback_db(path, size)
+
+            self.measure(f"feedback.has_learning_data[{size}]",
+                         handler.has_learning_data, rows=size)
+            self.measure(f"feedback.get_similar_queries[{size}]",
+                         lambda: handler.get_similar_queries("How many employees work there?"),
+                         rows=size)
+            self.measure(f"feedback.get_positive_examples[{size}]",
+                         handler.get_positive_examples, rows=size)
+            self.measure(f"feedback.get_corrected_examples[{size}]",
+                         handler.get_corrected_examples, rows=size)
+
+            os.remove(path)
+
+    def bench_chain(self):
+        """Full TextToSQLChain.run with a stubbed LLM"""
+        print("\n⚙️  Chain")
+        db_path = os.path.join(self.work_dir, "chain.db")
+        feedback_path = os.path.join(self.work_dir, "chain_feedback.db")
+
+        chain = TextToSQLChain(db_path=db_path)
+        chain.generator.llm = MeteredLLM(StubLLM("SELECT COUNT(*) FROM employees"), "stub")
+        chain.generator.learning_system = FeedbackLearningSystem(
+            self._create_feedback_db(feedback_path, 1000)
+        )
+        chain.summarizer.llm = MeteredLLM(StubLLM("There are 7 employees."), "stub")
+
+        self.measure("chain.run",
+                     lambda: chain.run("How many employees are there?"), number=20)
+        self.measure("chain.run[no_feedback]",
+                     lambda: chain.run("How many employees are there?",
+                                       use_feedback_learning=False), number=20)
+        chain.close()
+
+    def bench_chain_manager(self, databases: int = 10):
+        """Switching between databases: a new chain per request vs the ChainManager LRU"""
+        print("\n🔀 Chain manager")
+        database_dir = os.path.join(self.work_dir, "tenants")
+        db_ids = [f"tenant_{idx}" for idx in range(databases)]
+        for db_id in db_ids:
+            DatabaseConnection(os.path.join(database_dir, f"{db_id}.db"))
+
+        def cold():
+            for db_id in db_ids:
+                chain = TextToSQLChain(db_path=os.path.join(database_dir, f"{db_id}.db"))
+                chain.get_schema_hints("How many employees work in Engineering?")
+                chain.close()
+
+        manager = ChainManager(database_dir=database_dir,
+                               feedback_dir=os.path.join(self.work_dir, "tenant_feedback"))
+
+        def warm():
+            for db_id in db_ids:
+                with manager.chain(db_id) as chain:
+                    chain.get_schema_hints("How many employees work in Engineering?")
+
+        self.measure(f"chain_manager.switch[cold,{databases}]", cold, databases=databases)
+        self.measure(f"chain_manager.switch[warm,{databases}]", warm, databases=databases)
+        manager.close()
+
+    def run(self) -> Dict:
+        """
+        Run all microbenchmarks
+
+        Returns:
+            Machine-readable report with environment info and per-benchmark timings
+        """
+        print("=" * 70)
+        print("OFFLINE MICROBENCHMARKS")
+        print("=" * 70)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            self.work_dir = work_dir
+            self.bench_database()
+            self.bench_schema_formats()
+            self.bench_result_memory()
+            self.bench_validator()
+            self.bench_normalizer()
+            self.bench_feedback()
+            self.bench_chain()
+            self.bench_chain_manager()
+            self.work_dir = None
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": self.results
+        }
+
+def compare_with_baseline(report: Dict, baseline: Dict, threshold: float = 0.10) -> Dict:
+    """
+    Compare median timings against a saved baseline report
+
+    Args:
+        report: Current report from MicroBenchmark.run
+        baseline: Previously saved report
+        threshold: Relative slowdown that counts as a regression (0.10 = 10%)
+
+    Returns:
+        Dictionary mapping benchmark name to baseline/current medians, ratio and status
+    """
+    comparison = {}
+
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            comparison[name] = {"current": current["median"], "status": "new"}
+            continue
+
+        ratio = current["median"] / previous["median"] if previous["median"] else float("inf")
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "unchanged"
+
+        comparison[name] = {
+            "baseline": previous["median"],
+            "current": current["median"],
+            "ratio": ratio,
+            "status": status
+        }
+
+    return comparison
+
+def print_comparison(comparison: Dict):
+    """Print a baseline comparison table"""
+    print("\n" + "=" * 70)
+    print("COMPARISON WITH BASELINE")
+    print("=" * 70)
+
+    icons = {"regression": "❌", "improvement": "✅", "unchanged": "  ", "new": "🆕"}
+    for name, entry in comparison.items():
+        ratio = f"{entry['ratio']:.2f}x" if "ratio" in entry else "-"
+        print(f"{icons[entry['status']]} {name:<48} {ratio:>8}  {entry['status']}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run offline microbenchmarks (no Ollama needed)')
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON report to this path')
+    parser.add_argument('--baseline', type=str, default=None, help='Compare against a saved JSON report')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative slowdown reported as a regression (default: 0.10)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed samples per benchmark (default: 5)')
+    parser.add_argument('--quick', action='store_true',
+                        help='Use small sizes (feedback: 10k rows, results: up to 10k rows, memory: 100k rows)')
+
+    args = parser.parse_args()
+
+    if args.quick:
+        benchmark = MicroBenchmark([10, 1000, 10000], [10000], repeat=args.repeat,
+                                   memory_rows=100000)
+    else:
+        benchmark = MicroBenchmark(repeat=args.repeat)
+
+    report = benchmark.run()
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        report["comparison"] = compare_with_baseline(report, baseline, args.threshold)
+        print_comparison(report["comparison"])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,238 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import json
+import os
+import statistics
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from config.settings import Settings
+from src.chain.text_to_sql_chain import TextToSQLChain
+from src.llm.metered_llm import MeteredLLM
+from src.utils.metrics import nearest_rank
+from src.utils.prompts import PromptTemplates
+
+QUESTIONS = [
+    "How many employees are there?",
+    "Show the top 5 highest paid employees",
+    "What is the average salary by department?",
+    "List all projects in the Engineering department",
+    "Which employees were hired after 2020?",
+    "What is the total budget of all departments?",
+    "Which projects are still active?",
+    "Who is the highest paid employee in Sales?",
+    "How many projects does each department have?",
+    "List employees and the names of their departments"
+]
+
+class LegacyPromptTemplates(PromptTemplates):
+    """The prompt layout before prefix-stable prompts: question and error text before or inside the instructions"""
+
+    SQL_GENERATION_PROMPT = """You are a SQL expert. Given a database schema and a natural language question, generate a valid SQL query.
+
+Database Schema:
+{schema}
+
+Question: {question}
+
+Important rules:
+- Return ONLY the SQL query, nothing else
+- Use proper SQL syntax for SQLite
+- Match table and column names exactly as shown in the schema
+- Use appropriate JOINs when needed
+- Add WHERE clauses for filtering
+- Use GROUP BY for aggregations
+- Return SELECT statements only
+
+SQL Query:"""
+
+    SUMMARIZATION_PROMPT = """Given a SQL query and its results, provide a natural language summary.
+
+Question: {question}
+SQL Query: {sql_query}
+Results: {results}
+
+Provide a clear, concise summary of the results in natural language that directly answers the original question."""
+
+    ERROR_CORRECTION_PROMPT = """The following SQL query has an error:
+
+SQL Query: {sql_query}
+Error: {error}
+
+Database Schema:
+{schema}
+
+Generate a corrected SQL query that fixes this error. Return ONLY the corrected SQL query, nothing else."""
+
+    CHAIN_OF_THOUGHT_PROMPT = """You are a SQL expert. Let's think step by step.
+
+Database Schema:
+{schema}
+
+Question: {question}
+
+First, let's break down what we need to do:
+1. Identify which tables are needed
+2. Determine what columns to select
+3. Decide if JOINs are needed
+4. Consider any filters (WHERE clauses)
+5. Think about aggregations or sorting
+
+Now generate the SQL query. Return ONLY the final SQL query."""
+
+LAYOUTS = {"legacy": LegacyPromptTemplates, "stable": PromptTemplates}
+
+class StubLLM:
+    """Offline LLM that answers every prompt with a fixed completion"""
+
+    def __init__(self, completion: str):
+        self.completion = completion
+
+    def invoke(self, prompt: str) -> str:
+        return self.completion
+
+class PromptRecorder:
+    """Pass calls through to a MeteredLLM and keep (model, stage, prompt, metrics) of each"""
+
+    def __init__(self, llm: MeteredLLM, calls: List[Tuple[str, str, str, Dict]]):
+        self.llm = llm
+        self.calls = calls
+
+    def invoke_with_metrics(self, prompt: str, stage: str = "default"):
+        text, call_metrics = self.llm.invoke_with_metrics(prompt, stage)
+        self.calls.append((self.llm.model_name, stage, prompt, call_metrics))
+        return text, call_metrics
+
+    def stream_with_metrics(self, prompt: str, stage: str = "default", until=None):
+        text, call_metrics = self.llm.stream_with_metrics(prompt, stage, until)
+        self.calls.append((self.llm.model_name, stage, prompt, call_metrics))
+        return text, call_metrics
+
+def reusable_prefix(prompt: str, previous: List[str]) -> int:
+    """Longest prefix (in characters) `prompt` shares with an earlier prompt"""
+    return max((len(os.path.commonprefix([prompt, earlier])) for earlier in previous), default=0)
+
+def run_layout(layout: str, questions: List[str], live: bool, model_name: str = None,
+               use_chain_of_thought: bool = False, db_path: str = None) -> Dict:
+    """
+    Run the questions through the chain with one prompt layout
+
+    Args:
+        layout: 'legacy' or 'stable'
+        questions: Questions asked in order
+        live: Call Ollama (and report TTFT) instead of a stubbed LLM
+        model_name: Ollama model
+        use_chain_of_thought: Use the chain-of-thought prompt
+        db_path: Database (defaults to a fresh sample database)
+
+    Returns:
+        Statistics of the SQL generation calls after the first: mean share and
+        estimated tokens of the prompt shared as prefix with the previous call
+        on the same model, the mean share shared with any earlier prompt, and
+        when live, TTFT and the prompt tokens Ollama actually evaluated
+
+    With OLLAMA_NUM_PARALLEL=1 a loaded model has one KV cache, holding the
+    previous request on that model, so a summarization call between two
+    generations evicts the schema prefix. The previous-call figure models
+    that; the any-earlier figure is the upper bound reached only with enough
+    parallel slots (or a separate summarization model) to keep every prefix.
+    """
+    calls = []
+    chain = TextToSQLChain(db_path=db_path, model_name=model_name)
+    chain.generator.prompt_templates = LAYOUTS[layout]()
+    chain.summarizer.prompt_templates = LAYOUTS[layout]()
+    if not live:
+        chain.generator.llm = MeteredLLM(StubLLM("SELECT COUNT(*) FROM employees"), "stub")
+        chain.summarizer.llm = MeteredLLM(StubLLM("There are 7 employees."), "stub")
+    chain.generator.llm = PromptRecorder(chain.generator.llm, calls)
+    chain.summarizer.llm = PromptRecorder(chain.summarizer.llm, calls)
+
+    for question in questions:
+        chain.run(question, use_chain_of_thought=use_chain_of_thought, use_feedback_learning=False)
+    chain.close()
+
+    prompts, last_prompt, reused, any_reused, ttfts, evaluated = [], {}, [], [], [], []
+    for model, stage, prompt, call_metrics in calls:
+        if stage == "sql_generation":
+            previous = [last_prompt[model]] if model in last_prompt else []
+            reused.append((reusable_prefix(prompt, previous), len(prompt)))
+            any_reused.append(reusable_prefix(prompt, prompts) / len(prompt))
+            if call_metrics.get("ttft") is not None:
+                ttfts.append(call_metrics["ttft"])
+            if call_metrics.get("prompt_tokens") is not None:
+                evaluated.append(call_metrics["prompt_tokens"])
+        prompts.append(prompt)
+        last_prompt[model] = prompt
+
+    # The first request always pays the full prefill
+    warm_reused = reused[1:] or reused
+    warm_any_reused = any_reused[1:] or any_reused
+    warm_ttfts = sorted(ttfts[1:] or ttfts)
+    warm_evaluated = evaluated[1:] or evaluated
+    return {
+        "layout": layout,
+        "requests": len(reused),
+        "prefix_reuse_mean": statistics.mean(chars / length for chars, length in warm_reused),
+        "prefix_reuse_any_mean": statistics.mean(warm_any_reused),
+        "reusable_tokens_mean": statistics.mean(chars for chars, _ in warm_reused) / Settings.CHARS_PER_TOKEN,
+        "prompt_tokens_mean": statistics.mean(length for _, length in warm_reused) / Settings.CHARS_PER_TOKEN,
+        "ttft_first": ttfts[0] if ttfts else None,
+        "ttft_p50": nearest_rank(warm_ttfts, 50) if warm_ttfts else None,
+        "ttft_p95": nearest_rank(warm_ttfts, 95) if warm_ttfts else None,
+        "evaluated_prompt_tokens_mean": statistics.mean(warm_evaluated) if warm_evaluated else None
+    }
+
+def print_results(results: List[Dict]):
+    def fmt(value: Optional[float], spec: str) -> str:
+        return "-" if value is None else format(value, spec)
+
+    print(f"{'layout':<8} {'reqs':>5} {'~prompt tok':>12} {'prefix reuse':>13} {'~reused tok':>12} "
+          f"{'any-slot reuse':>15} {'TTFT first':>11} {'TTFT p50':>9} {'TTFT p95':>9} {'eval tok':>9}")
+    for result in results:
+        print(f"{result['layout']:<8} {result['requests']:>5} "
+              f"{fmt(result['prompt_tokens_mean'], '.0f'):>12} "
+              f"{fmt(result['prefix_reuse_mean'], '.1%'):>13} "
+              f"{fmt(result['reusable_tokens_mean'], '.0f'):>12} "
+              f"{fmt(result['prefix_reuse_any_mean'], '.1%'):>15} "
+              f"{fmt(result['ttft_first'], '.3f'):>11} {fmt(result['ttft_p50'], '.3f'):>9} "
+              f"{fmt(result['ttft_p95'], '.3f'):>9} "
+              f"{fmt(result['evaluated_prompt_tokens_mean'], '.0f'):>9}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Compare prompt layouts by reusable prompt prefix (offline) and TTFT (--live)'
+    )
+    parser.add_argument('--live', action='store_true',
+                        help='Call Ollama and report TTFT and evaluated prompt tokens')
+    parser.add_argument('--model', type=str, default=None, help='Model name to use (default: llama3)')
+    parser.add_argument('--layouts', nargs='+', default=list(LAYOUTS), choices=list(LAYOUTS),
+                        help='Prompt layouts to compare (default: legacy stable)')
+    parser.add_argument('--chain-of-thought', action='store_true', help='Use chain-of-thought prompting')
+    parser.add_argument('--db-path', type=str, default=None,
+                        help='Database to ask the questions against (default: a fresh sample database)')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this path')
+
+    args = parser.parse_args()
+
+    # Same schema annotations for every layout
+    Settings.COLUMN_PROFILE_BACKGROUND = False
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = args.db_path or os.path.join(work_dir, "sample.db")
+        results = [
+            run_layout(layout, QUESTIONS, args.live, args.model, args.chain_of_thought, db_path)
+            for layout in args.layouts
+        ]
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
@@ -0,0 +1,73 @@
+import re
+from collections import Counter
+from itertools import zip_longest
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+# Floats are compared after rounding to this many decimal places, so
+# aggregates computed in a different order (SUM, AVG) still match
+FLOAT_DIGITS = 6
+
+_ORDER_BY = re.compile(r'\bORDER\s+BY\b', flags=re.IGNORECASE)
+
+_MISSING = object()
+
+def is_order_sensitive(sql: str) -> bool:
+    """Check if a query's row order is part of its answer (it has ORDER BY)"""
+    return bool(_ORDER_BY.search(sql))
+
+def canonical_row(row: Sequence, float_digits: int = FLOAT_DIGITS) -> Tuple:
+    """
+    Make a hashable, comparable form of a result row
+
+    Floats are rounded; NULLs and mixed types need no special handling
+    because rows are only hashed and compared for equality, never sorted.
+    """
+    return tuple(
+        round(value, float_digits) if isinstance(value, float) else value
+        for value in row
+    )
+
+def batched(rows: List, batch_size: int) -> Iterator[List]:
+    """Split already materialized rows (e.g. cached gold results) into batches"""
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+def results_match(predicted_batches: Iterable[List], gold_batches: Iterable[List],
+                  ordered: bool = False, float_digits: int = FLOAT_DIGITS) -> bool:
+    """
+    Compare two streamed result sets
+
+    Unordered results are compared as multisets: gold rows increment and
+    predicted rows decrement a counter of canonical rows, which must end at
+    zero. Both streams are read in lockstep, so a result of a different size
+    is rejected as soon as one stream runs out, without reading the rest.
+    Ordered results are compared row by row and stop at the first difference.
+
+    Args:
+        predicted_batches: Batches of predicted rows
+        gold_batches: Batches of gold rows (same batch size as predicted)
+        ordered: Row order matters (gold query has ORDER BY)
+        float_digits: Decimal places floats are rounded to
+    """
+    if ordered:
+        predicted_rows = (row for batch in predicted_batches for row in batch)
+        gold_rows = (row for batch in gold_batches for row in batch)
+        for predicted, gold in zip_longest(predicted_rows, gold_rows, fillvalue=_MISSING):
+            if predicted is _MISSING or gold is _MISSING:
+                return False
+            if canonical_row(predicted, float_digits) != canonical_row(gold, float_digits):
+                return False
+        return True
+
+    counts = Counter()
+
+    for predicted, gold in zip_longest(predicted_batches, gold_batches, fillvalue=_MISSING):
+        # With equal batch sizes only the last batches can be short, so a
+        # length difference (or one side running out) means the sizes differ
+        if predicted is _MISSING or gold is _MISSING or len(predicted) != len(gold):
+            return False
+
+        counts.update(canonical_row(row, float_digits) for row in gold)
+        counts.subtract(canonical_row(row, float_digits) for row in predicted)
+
+    return not any(counts.values())
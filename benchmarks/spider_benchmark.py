@@ -5,11 +5,23 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import csv
 import json
 import os
+from datetime import datetime
 from typing import List, Dict
+from config.settings import Settings
+from src.chain.chain_manager import ChainManager
 from src.chain.text_to_sql_chain import TextToSQLChain
 from src.database.connection import DatabaseConnection
+from src.database.schema_format import SCHEMA_FORMATS
+from src.llm.llm_factory import LLMFactory
+from src.utils.metrics import nearest_rank
+from benchmarks import sql_normalizer
+from benchmarks.checkpoint import BenchmarkCheckpoint
+from benchmarks.gold_cache import GoldResultCache
+from benchmarks.result_compare import batched, is_order_sensitive, results_match
+from concurrent.futures import ProcessPoolExecutor
 import time
 
 class SpiderBenchmark:
@@ -56,127 +68,331 @@ class SpiderBenchmark:
         Normalize SQL for comparison by removing irrelevant differences
         while preserving semantic meaning
         """
-        import re
-        
-        # Convert to uppercase
-        sql = sql.upper()
-        
-        # Remove comments
-        sql = re.sub(r'--[^\n]*', '', sql)
-        sql = re.sub(r'/\*.*?\*/', '', sql, flags=re.DOTALL)
-        
-        # Remove trailing semicolons
-        sql = sql.rstrip(';').strip()
-        
-        # Normalize whitespace (including newlines and tabs)
-        sql = ' '.join(sql.split())
-        
-        # Remove AS keyword for aliases
-        sql = re.sub(r'\bAS\s+', '', sql)
-        
-        # Remove table prefixes from columns (e.g., "s.Name" -> "Name", "T1.id" -> "id")
-        sql = re.sub(r'\b[A-Z]\d*\.', '', sql)  # Matches s., t1., T2., etc.
-        
-        # Normalize COUNT(*) 
-        sql = re.sub(r'COUNT\s*\(\s*\*\s*\)', 'COUNT(*)', sql)
-        
-        # DON'T remove spaces around operators yet - we need them for alias detection
-        # Just normalize multiple spaces to single space
-        sql = ' '.join(sql.split())
-        
-        return sql.strip()
+        return sql_normalizer.normalize_sql(sql)
     
     def remove_aliases(self, sql: str) -> str:
         """
         Remove column and table aliases from normalized SQL
         """
-        import re
+        return sql_normalizer.remove_aliases(sql)
+    
+    def exact_match(self, predicted: str, gold: str) -> bool:
+        """
+        Check if predicted SQL matches gold SQL after normalization.
+        This checks structural equivalence, not just string equality.
+        Normalized forms are memoized, so repeated gold queries are cheap.
+        """
+        return sql_normalizer.exact_match(predicted, gold)
+    
+    def execution_match(self, predicted: str, gold: str, db_path: str,
+                        db_conn: DatabaseConnection = None, gold_result=None) -> bool:
+        """
+        Check if predicted SQL produces same results as gold SQL
         
-        # Remove column aliases in SELECT clause
-        # Work with the SELECT clause between SELECT and FROM
-        select_match = re.search(r'SELECT\s+(.*?)\s+FROM', sql)
-        if select_match:
-            select_clause = select_match.group(1)
+        Args:
+            predicted: Predicted SQL
+            gold: Gold SQL
+            db_path: Database to run both queries on
+            db_conn: Open connection to reuse (left open)
+            gold_result: Precomputed (result, error) of the gold query
+        """
+        owns_connection = db_conn is None
+        try:
+            # Create connection to specific database
+            if owns_connection:
+                db_conn = DatabaseConnection(db_path)
+                db_conn.connect()
             
-            # Remove aliases after functions: "FUNCTION(...) ALIAS" -> "FUNCTION(...)"
-            # This handles COUNT(*) TOTAL, AVG(AGE) AVG_AGE, etc.
-            select_clause = re.sub(r'\)\s+[A-Z_0-9]+(?=\s*(,|$))', ')', select_clause)
+            batch_size = Settings.QUERY_FETCH_BATCH_SIZE
+            try:
+                _, pred_batches = db_conn.iter_query(predicted, batch_size)
+            except Exception:
+                return False
             
-            # Also handle simple column aliases: "COLUMN_NAME ALIAS" -> "COLUMN_NAME"
-            # But be careful not to remove function names
-            select_clause = re.sub(r'\b([A-Z_0-9]+)\s+[A-Z_0-9]+(?=\s*(,|$))(?!\()', r'\1', select_clause)
+            if gold_result is None:
+                try:
+                    _, gold_batches = db_conn.iter_query(gold, batch_size)
+                except Exception:
+                    return False
+            else:
+                gold_result, gold_error = gold_result
+                if gold_error:
+                    return False
+                gold_batches = batched(gold_result[1], batch_size)
             
-            sql = sql.replace(select_match.group(1), select_clause)
-        
-        # Remove table aliases (FROM table alias -> FROM table)
-        sql = re.sub(r'(FROM|JOIN)\s+([A-Z_]+)\s+[A-Z]\d*\b', r'\1 \2', sql)
-        
-        # Now normalize spacing around operators for final comparison
-        sql = re.sub(r'\s*\(\s*', ' (', sql)
-        sql = re.sub(r'\s*\)\s*', ') ', sql)
-        sql = re.sub(r'\s*,\s*', ', ', sql)
-        sql = re.sub(r'\s*=\s*', ' = ', sql)
-        sql = re.sub(r'\s*<\s*', ' < ', sql)
-        sql = re.sub(r'\s*>\s*', ' > ', sql)
-        
-        # Normalize spaces
-        sql = ' '.join(sql.split())
-        
-        return sql
+            # Stream both results into a multiset (or compare in order when
+            # the gold query has ORDER BY); NULLs and mixed types never get sorted
+            return results_match(pred_batches, gold_batches, ordered=is_order_sensitive(gold))
+            
+        except Exception as e:
+            print(f"    Execution error: {str(e)}")
+            return False
+        finally:
+            if owns_connection and db_conn is not None:
+                db_conn.disconnect()
     
-    def exact_match(self, predicted: str, gold: str) -> bool:
+    # Prompt strategies as (use_few_shot, use_chain_of_thought)
+    STRATEGIES = {
+        "zero_shot": (False, False),
+        "few_shot": (True, False),
+        "chain_of_thought": (False, True)
+    }
+    
+    @staticmethod
+    def strategy_name(use_few_shot: bool = False, use_chain_of_thought: bool = False) -> str:
+        """Name of the prompt strategy (chain-of-thought takes precedence, as in QueryGenerator)"""
+        if use_chain_of_thought:
+            return "chain_of_thought"
+        if use_few_shot:
+            return "few_shot"
+        return "zero_shot"
+    
+    def evaluate_example(self, idx: int, example: Dict, total: int,
+                         use_few_shot: bool = False, use_chain_of_thought: bool = False,
+                         model_name: str = None, chain: TextToSQLChain = None,
+                         gold_result=None) -> Dict:
         """
-        Check if predicted SQL matches gold SQL after normalization.
-        This checks structural equivalence, not just string equality.
+        Generate and score SQL for one example
+        
+        Args:
+            idx: Example index in the dataset
+            example: Spider example
+            total: Number of examples in the run (for progress output)
+            use_few_shot: Use few-shot prompting
+            use_chain_of_thought: Use chain-of-thought prompting
+            model_name: Model to use (defaults to the benchmark's model)
+            chain: Warm chain for this example's database to reuse (left open)
+            gold_result: Precomputed (result, error) of the gold query
+            
+        Returns:
+            Per-example record with scores, latency, attempts, tokens and stage times
         """
-        pred_norm = self.normalize_sql(predicted)
-        gold_norm = self.normalize_sql(gold)
+        question = example.get("question", "")
+        gold_sql = example.get("query", "")
+        db_id = example.get("db_id", "")
+        model_name = model_name or self.model_name
+        
+        record = {
+            "index": idx,
+            "db_id": db_id,
+            "question": question,
+            "gold_sql": gold_sql,
+            "model": model_name or "default",
+            "strategy": self.strategy_name(use_few_shot, use_chain_of_thought),
+            "schema_format": Settings.SCHEMA_FORMAT,
+            "predicted_sql": None,
+            "exact_match": False,
+            "execution_match": False,
+            "skipped": False,
+            "error": None,
+            "latency": None,
+            "attempts": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "eval_time": 0.0,
+            "stage_times": {}
+        }
         
-        # Direct match after normalization
-        if pred_norm == gold_norm:
-            return True
+        # Get database path
+        db_path = os.path.join(self.db_base_path, db_id, f"{db_id}.sqlite")
         
-        # Try with alias removal
-        pred_no_aliases = self.remove_aliases(pred_norm)
-        gold_no_aliases = self.remove_aliases(gold_norm)
+        print(f"[{idx+1}/{total}] DB: {db_id}")
+        print(f"  Q: {question[:70]}...")
+        
+        # Check if database exists
+        if not os.path.exists(db_path):
+            print(f"  ⚠️ Database not found: {db_path}")
+            record["skipped"] = True
+            record["error"] = "Database not found"
+            return record
+        
+        owns_chain = chain is None
         
-        return pred_no_aliases == gold_no_aliases
-    
-    def execution_match(self, predicted: str, gold: str, db_path: str) -> bool:
-        """Check if predicted SQL produces same results as gold SQL"""
         try:
-            # Create connection to specific database
-            db_conn = DatabaseConnection(db_path)
-            db_conn.connect()
+            # Use the specific database for this example
+            if owns_chain:
+                chain = TextToSQLChain(db_path=db_path, model_name=model_name)
+            result = chain.run(
+                question,
+                use_few_shot=use_few_shot,
+                use_chain_of_thought=use_chain_of_thought
+            )
             
-            pred_result, pred_error = db_conn.execute_query(predicted)
-            gold_result, gold_error = db_conn.execute_query(gold)
+            record["latency"] = result["timings"]["total"]
+            record["attempts"] = len(result["attempts"])
+            record["prompt_tokens"] = result["llm_metrics"]["total"]["prompt_tokens"]
+            record["completion_tokens"] = result["llm_metrics"]["total"]["completion_tokens"]
+            record["eval_time"] = result["llm_metrics"]["total"]["eval_time"]
+            record["stage_times"] = {
+                stage: seconds for stage, seconds in result["timings"].items() if stage != "total"
+            }
             
-            db_conn.disconnect()
+            if result["sql_query"]:
+                predicted_sql = result["sql_query"]
+                record["predicted_sql"] = predicted_sql
+                
+                # Exact match
+                if self.exact_match(predicted_sql, gold_sql):
+                    record["exact_match"] = True
+                    print("  ✅ Exact match")
+                    print(f"    Query: {predicted_sql[:100]}...")
+                else:
+                    print("  ❌ No exact match")
+                    print(f"    Predicted: {predicted_sql[:100]}...")
+                    print(f"    Gold: {gold_sql[:100]}...")
+                
+                # Execution match
+                if self.execution_match(predicted_sql, gold_sql, db_path,
+                                        db_conn=chain.db, gold_result=gold_result):
+                    record["execution_match"] = True
+                    print("  ✅ Execution match")
+                else:
+                    print("  ❌ No execution match")
+            else:
+                record["error"] = result["error"]
+                print("  ❌ Failed to generate SQL")
             
-            if pred_error or gold_error:
-                return False
+        except Exception as e:
+            record["error"] = str(e)
+            print(f"  ❌ Error: {str(e)}")
+        finally:
+            if owns_chain and chain is not None:
+                chain.close()
+        
+        return record
+    
+    @staticmethod
+    def summarize_records(records: List[Dict]) -> Dict:
+        """
+        Aggregate accuracy, latency and token usage per (model, strategy)
+        
+        Args:
+            records: Per-example records from evaluate_example
             
-            # Compare results
-            pred_cols, pred_rows = pred_result
-            gold_cols, gold_rows = gold_result
+        Returns:
+            Dictionary keyed by "model/strategy" with aggregate metrics
+        """
+        groups = {}
+        for record in records:
+            groups.setdefault((record["model"], record["strategy"]), []).append(record)
+        
+        summary = {}
+        for (model, strategy), group in sorted(groups.items()):
+            latencies = sorted(r["latency"] for r in group if r["latency"] is not None)
+            total_latency = sum(latencies)
+            exact_matches = sum(1 for r in group if r["exact_match"])
+            execution_matches = sum(1 for r in group if r["execution_match"])
+            total = len(group)
             
-            # Sort rows for comparison
-            pred_rows_sorted = sorted([tuple(row) for row in pred_rows])
-            gold_rows_sorted = sorted([tuple(row) for row in gold_rows])
+            stage_totals = {}
+            for record in group:
+                for stage, seconds in record["stage_times"].items():
+                    stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
             
-            return pred_rows_sorted == gold_rows_sorted
+            summary[f"{model}/{strategy}"] = {
+                "model": model,
+                "strategy": strategy,
+                "total_samples": total,
+                "exact_match_accuracy": exact_matches / total * 100 if total else 0,
+                "execution_accuracy": execution_matches / total * 100 if total else 0,
+                "latency_mean": total_latency / len(latencies) if latencies else None,
+                "latency_p50": nearest_rank(latencies, 50) if latencies else None,
+                "latency_p95": nearest_rank(latencies, 95) if latencies else None,
+                "throughput": len(latencies) / total_latency if total_latency else None,
+                # Correct (execution-matching) answers per second of generation time
+                "accuracy_per_second": execution_matches / total_latency if total_latency else None,
+                "mean_attempts": sum(r["attempts"] for r in group) / total if total else 0,
+                "prompt_tokens": sum(r["prompt_tokens"] for r in group),
+                "completion_tokens": sum(r["completion_tokens"] for r in group),
+                # Server-side decode seconds (records from older checkpoints have none)
+                "eval_time": sum(r.get("eval_time", 0.0) for r in group),
+                "stage_times_mean": {
+                    stage: seconds / len(latencies) for stage, seconds in stage_totals.items()
+                } if latencies else {}
+            }
+        
+        return summary
+    
+    @staticmethod
+    def write_report(records: List[Dict], summary: Dict, report_dir: str, name: str) -> Dict:
+        """
+        Write the per-example records and aggregates as JSON and CSV
+        
+        Args:
+            records: Per-example records
+            summary: Aggregates from summarize_records
+            report_dir: Output directory
+            name: Base file name (without extension)
             
-        except Exception as e:
-            print(f"    Execution error: {str(e)}")
-            return False
+        Returns:
+            Dictionary with the paths written
+        """
+        os.makedirs(report_dir, exist_ok=True)
+        json_path = os.path.join(report_dir, f"{name}.json")
+        csv_path = os.path.join(report_dir, f"{name}.csv")
+        
+        with open(json_path, 'w') as f:
+            json.dump({"summary": summary, "examples": records}, f, indent=2)
+        
+        stages = sorted({stage for record in records for stage in record["stage_times"]})
+        fields = ["index", "db_id", "model", "strategy", "exact_match", "execution_match",
+                  "skipped", "latency", "attempts", "prompt_tokens", "completion_tokens", "eval_time"]
+        
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields + [f"stage_{stage}" for stage in stages] + ["error"])
+            for record in records:
+                writer.writerow(
+                    [record.get(field) for field in fields]
+                    + [record["stage_times"].get(stage) for stage in stages]
+                    + [record["error"]]
+                )
+        
+        return {"json": json_path, "csv": csv_path}
+    
+    @staticmethod
+    def run_prefix() -> str:
+        """Report/checkpoint name prefix; non-default schema formats and runs without
+        stage generation profiles or SQL streaming get their own files"""
+        prefix = "spider"
+        if Settings.SCHEMA_FORMAT != "verbose":
+            prefix += f"_{Settings.SCHEMA_FORMAT}"
+        if list(Settings.GENERATION_PROFILES) == ["default"]:
+            prefix += "_noprofiles"
+        if not Settings.SQL_STREAMING:
+            prefix += "_nostream"
+        return prefix
+    
+    def _open_checkpoint(self, report_dir: str, name: str, checkpoint_path: str,
+                         resume: bool) -> BenchmarkCheckpoint:
+        """Open the run's checkpoint (<report_dir>/<name>.checkpoint.jsonl by default)"""
+        checkpoint_path = checkpoint_path or os.path.join(report_dir, f"{name}.checkpoint.jsonl")
+        checkpoint = BenchmarkCheckpoint(checkpoint_path, resume=resume)
+        
+        if resume:
+            print(f"♻️  Resuming from {checkpoint_path} ({len(checkpoint)} finished record(s))")
+        
+        return checkpoint
     
-    def run_benchmark(self, max_samples: int = 10) -> Dict:
+    def run_benchmark(self, max_samples: int = 10, use_few_shot: bool = False,
+                      use_chain_of_thought: bool = False, report_dir: str = None,
+                      checkpoint_path: str = None, resume: bool = False) -> Dict:
         """
         Run benchmark evaluation
         
+        Every finished example is appended to a JSONL checkpoint; with
+        `resume=True` examples already in the checkpoint are skipped and the
+        aggregates are recomputed from the checkpointed records.
+        
         Args:
             max_samples: Maximum number of samples to evaluate (for testing)
+            use_few_shot: Use few-shot prompting
+            use_chain_of_thought: Use chain-of-thought prompting
+            report_dir: Directory for the JSON/CSV latency report
+                        (defaults to <data_path>/reports)
+            checkpoint_path: Checkpoint file (defaults to a per model/strategy
+                             file in report_dir)
+            resume: Continue from the checkpoint instead of starting over
             
         Returns:
             Dictionary with evaluation metrics
@@ -197,73 +413,81 @@ class SpiderBenchmark:
         
         # Limit samples for testing
         dataset = dataset[:max_samples]
-        
-        exact_matches = 0
-        execution_matches = 0
         total = len(dataset)
+        records = []
+        
+        model = self.model_name or "default"
+        strategy = self.strategy_name(use_few_shot, use_chain_of_thought)
+        safe_model = model.replace(":", "-").replace("/", "-")
+        report_dir = report_dir or os.path.join(self.data_path, "reports")
+        checkpoint = self._open_checkpoint(
+            report_dir, f"{self.run_prefix()}_{safe_model}_{strategy}", checkpoint_path, resume
+        )
         
         print(f"\nEvaluating {total} samples...\n")
         
-        for idx, example in enumerate(dataset):
-            question = example.get("question", "")
-            gold_sql = example.get("query", "")
-            db_id = example.get("db_id", "")
-            
-            # Get database path
-            db_path = os.path.join(self.db_base_path, db_id, f"{db_id}.sqlite")
-            
-            print(f"[{idx+1}/{total}] DB: {db_id}")
-            print(f"  Q: {question[:70]}...")
-            
-            # Check if database exists
-            if not os.path.exists(db_path):
-                print(f"  ⚠️ Database not found: {db_path}")
-                continue
-            
-            try:
-                # Use the specific database for this example
-                chain = TextToSQLChain(db_path=db_path, model_name=self.model_name)
-                result = chain.run(question)
+        # Examples of the same database reuse one warm chain (connection,
+        # schema, profile); the shared feedback store keeps prompts unchanged
+        manager = ChainManager(database_dir=self.db_base_path, model_name=self.model_name,
+                               scoped_feedback=False)
+        
+        try:
+            for idx, example in enumerate(dataset):
+                record = checkpoint.get(idx, model, strategy)
+                if record is not None:
+                    records.append(record)
+                    continue
                 
-                if result["sql_query"]:
-                    predicted_sql = result["sql_query"]
-                    
-                    # Exact match
-                    if self.exact_match(predicted_sql, gold_sql):
-                        exact_matches += 1
-                        print("  ✅ Exact match")
-                        print(f"    Query: {predicted_sql[:100]}...")
-                    else:
-                        print("  ❌ No exact match")
-                        print(f"    Predicted: {predicted_sql[:100]}...")
-                        print(f"    Gold: {gold_sql[:100]}...")
-                    
-                    # Execution match
-                    if self.execution_match(predicted_sql, gold_sql, db_path):
-                        execution_matches += 1
-                        print("  ✅ Execution match")
-                    else:
-                        print("  ❌ No execution match")
+                db_id = example.get("db_id", "")
+                if os.path.exists(os.path.join(self.db_base_path, db_id, f"{db_id}.sqlite")):
+                    with manager.chain(db_id) as chain:
+                        record = self.evaluate_example(
+                            idx, example, total, use_few_shot, use_chain_of_thought, chain=chain
+                        )
                 else:
-                    print("  ❌ Failed to generate SQL")
+                    record = self.evaluate_example(
+                        idx, example, total, use_few_shot, use_chain_of_thought
+                    )
+                checkpoint.append(record)
+                records.append(record)
                 
-                chain.close()
-                
-            except Exception as e:
-                print(f"  ❌ Error: {str(e)}")
-            
-            time.sleep(0.5)  # Rate limiting
+                if not record["skipped"]:
+                    time.sleep(0.5)  # Rate limiting
+        finally:
+            manager.close()
+        
+        self.results = records
+        exact_matches = sum(1 for record in records if record["exact_match"])
+        execution_matches = sum(1 for record in records if record["execution_match"])
         
         exact_match_acc = (exact_matches / total) * 100 if total > 0 else 0
         execution_acc = (execution_matches / total) * 100 if total > 0 else 0
         
+        summary = self.summarize_records(records)
+        latency = summary.get(f"{model}/{strategy}", {})
+        
+        report_name = "{}_{}_{}_{}".format(
+            self.run_prefix(), safe_model, strategy, datetime.now().strftime("%Y%m%d_%H%M%S")
+        )
+        report_paths = self.write_report(records, summary, report_dir, report_name)
+        report_paths["checkpoint"] = checkpoint.path
+        
         results = {
             "exact_match_accuracy": exact_match_acc,
             "execution_accuracy": execution_acc,
             "exact_matches": exact_matches,
             "execution_matches": execution_matches,
             "total_samples": total,
-            "model": self.model_name or "default"
+            "model": self.model_name or "default",
+            "strategy": strategy,
+            "schema_format": Settings.SCHEMA_FORMAT,
+            "latency_p50": latency.get("latency_p50"),
+            "latency_p95": latency.get("latency_p95"),
+            "throughput": latency.get("throughput"),
+            "accuracy_per_second": latency.get("accuracy_per_second"),
+            "completion_tokens": latency.get("completion_tokens"),
+            "eval_time": latency.get("eval_time"),
+            "report": report_paths
         }
         
         print("\n" + "=" * 70)
@@ -272,18 +496,303 @@ class SpiderBenchmark:
         print(f"Total Samples: {total}")
         print(f"Exact Match Accuracy: {exact_match_acc:.2f}%")
         print(f"Execution Accuracy: {execution_acc:.2f}%")
+        if latency.get("latency_p50") is not None:
+            print(f"Latency p50/p95: {latency['latency_p50']:.2f}s / {latency['latency_p95']:.2f}s")
+            print(f"Throughput: {latency['throughput']:.3f} examples/s")
+            print(f"Correct Answers per Second: {latency['accuracy_per_second']:.3f}")
+            print(f"Tokens (prompt/completion): {latency['prompt_tokens']} / {latency['completion_tokens']}")
+            print(f"Decode Time: {latency['eval_time']:.2f}s")
+        print(f"Report: {report_paths['json']}")
         print("=" * 70)
         
         return results
 
+    def run_matrix(self, models: List[str], strategies: List[str] = None,
+                   max_samples: int = 10, report_dir: str = None,
+                   checkpoint_path: str = None, resume: bool = False) -> Dict:
+        """
+        Evaluate several models and prompt strategies over the same examples in one pass
+        
+        The dataset is loaded once, each database is opened once (its schema is
+        extracted once and shared by every model's chain) and each gold query is
+        executed once. Examples are scheduled round-robin across models so all
+        of them see the same server conditions.
+        
+        Args:
+            models: Ollama models to compare
+            strategies: Prompt strategies (keys of STRATEGIES, default: zero_shot)
+            max_samples: Maximum number of samples to evaluate
+            report_dir: Directory for the JSON/CSV report (defaults to <data_path>/reports)
+            checkpoint_path: Checkpoint file (defaults to report_dir/spider_matrix.checkpoint.jsonl)
+            resume: Skip (example, model, strategy) runs already in the checkpoint
+            
+        Returns:
+            Dictionary with the per model/strategy summary and report paths
+        """
+        strategies = strategies or ["zero_shot"]
+        for strategy in strategies:
+            if strategy not in self.STRATEGIES:
+                raise ValueError(f"Unknown strategy '{strategy}', expected one of {list(self.STRATEGIES)}")
+        
+        print("=" * 70)
+        print("SPIDER BENCHMARK MATRIX")
+        print("=" * 70)
+        
+        dataset = self.load_dataset("dev")[:max_samples]
+        
+        if not dataset:
+            return {"error": "Dataset not found", "summary": {}, "total_samples": 0}
+        
+        total = len(dataset)
+        runs = len(models) * len(strategies)
+        report_dir = report_dir or os.path.join(self.data_path, "reports")
+        checkpoint = self._open_checkpoint(report_dir, f"{self.run_prefix()}_matrix", checkpoint_path, resume)
+        print(f"\nEvaluating {total} samples x {len(models)} model(s) x {len(strategies)} strategy(ies)...\n")
+        
+        connections = {}   # db_id -> shared DatabaseConnection
+        chains = {}        # (db_id, model) -> TextToSQLChain on the shared connection
+        records = []
+        
+        try:
+            for idx, example in enumerate(dataset):
+                db_id = example.get("db_id", "")
+                db_path = os.path.join(self.db_base_path, db_id, f"{db_id}.sqlite")
+                
+                pending = []
+                for strategy in strategies:
+                    for model in models:
+                        record = checkpoint.get(idx, model, strategy)
+                        if record is None:
+                            pending.append((strategy, model))
+                        else:
+                            records.append(record)
+                
+                if not pending:
+                    continue
+                
+                gold_result = None
+                if os.path.exists(db_path):
+                    if db_id not in connections:
+                        connections[db_id] = DatabaseConnection(db_path)
+                        connections[db_id].connect()
+                    gold_result = connections[db_id].execute_query(example.get("query", ""))
+                
+                for strategy, model in pending:
+                    use_few_shot, use_chain_of_thought = self.STRATEGIES[strategy]
+                    chain = None
+                    if db_id in connections:
+                        if (db_id, model) not in chains:
+                            chains[(db_id, model)] = TextToSQLChain(
+                                db_path=db_path, model_name=model,
+                                db_connection=connections[db_id]
+                            )
+                        chain = chains[(db_id, model)]
+                    
+                    print(f"--- {model} / {strategy}")
+                    record = self.evaluate_example(
+                        idx, example, total, use_few_shot, use_chain_of_thought,
+                        model_name=model, chain=chain, gold_result=gold_result
+                    )
+                    checkpoint.append(record)
+                    records.append(record)
+        finally:
+            for chain in chains.values():
+                chain.close()
+            for connection in connections.values():
+                connection.disconnect()
+        
+        self.results = records
+        summary = self.summarize_records(records)
+        report_paths = self.write_report(
+            records, summary, report_dir,
+            f"{self.run_prefix()}_matrix_" + datetime.now().strftime("%Y%m%d_%H%M%S")
+        )
+        report_paths["checkpoint"] = checkpoint.path
+        
+        self.print_comparison_table(summary)
+        print(f"Report: {report_paths['json']} ({runs} runs)")
+        
+        return {"summary": summary, "total_samples": total,
+                "schema_format": Settings.SCHEMA_FORMAT, "report": report_paths}
+    
+    def rescore(self, predictions_path: str, output_path: str = None,
+                workers: int = None) -> Dict:
+        """
+        Recompute exact and execution match for saved predictions without the LLM
+        
+        Predictions are read from a checkpoint/predictions JSONL file, grouped
+        by database and scored in parallel worker processes. Gold results come
+        from an on-disk cache (<data_path>/cache/gold), so re-running after an
+        evaluator change only executes the predicted queries.
+        
+        Args:
+            predictions_path: JSONL file with per-example records
+            output_path: Where to write rescored records
+                         (defaults to <predictions>.rescored.jsonl)
+            workers: Number of worker processes (defaults to the CPU count)
+            
+        Returns:
+            Dictionary with the per model/strategy summary and output path
+        """
+        print("=" * 70)
+        print("SPIDER RESCORE")
+        print("=" * 70)
+        
+        # A run that died mid-write leaves a partial last line; skip it
+        records = list(BenchmarkCheckpoint.read(predictions_path).values())
+        
+        groups = {}
+        for record in records:
+            groups.setdefault(record["db_id"], []).append(record)
+        
+        print(f"\nRescoring {len(records)} predictions over {len(groups)} database(s)...\n")
+        
+        cache_dir = os.path.join(self.data_path, "cache", "gold")
+        rescored = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_rescore_group, self.data_path, cache_dir, db_id, group)
+                for db_id, group in groups.items()
+            ]
+            for future in futures:
+                rescored.extend(future.result())
+        
+        rescored.sort(key=lambda record: (record["index"], record["model"], record["strategy"]))
+        
+        output_path = output_path or predictions_path.replace(".jsonl", "") + ".rescored.jsonl"
+        with open(output_path, 'w') as f:
+            for record in rescored:
+                f.write(json.dumps(record) + "\n")
+        
+        summary = self.summarize_records(rescored)
+        self.print_comparison_table(summary)
+        print(f"Rescored predictions: {output_path}")
+        
+        return {"summary": summary, "total_samples": len(rescored), "output": output_path}
+    
+    @staticmethod
+    def print_comparison_table(summary: Dict):
+        """Print accuracy and latency side by side for every model/strategy"""
+        print("\n" + "=" * 100)
+        print("COMPARISON")
+        print("=" * 100)
+        print(f"{'Model':<22} {'Strategy':<18} {'EM %':>7} {'EX %':>7} {'p50 s':>7} "
+              f"{'p95 s':>7} {'ex/s':>7} {'ok/s':>7} {'tokens':>9}")
+        print("-" * 100)
+        
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else "-"
+        
+        for entry in summary.values():
+            print(f"{entry['model']:<22} {entry['strategy']:<18} "
+                  f"{entry['exact_match_accuracy']:>7.2f} {entry['execution_accuracy']:>7.2f} "
+                  f"{fmt(entry['latency_p50'], '7.2f'):>7} {fmt(entry['latency_p95'], '7.2f'):>7} "
+                  f"{fmt(entry['throughput'], '7.3f'):>7} {fmt(entry['accuracy_per_second'], '7.3f'):>7} "
+                  f"{entry['prompt_tokens'] + entry['completion_tokens']:>9}")
+        print("=" * 100)
+
+def _rescore_group(data_path: str, cache_dir: str, db_id: str, records: List[Dict]) -> List[Dict]:
+    """Score every prediction for one database (runs in a worker process)"""
+    benchmark = SpiderBenchmark(data_path=data_path)
+    db_path = os.path.join(benchmark.db_base_path, db_id, f"{db_id}.sqlite")
+    
+    if not os.path.exists(db_path):
+        return [{**record, "exact_match": False, "execution_match": False, "skipped": True}
+                for record in records]
+    
+    gold_cache = GoldResultCache(cache_dir, db_id, db_path)
+    db_conn = DatabaseConnection(db_path)
+    db_conn.connect()
+    
+    rescored = []
+    for record in records:
+        predicted_sql = record.get("predicted_sql")
+        gold_sql = record["gold_sql"]
+        record = {**record, "exact_match": False, "execution_match": False}
+        
+        if predicted_sql:
+            record["exact_match"] = benchmark.exact_match(predicted_sql, gold_sql)
+            record["execution_match"] = benchmark.execution_match(
+                predicted_sql, gold_sql, db_path,
+                db_conn=db_conn, gold_result=gold_cache.get(gold_sql, db_conn)
+            )
+        rescored.append(record)
+    
+    db_conn.disconnect()
+    gold_cache.save()
+    
+    return rescored
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Run Spider benchmark evaluation')
     parser.add_argument('--samples', type=int, default=10, help='Number of samples to evaluate (default: 10)')
     parser.add_argument('--model', type=str, default=None, help='Model name to use (default: llama3)')
+    parser.add_argument('--matrix', action='store_true',
+                        help='Compare --models x --strategies over the same examples in one pass')
+    parser.add_argument('--models', nargs='+', default=None,
+                        help='Models for --matrix (default: all models in Settings.LLM_MODELS)')
+    parser.add_argument('--strategies', nargs='+', default=['zero_shot'],
+                        choices=list(SpiderBenchmark.STRATEGIES),
+                        help='Prompt strategies for --matrix (default: zero_shot)')
+    parser.add_argument('--few-shot', action='store_true', help='Use few-shot prompting')
+    parser.add_argument('--chain-of-thought', action='store_true', help='Use chain-of-thought prompting')
+    parser.add_argument('--report-dir', type=str, default=None,
+                        help='Directory for the JSON/CSV latency report (default: <data>/reports)')
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help='JSONL checkpoint of finished examples (default: in the report directory)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip examples already in the checkpoint and continue the run')
+    parser.add_argument('--rescore', type=str, default=None, metavar='PREDICTIONS_JSONL',
+                        help='Re-score saved predictions (e.g. a checkpoint) without calling the LLM')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for --rescore (default: CPU count)')
+    parser.add_argument('--llm-mode', choices=['live', 'record', 'replay'], default='live',
+                        help='live Ollama, record completions to a cassette, or replay them offline')
+    parser.add_argument('--cassette', type=str, default=None, help='Cassette file for record/replay')
+    parser.add_argument('--simulate-latency', action='store_true',
+                        help='In replay mode, sleep for the recorded LLM latency')
+    parser.add_argument('--schema-format', choices=list(SCHEMA_FORMATS), default=Settings.SCHEMA_FORMAT,
+                        help=f'Schema text in prompts (default: {Settings.SCHEMA_FORMAT})')
+    parser.add_argument('--no-stage-profiles', action='store_true',
+                        help='Use the default generation options for every stage (baseline for decode savings)')
+    parser.add_argument('--no-streaming', action='store_true',
+                        help='Wait for whole SQL completions instead of cancelling after the statement')
     
     args = parser.parse_args()
     
+    # Profile each database before its first question so every prompt of a
+    # run sees the same schema annotations (needed for record/replay)
+    Settings.COLUMN_PROFILE_BACKGROUND = False
+    Settings.SCHEMA_FORMAT = args.schema_format
+    if args.no_stage_profiles:
+        Settings.GENERATION_PROFILES = {"default": Settings.GENERATION_PROFILES["default"]}
+    if args.no_streaming:
+        Settings.SQL_STREAMING = False
+    
+    if args.llm_mode != 'live':
+        LLMFactory.configure(args.llm_mode, args.cassette, args.simulate_latency)
+    
     benchmark = SpiderBenchmark(model_name=args.model)
-    results = benchmark.run_benchmark(max_samples=args.samples)
+    
+    if args.rescore:
+        results = benchmark.rescore(args.rescore, workers=args.workers)
+    elif args.matrix:
+        results = benchmark.run_matrix(
+            models=args.models or LLMFactory.get_available_models(),
+            strategies=args.strategies,
+            max_samples=args.samples,
+            report_dir=args.report_dir,
+            checkpoint_path=args.checkpoint,
+            resume=args.resume
+        )
+    else:
+        results = benchmark.run_benchmark(
+            max_samples=args.samples,
+            use_few_shot=args.few_shot,
+            use_chain_of_thought=args.chain_of_thought,
+            report_dir=args.report_dir,
+            checkpoint_path=args.checkpoint,
+            resume=args.resume
+        )
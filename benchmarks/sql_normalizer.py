@@ -0,0 +1,115 @@
+import re
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+# normalize_sql patterns
+_LINE_COMMENT = re.compile(r'--[^\n]*')
+_BLOCK_COMMENT = re.compile(r'/\*.*?\*/', flags=re.DOTALL)
+_AS_KEYWORD = re.compile(r'\bAS\s+')
+_TABLE_PREFIX = re.compile(r'\b[A-Z]\d*\.')  # Matches s., t1., T2., etc.
+_COUNT_STAR = re.compile(r'COUNT\s*\(\s*\*\s*\)')
+
+# remove_aliases patterns
+_SELECT_CLAUSE = re.compile(r'SELECT\s+(.*?)\s+FROM')
+_FUNCTION_ALIAS = re.compile(r'\)\s+[A-Z_0-9]+(?=\s*(,|$))')
+_COLUMN_ALIAS = re.compile(r'\b([A-Z_0-9]+)\s+[A-Z_0-9]+(?=\s*(,|$))(?!\()')
+_TABLE_ALIAS = re.compile(r'(FROM|JOIN)\s+([A-Z_]+)\s+[A-Z]\d*\b')
+_OPERATOR_SPACING = [
+    (re.compile(r'\s*\(\s*'), ' ('),
+    (re.compile(r'\s*\)\s*'), ') '),
+    (re.compile(r'\s*,\s*'), ', '),
+    (re.compile(r'\s*=\s*'), ' = '),
+    (re.compile(r'\s*<\s*'), ' < '),
+    (re.compile(r'\s*>\s*'), ' > '),
+]
+
+# Distinct SQL strings whose canonical forms are memoized
+CANONICAL_CACHE_SIZE = 65536
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize SQL for comparison by removing irrelevant differences
+    while preserving semantic meaning
+    """
+    # Convert to uppercase
+    sql = sql.upper()
+
+    # Remove comments
+    sql = _LINE_COMMENT.sub('', sql)
+    sql = _BLOCK_COMMENT.sub('', sql)
+
+    # Remove trailing semicolons
+    sql = sql.rstrip(';').strip()
+
+    # Normalize whitespace (including newlines and tabs)
+    sql = ' '.join(sql.split())
+
+    # Remove AS keyword for aliases
+    sql = _AS_KEYWORD.sub('', sql)
+
+    # Remove table prefixes from columns (e.g., "s.Name" -> "Name", "T1.id" -> "id")
+    sql = _TABLE_PREFIX.sub('', sql)
+
+    # Normalize COUNT(*)
+    sql = _COUNT_STAR.sub('COUNT(*)', sql)
+
+    # Spaces around operators are kept here - remove_aliases needs them
+    sql = ' '.join(sql.split())
+
+    return sql.strip()
+
+def remove_aliases(sql: str) -> str:
+    """
+    Remove column and table aliases from normalized SQL
+    """
+    # Remove column aliases in the SELECT clause (between SELECT and FROM)
+    select_match = _SELECT_CLAUSE.search(sql)
+    if select_match:
+        select_clause = select_match.group(1)
+
+        # Remove aliases after functions: "COUNT(*) TOTAL" -> "COUNT(*)"
+        select_clause = _FUNCTION_ALIAS.sub(')', select_clause)
+
+        # Remove simple column aliases: "COLUMN_NAME ALIAS" -> "COLUMN_NAME"
+        select_clause = _COLUMN_ALIAS.sub(r'\1', select_clause)
+
+        sql = sql.replace(select_match.group(1), select_clause)
+
+    # Remove table aliases (FROM table alias -> FROM table)
+    sql = _TABLE_ALIAS.sub(r'\1 \2', sql)
+
+    # Now normalize spacing around operators for final comparison
+    for pattern, replacement in _OPERATOR_SPACING:
+        sql = pattern.sub(replacement, sql)
+
+    # Normalize spaces
+    return ' '.join(sql.split())
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonical_form(sql: str) -> Tuple[str, str]:
+    """
+    Get the memoized (normalized, alias-free) forms of a SQL string
+
+    Gold SQL recurs across runs, models and strategies, so each distinct
+    string is normalized only once per process.
+    """
+    normalized = normalize_sql(sql)
+    return normalized, remove_aliases(normalized)
+
+def exact_match(predicted: str, gold: str) -> bool:
+    """
+    Check if predicted SQL matches gold SQL after normalization
+    (directly, or once aliases are removed)
+    """
+    pred_norm, pred_no_aliases = canonical_form(predicted)
+    gold_norm, gold_no_aliases = canonical_form(gold)
+
+    return pred_norm == gold_norm or pred_no_aliases == gold_no_aliases
+
+def normalize_batch(sqls: Iterable[str]) -> List[Tuple[str, str]]:
+    """Get canonical forms for many SQL strings (duplicates are normalized once)"""
+    return [canonical_form(sql) for sql in sqls]
+
+def exact_match_batch(pairs: Iterable[Tuple[str, str]]) -> List[bool]:
+    """Score many (predicted, gold) pairs, e.g. a whole predictions file"""
+    return [exact_match(predicted, gold) for predicted, gold in pairs]
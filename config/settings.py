@@ -7,6 +7,11 @@ class Settings:
     # Ollama Configuration
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     
+    # How long Ollama keeps a model loaded after a request (e.g. "30m", "-1" =
+    # forever). Unloading also drops the prompt cache, so the schema prefix
+    # would be re-evaluated on the next request (Ollama's default is 5 minutes)
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    
     # LLM Models to compare
     LLM_MODELS: List[str] = [
         "llama3:latest",
@@ -19,6 +24,30 @@ class Settings:
     
     # Database
     DATABASE_PATH = os.getenv("DATABASE_PATH", "data/sample_database.db")
+    QUERY_FETCH_BATCH_SIZE = 1000  # rows per fetch when streaming query results
+    
+    # Schema text in prompts: "verbose" (one line per column), "compact"
+    # (table(col:type*, ...)) or "ddl" (one-line CREATE TABLE statements)
+    SCHEMA_FORMAT = os.getenv("SCHEMA_FORMAT", "verbose")
+    
+    # Column statistics and sample values added to the schema prompt. Computed
+    # once per data version from the first COLUMN_PROFILE_SAMPLE_ROWS rows of
+    # each table and cached in '<database>.profile.json'
+    COLUMN_PROFILE_ENABLED = os.getenv("COLUMN_PROFILE_ENABLED", "true").lower() == "true"
+    COLUMN_PROFILE_BACKGROUND = True  # profile in a thread; False blocks until the profile exists
+    COLUMN_PROFILE_SAMPLE_ROWS = 10000
+    COLUMN_PROFILE_TOP_K = 5  # sample values per text column
+    COLUMN_PROFILE_MAX_DISTINCT = 50  # text columns with more distinct values get no samples
+    COLUMN_PROFILE_MAX_VALUE_LENGTH = 30
+    
+    # Inverted index of text cell values for hinting which column a value in
+    # the question belongs to (built from the column profile)
+    VALUE_INDEX_MAX_DISTINCT = 1000  # only columns with at most this many distinct values
+    VALUE_INDEX_MAX_TOKENS = 6  # longest indexed value, in words
+    VALUE_INDEX_MAX_HINTS = 5
+    
+    # Foreign-key join paths hinted for tables mentioned in the question
+    JOIN_HINTS_MAX = 5
     
     # Temperature for generation (0.0 = deterministic, 1.0 = creative)
     TEMPERATURE = 0.1
@@ -26,8 +55,62 @@ class Settings:
     # Max tokens for generation
     MAX_TOKENS = 2000
     
+    # Generation options per pipeline stage, layered over "default". Short
+    # answers get small num_predict caps. SQL has no ';' stop: Ollama matches
+    # stop strings on the raw text, so it would cut string literals such as
+    # 'a;b', and SQL_STREAMING already ends SQL generation and model
+    # comparison calls at the first ';' outside strings and comments. Ollama reloads a model when num_ctx
+    # changes, so keep num_ctx the same for all stages of a model.
+    GENERATION_PROFILES = {
+        "default": {"temperature": TEMPERATURE, "num_predict": MAX_TOKENS, "num_ctx": 4096, "stop": None},
+        "sql_generation": {"num_predict": 512},  # also used for error correction
+        "summarization": {"num_predict": 256},
+        "ambiguity": {"temperature": 0.0, "num_predict": 4},  # YES or NO
+        "clarification": {"num_predict": 300},
+        "comparison": {"num_predict": 512}
+    }
+    
+    # Stream SQL completions and cancel the generation as soon as a complete
+    # statement (';' or closing code fence) has arrived, instead of waiting
+    # for explanations the model writes after it
+    SQL_STREAMING = os.getenv("SQL_STREAMING", "true").lower() == "true"
+    
+    # Prompt size control: approximate characters per token and per-stage
+    # token budgets (None = unlimited). Over-budget prompts lose feedback
+    # examples first, then corrections, then hints.
+    CHARS_PER_TOKEN = 4
+    PROMPT_TOKEN_BUDGETS = {
+        "sql_generation": 3000,
+        "error_correction": 3000,
+        "summarization": 1500
+    }
+    # The schema of SQL prompts is cut (trailing tables first) to this budget
+    # of its own, whatever the question, so all SQL prompts for a database
+    # share the same prefix. Keep it below the stage budgets above, leaving
+    # room for the instructions and the per-request text.
+    PROMPT_SCHEMA_TOKEN_BUDGET = 2200
+    
+    # LLM backend mode: "live" (Ollama), "record" (Ollama + write completions
+    # to the cassette) or "replay" (serve completions from the cassette, offline)
+    LLM_MODE = os.getenv("LLM_MODE", "live")
+    LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "data/cassettes/llm.jsonl.gz")
+    LLM_REPLAY_SIMULATE_LATENCY = os.getenv("LLM_REPLAY_SIMULATE_LATENCY", "0") == "1"
+    
+    # HTTP connection pool shared by all Ollama clients
+    HTTP_MAX_CONNECTIONS = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+    HTTP_KEEPALIVE_EXPIRY = 60.0  # seconds an idle connection is kept open
+    
     # Feedback storage
     FEEDBACK_DB_PATH = "data/feedback.db"
+    FEEDBACK_SCOPE_DIR = "data/feedback"  # per-database feedback stores (ChainManager)
+    
+    # Multi-database serving (ChainManager): databases are looked up by id in
+    # DATABASE_DIR and their chains kept warm in an LRU bounded by count and by
+    # the approximate bytes of their schema, profile and join-graph caches
+    DATABASE_DIR = os.getenv("DATABASE_DIR", "data/databases")
+    CHAIN_CACHE_MAX_DATABASES = int(os.getenv("CHAIN_CACHE_MAX_DATABASES", "32"))
+    CHAIN_CACHE_MAX_BYTES = 64 * 1024 * 1024
     
     # Benchmark paths
     SPIDER_DATA_PATH = "data/benchmarks/spider"
@@ -35,8 +118,25 @@ class Settings:
     # Maximum retries for SQL generation
     MAX_RETRIES = 2
     
+    # Pre-execution cost guard: queries whose EXPLAIN QUERY PLAN is estimated
+    # to examine more than COST_GUARD_MAX_ROWS rows (row counts from
+    # sqlite_stat1, else MAX(rowid)) are rejected, limited to
+    # COST_GUARD_LIMIT rows or sent back for regeneration with the issues found
+    COST_GUARD_ENABLED = os.getenv("COST_GUARD_ENABLED", "true").lower() == "true"
+    COST_GUARD_POLICY = os.getenv("COST_GUARD_POLICY", "regenerate")  # "reject", "limit" or "regenerate"
+    COST_GUARD_MAX_ROWS = 10_000_000
+    COST_GUARD_LARGE_TABLE_ROWS = 100_000  # full scans of bigger tables are reported
+    COST_GUARD_LIMIT = 1000
+    
+    # Latency metrics export (periodic JSON snapshot for monitoring to scrape)
+    METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH")  # e.g. "data/metrics.json"
+    METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "60"))
+    
     # Web interface settings
     WEB_PORT = 7860
     WEB_SHARE = False  # Set to True to create public link
+    WEB_PAGE_SIZE = 100  # result rows sent to the browser per page
+    WEB_MAX_CACHED_ROWS = 10000  # larger results are re-queried page by page instead of kept per session
+    WEB_EXPORT_MAX_AGE = 3600  # seconds an exported file stays downloadable
 
 settings = Settings()
@@ -0,0 +1,217 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+from config.settings import Settings
+from src.chain.text_to_sql_chain import TextToSQLChain
+from src.handlers.feedback_handler import FeedbackHandler
+from src.utils.metrics import metrics
+
+_DATABASE_ID = re.compile(r"^\w[\w.-]*$")
+
+class _Entry:
+    """A warm chain with its bookkeeping for the LRU"""
+
+    def __init__(self, db_id: str, chain: TextToSQLChain):
+        self.db_id = db_id
+        self.chain = chain
+        self.users = 0  # requests running on or waiting for the chain
+        self.lock = threading.Lock()  # held by the request borrowing the chain
+        self.size = chain.db.cache_size()
+
+class ChainManager:
+    """
+    Serve many databases from one process by routing requests on a database id
+
+    Each database gets its own TextToSQLChain (connection, schema, column
+    profile and join graph caches) and, with `scoped_feedback`, its own
+    feedback store, so examples learned on one database never leak into
+    prompts for another. A chain is not thread-safe (its connection, prompt
+    state and metrics belong to one run), so requests to the same database
+    borrow it one at a time. Chains are kept warm in an LRU bounded by the number
+    of databases and by the approximate bytes of their caches; the least
+    recently used idle chain is closed when either bound is exceeded. LLM
+    clients are shared by all chains through the LLMFactory registry.
+    """
+
+    def __init__(self, database_dir: str = None, databases: Dict[str, str] = None,
+                 model_name: str = None, max_databases: int = None, max_bytes: int = None,
+                 scoped_feedback: bool = True, feedback_dir: str = None):
+        """
+        Args:
+            database_dir: Directory searched for '<id>.sqlite', '<id>.db' or
+                '<id>/<id>.sqlite' (Spider layout); defaults to Settings.DATABASE_DIR
+            databases: Explicit database id -> path mapping, checked first
+            model_name: Ollama model for every chain
+            max_databases: Most chains kept open (defaults to Settings.CHAIN_CACHE_MAX_DATABASES)
+            max_bytes: Cached schema/profile bytes kept across chains
+                (defaults to Settings.CHAIN_CACHE_MAX_BYTES)
+            scoped_feedback: One feedback database per id instead of the shared one
+            feedback_dir: Directory of the per-id feedback databases
+                (defaults to Settings.FEEDBACK_SCOPE_DIR)
+        """
+        self.database_dir = database_dir or Settings.DATABASE_DIR
+        self.databases = dict(databases or {})
+        self.model_name = model_name
+        self.max_databases = max_databases or Settings.CHAIN_CACHE_MAX_DATABASES
+        self.max_bytes = max_bytes or Settings.CHAIN_CACHE_MAX_BYTES
+        self.scoped_feedback = scoped_feedback
+        self.feedback_dir = feedback_dir or Settings.FEEDBACK_SCOPE_DIR
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def resolve(self, db_id: str) -> str:
+        """Get the database file for an id; raises ValueError for unknown ids"""
+        # Ids also name feedback files, so they must not contain path separators
+        if not _DATABASE_ID.match(db_id):
+            raise ValueError(f"Invalid database id '{db_id}'")
+
+        if db_id in self.databases:
+            return self.databases[db_id]
+
+        for candidate in (f"{db_id}.sqlite", f"{db_id}.db", os.path.join(db_id, f"{db_id}.sqlite")):
+            path = os.path.join(self.database_dir, candidate)
+            if os.path.exists(path):
+                return path
+
+        raise ValueError(f"Unknown database '{db_id}' (not found in {self.database_dir})")
+
+    def feedback_handler(self, db_id: str) -> FeedbackHandler:
+        """Get the feedback store used for a database id"""
+        with self._lock:
+            entry = self._entries.get(db_id)
+        if entry is not None:
+            return entry.chain.generator.learning_system.feedback_handler
+        if not self.scoped_feedback:
+            return FeedbackHandler()
+        self.resolve(db_id)
+        return FeedbackHandler(os.path.join(self.feedback_dir, f"{db_id}.db"))
+
+    @contextmanager
+    def chain(self, db_id: str) -> Iterator[TextToSQLChain]:
+        """
+        Borrow the warm chain of a database, opening it on first use
+
+        Requests for the same database wait for each other; the chain is not
+        evicted while borrowed or waited for. Do not borrow a database again
+        inside its own borrow (it would wait for itself).
+        """
+        entry = self._checkout(db_id)
+        try:
+            with entry.lock:
+                yield entry.chain
+        finally:
+            self._release(entry)
+
+    def run(self, db_id: str, question: str, **kwargs) -> Dict:
+        """Run TextToSQLChain.run on the chain of a database"""
+        with self.chain(db_id) as chain:
+            return chain.run(question, **kwargs)
+
+    def _checkout(self, db_id: str) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(db_id)
+            if entry is not None:
+                self._entries.move_to_end(db_id)
+                entry.users += 1
+                self._hits += 1
+                return entry
+
+        # Open outside the lock so requests to warm databases are not blocked
+        start_time = time.perf_counter()
+        entry = _Entry(db_id, self._open(db_id))
+        metrics.observe("chain_manager.open", time.perf_counter() - start_time)
+
+        with self._lock:
+            existing = self._entries.get(db_id)
+            if existing is not None:
+                # Another request opened the same database meanwhile
+                entry.chain.close()
+                entry = existing
+                self._entries.move_to_end(db_id)
+                self._hits += 1
+            else:
+                self._entries[db_id] = entry
+                self._misses += 1
+            entry.users += 1
+            evicted = self._evict()
+
+        self._close(evicted)
+        return entry
+
+    def _release(self, entry: _Entry):
+        # Caches grow after use (schema formats, background profile)
+        size = entry.chain.db.cache_size()
+        with self._lock:
+            entry.users -= 1
+            entry.size = size
+            evicted = self._evict()
+        self._close(evicted)
+
+    def _open(self, db_id: str) -> TextToSQLChain:
+        db_path = self.resolve(db_id)
+        feedback_handler = None
+        if self.scoped_feedback:
+            feedback_handler = FeedbackHandler(os.path.join(self.feedback_dir, f"{db_id}.db"))
+        return TextToSQLChain(db_path=db_path, model_name=self.model_name,
+                              feedback_handler=feedback_handler)
+
+    def _evict(self) -> List[_Entry]:
+        """Remove least recently used idle entries while over a bound (call with the lock held)"""
+        evicted = []
+        total = sum(entry.size for entry in self._entries.values())
+
+        for db_id in list(self._entries):
+            if len(self._entries) <= self.max_databases and total <= self.max_bytes:
+                break
+            entry = self._entries[db_id]
+            if entry.users:
+                continue
+            del self._entries[db_id]
+            total -= entry.size
+            evicted.append(entry)
+
+        self._evictions += len(evicted)
+        return evicted
+
+    @staticmethod
+    def _close(entries: List[_Entry]):
+        for entry in entries:
+            entry.chain.close()
+
+    def stats(self) -> Dict:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with open databases (most recent last), cached bytes,
+            hits, misses and evictions
+        """
+        with self._lock:
+            return {
+                "databases": list(self._entries),
+                "bytes": sum(entry.size for entry in self._entries.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
+
+    def close(self):
+        """Close every open chain"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        self._close(entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,14 +1,17 @@
 from src.llm.llm_factory import LLMFactory
 from src.utils.prompts import PromptTemplates
+from src.utils.prompt_builder import PromptBuilder
+from typing import Dict
 
 class SummarizationChain:
     """Summarize SQL results in natural language"""
     
     def __init__(self, model_name: str = None):
-        self.llm = LLMFactory.create_llm(model_name)
+        self.llm = LLMFactory.create_llm(model_name, stage="summarization")
         self.prompt_templates = PromptTemplates()
     
-    def summarize(self, question: str, sql_query: str, results: str) -> str:
+    def summarize(self, question: str, sql_query: str, results: str,
+                  llm_metrics: Dict = None) -> str:
         """
         Generate natural language summary of results
         
@@ -16,16 +19,22 @@ class SummarizationChain:
             question: Original natural language question
             sql_query: SQL query that was executed
             results: Formatted results as string
+            llm_metrics: Optional dict that receives the Ollama generation metrics
             
         Returns:
             Natural language summary
         """
         
-        prompt = self.prompt_templates.SUMMARIZATION_PROMPT.format(
-            question=question,
-            sql_query=sql_query,
-            results=results
-        )
+        builder = PromptBuilder(self.prompt_templates.SUMMARIZATION_PROMPT, stage="summarization")
+        builder.add_section("question", question, required=True)
+        builder.add_section("sql_query", sql_query, required=True)
+        # Trailing result rows are dropped first when over budget
+        builder.add_section("results", items=results.split("\n"), separator="\n")
+        prompt = builder.build()
         
-        summary = self.llm.invoke(prompt).strip()
-        return summary
+        summary, call_metrics = self.llm.invoke_with_metrics(prompt, stage="summarization")
+        
+        if llm_metrics is not None:
+            llm_metrics.update(call_metrics)
+        
+        return summary.strip()
@@ -1,20 +1,41 @@
 from src.database.connection import DatabaseConnection
+from src.database.value_index import format_value_hints
+from src.handlers.feedback_handler import FeedbackHandler
 from src.query.generator import QueryGenerator
 from src.query.executor import QueryExecutor
+from src.query.cost_guard import QueryCostGuard
 from src.query.validator import SQLValidator
 from src.chain.summarization_chain import SummarizationChain
-from typing import Dict, Optional
+from src.llm.metered_llm import summarize_llm_metrics
+from src.utils.metrics import metrics, timed
+from typing import Dict, List, Optional
 from config.settings import Settings
+import time
 
 class TextToSQLChain:
     """Main chain for Text-To-SQL pipeline"""
     
-    def __init__(self, db_path: str = None, model_name: str = None):
-        self.db = DatabaseConnection(db_path)
+    def __init__(self, db_path: str = None, model_name: str = None,
+                 db_connection: DatabaseConnection = None,
+                 feedback_handler: FeedbackHandler = None):
+        """
+        Args:
+            db_path: Path to the SQLite database
+            model_name: Ollama model to use
+            db_connection: Existing connection to share instead of opening one;
+                           it is left open by close()
+            feedback_handler: Feedback store to learn from (defaults to the
+                              shared Settings.FEEDBACK_DB_PATH)
+        """
+        self._owns_db = db_connection is None
+        self.db = db_connection or DatabaseConnection(db_path)
         self.db.connect()
+        if Settings.COLUMN_PROFILE_ENABLED:
+            self.db.start_profiler(background=Settings.COLUMN_PROFILE_BACKGROUND)
         
-        self.generator = QueryGenerator(model_name)
+        self.generator = QueryGenerator(model_name, feedback_handler)
         self.executor = QueryExecutor(self.db)
+        self.cost_guard = QueryCostGuard(self.db) if Settings.COST_GUARD_ENABLED else None
         self.validator = SQLValidator()
         self.summarizer = SummarizationChain(model_name)
         
@@ -22,7 +43,8 @@ class TextToSQLChain:
     
     def run(self, question: str, max_retries: int = None, 
             use_few_shot: bool = False, use_chain_of_thought: bool = False,
-            use_feedback_learning: bool = True) -> Dict:
+            use_feedback_learning: bool = True, columnar: bool = False,
+            max_rows: int = None) -> Dict:
         """
         Run the complete Text-To-SQL chain
         
@@ -32,26 +54,48 @@ class TextToSQLChain:
             use_few_shot: Use few-shot prompting
             use_chain_of_thought: Use chain-of-thought prompting
             use_feedback_learning: Use feedback learning (enabled by default)
+            columnar: Return result rows as a ColumnarResult (column arrays that
+                convert to a DataFrame without copying) instead of row lists
+            max_rows: Read at most this many result rows; results["truncated"]
+                tells whether more exist (they are never fetched)
             
         Returns:
             Dictionary with results including question, query, results, summary, errors
+            per-stage timings (seconds) for the run and for each attempt, the
+            Ollama generation metrics of every LLM call, and the cost guard
+            decision for the last checked query (None when the guard is off)
         """
         
         if max_retries is None:
             max_retries = Settings.MAX_RETRIES
         
+        run_start = time.perf_counter()
+        
+        # Cheap when nothing changed; picks up column statistics once profiled
+        self.schema = self.db.get_schema()
+        
         result = {
             "question": question,
             "sql_query": None,
             "results": None,
             "summary": None,
             "error": None,
-            "attempts": []
+            "attempts": [],
+            "timings": {},
+            "llm_metrics": {},
+            "cost_guard": None
         }
         
+        with timed(result["timings"], "schema_hints"):
+            hints = self.get_schema_hints(question)
+        
         attempt = 0
         
         while attempt <= max_retries:
+            attempt_start = time.perf_counter()
+            attempt_timings = {}
+            attempt_llm_metrics = {}
+            
             try:
                 # Generate SQL
                 if attempt == 0:
@@ -60,75 +104,171 @@ class TextToSQLChain:
                         self.schema,
                         use_few_shot=use_few_shot,
                         use_chain_of_thought=use_chain_of_thought,
-                        use_feedback_learning=use_feedback_learning
+                        use_feedback_learning=use_feedback_learning,
+                        timings=attempt_timings,
+                        llm_metrics=attempt_llm_metrics,
+                        hints=hints
                     )
                 else:
                     # Regenerate with error feedback
                     last_error = result["attempts"][-1]["error"]
                     last_query = result["attempts"][-1]["query"]
                     sql_query = self.generator.regenerate_with_error(
-                        question, self.schema, last_query, last_error
+                        question, self.schema, last_query, last_error,
+                        timings=attempt_timings,
+                        llm_metrics=attempt_llm_metrics,
+                        hints=hints
                     )
                 
                 result["attempts"].append({
                     "attempt": attempt + 1,
                     "query": sql_query,
-                    "error": None
+                    "error": None,
+                    "timings": attempt_timings,
+                    "llm_metrics": attempt_llm_metrics
                 })
                 
                 # Validate syntax
-                is_valid, validation_error = self.validator.validate_syntax(sql_query)
+                with timed(attempt_timings, "validation"):
+                    is_valid, validation_error = self.validator.validate_syntax(sql_query)
                 
                 if not is_valid:
                     result["attempts"][-1]["error"] = validation_error
+                    self._finish_attempt(attempt_timings, attempt_start)
                     attempt += 1
                     continue
                 
+                # Check the plan's cost before running it
+                if self.cost_guard is not None:
+                    with timed(attempt_timings, "cost_guard"):
+                        decision = self.cost_guard.check(sql_query)
+                    result["attempts"][-1]["cost_guard"] = decision
+                    result["cost_guard"] = decision
+                    
+                    if decision["action"] == "reject":
+                        result["attempts"][-1]["error"] = decision["reason"]
+                        result["error"] = decision["reason"]
+                        self._finish_attempt(attempt_timings, attempt_start)
+                        break
+                    if decision["action"] == "regenerate":
+                        # The retry prompt gets the issues as the error to fix
+                        result["attempts"][-1]["error"] = (
+                            f"{decision['reason']}. Add the missing join conditions or filters."
+                        )
+                        self._finish_attempt(attempt_timings, attempt_start)
+                        attempt += 1
+                        continue
+                    sql_query = decision["query"]
+                
                 # Execute query
-                query_result, execution_error = self.executor.execute(sql_query)
+                with timed(attempt_timings, "execution"):
+                    # One extra row tells whether the result was cut
+                    query_result, execution_error = self.executor.execute(
+                        sql_query, columnar=columnar,
+                        max_rows=max_rows + 1 if max_rows is not None else None
+                    )
                 
                 if execution_error:
                     result["attempts"][-1]["error"] = execution_error
+                    self._finish_attempt(attempt_timings, attempt_start)
                     attempt += 1
                     continue
                 
+                self._finish_attempt(attempt_timings, attempt_start)
+                
                 # Success!
                 columns, rows = query_result
+                truncated = max_rows is not None and len(rows) > max_rows
+                if truncated:
+                    if columnar:
+                        rows.truncate(max_rows)
+                    else:
+                        del rows[max_rows:]
                 result["sql_query"] = sql_query
                 result["results"] = {
                     "columns": columns,
-                    "rows": rows
+                    "rows": rows,
+                    "truncated": truncated
                 }
                 
                 # Format results
-                formatted_results = self.executor.format_results(columns, rows)
+                with timed(result["timings"], "formatting"):
+                    formatted_results = self.executor.format_results(columns, rows, truncated=truncated)
                 
                 # Summarize
-                result["summary"] = self.summarizer.summarize(
-                    question, sql_query, formatted_results
-                )
+                summary_llm_metrics = {}
+                with timed(result["timings"], "summarization"):
+                    result["summary"] = self.summarizer.summarize(
+                        question, sql_query, formatted_results,
+                        llm_metrics=summary_llm_metrics
+                    )
+                result["llm_metrics"]["summarization"] = summary_llm_metrics
                 
                 break
                 
             except Exception as e:
-                if result["attempts"]:
+                if result["attempts"] and result["attempts"][-1]["attempt"] == attempt + 1:
                     result["attempts"][-1]["error"] = str(e)
                 else:
                     result["attempts"].append({
                         "attempt": attempt + 1,
                         "query": None,
-                        "error": str(e)
+                        "error": str(e),
+                        "timings": attempt_timings,
+                        "llm_metrics": attempt_llm_metrics
                     })
+                self._finish_attempt(attempt_timings, attempt_start)
                 attempt += 1
         
-        if result["sql_query"] is None:
-            result["error"] = "Failed to generate valid SQL after maximum retries"
+        if result["sql_query"] is None and result["error"] is None:
+            last_decision = result["attempts"][-1].get("cost_guard") if result["attempts"] else None
+            if last_decision and last_decision["action"] == "regenerate":
+                # The last query was blocked, not invalid: say why
+                result["error"] = last_decision["reason"]
+            else:
+                result["error"] = "Failed to generate valid SQL after maximum retries"
+        
+        # Per-run totals: sum of each stage across attempts plus post-processing
+        for attempt_result in result["attempts"]:
+            for stage, seconds in attempt_result["timings"].items():
+                if stage != "total":
+                    result["timings"][stage] = result["timings"].get(stage, 0.0) + seconds
+        result["timings"]["total"] = time.perf_counter() - run_start
+        
+        result["llm_metrics"]["total"] = summarize_llm_metrics(
+            [attempt_result["llm_metrics"] for attempt_result in result["attempts"]]
+            + [result["llm_metrics"].get("summarization")]
+        )
+        
+        metrics.observe_timings("chain.stage", result["timings"])
+        metrics.observe("chain.attempts", len(result["attempts"]))
         
         return result
     
+    def get_schema_hints(self, question: str) -> List[str]:
+        """
+        Get prompt hints grounding the question in the schema
+        
+        Which columns hold the cell values mentioned in the question, and the
+        foreign-key join paths between the tables the question refers to (by
+        name or through one of those values).
+        """
+        matches = self.db.find_values(question)
+        graph = self.db.get_join_graph()
+        tables = graph.mentioned_tables(question) | {table for _, table, _ in matches}
+        return format_value_hints(matches) + graph.join_hints(tables)
+    
+    def _finish_attempt(self, attempt_timings: Dict[str, float], attempt_start: float):
+        """Close an attempt: record its total duration and feed the histograms"""
+        if "total" in attempt_timings:
+            return
+        attempt_timings["total"] = time.perf_counter() - attempt_start
+        metrics.observe_timings("chain.attempt", attempt_timings)
+    
     def close(self):
-        """Close database connection"""
-        self.db.disconnect()
+        """Close database connection (unless it was shared with this chain)"""
+        if self._owns_db:
+            self.db.disconnect()
     
     def __enter__(self):
         return self
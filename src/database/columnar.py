@@ -0,0 +1,131 @@
+import json
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+from src.utils.lazy_imports import lazy_import
+
+# array typecodes for homogeneous SQLite columns (INTEGER is 64-bit, REAL is double)
+_TYPECODES = {int: "q", float: "d"}
+
+class ColumnarResult:
+    """
+    Query result stored column by column
+
+    Columns holding only INTEGER or only REAL values (no NULLs) are packed
+    into `array.array` buffers; anything else stays a Python list. Packed
+    columns take 8 bytes per value instead of a Python object each, and
+    NumPy/pandas can wrap them without copying.
+
+    The object also behaves like the usual list of rows (len, indexing,
+    slicing, iteration), so code written for `execute_query` rows keeps
+    working.
+    """
+
+    def __init__(self, columns: List[str], data: List[Sequence] = None):
+        self.columns = list(columns)
+        self.data: List[Sequence] = data if data is not None else [array("q") for _ in columns]
+        self._typed = [isinstance(column, array) for column in self.data]
+        self.num_rows = len(self.data[0]) if self.data else 0
+
+    @classmethod
+    def from_batches(cls, columns: List[str], batches: Iterable[List[Tuple]]) -> "ColumnarResult":
+        """Build a result from batches of row tuples (see DatabaseConnection.iter_query)"""
+        result = cls(columns)
+        for batch in batches:
+            result.extend(batch)
+        return result
+
+    def extend(self, rows: List[Sequence]):
+        """Append a batch of rows"""
+        if not rows:
+            return
+
+        for idx, values in enumerate(zip(*rows)):
+            column = self.data[idx]
+
+            if self._typed[idx]:
+                value_type = type(values[0])
+                typecode = _TYPECODES.get(value_type)
+                if typecode and all(type(value) is value_type for value in values):
+                    if not column:
+                        column = self.data[idx] = array(typecode)
+                    if column.typecode == typecode:
+                        column.extend(values)
+                        continue
+
+                # Mixed types or NULLs: fall back to a plain list for this column
+                column = self.data[idx] = column.tolist()
+                self._typed[idx] = False
+
+            column.extend(values)
+
+        self.num_rows += len(rows)
+
+    def truncate(self, num_rows: int):
+        """Drop every row after the first `num_rows`"""
+        for column in self.data:
+            del column[num_rows:]
+        self.num_rows = min(self.num_rows, num_rows)
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __iter__(self) -> Iterator[Tuple]:
+        return zip(*self.data) if self.data else iter([])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(*(column[index] for column in self.data)))
+        if index < 0:
+            index += self.num_rows
+        return tuple(column[index] for column in self.data)
+
+    def column(self, name: str) -> Sequence:
+        """Get one column's values"""
+        return self.data[self.columns.index(name)]
+
+    def column_arrays(self) -> List[Any]:
+        """
+        Get the columns as NumPy arrays, in column order
+
+        Packed columns are zero-copy views of the underlying buffers; the
+        others become object arrays. A list, not a dict by name, because a
+        join can return several columns with the same name.
+        """
+        np = lazy_import("numpy")
+        arrays = []
+        for column in self.data:
+            if isinstance(column, array):
+                arrays.append(np.frombuffer(column, dtype=column.typecode))
+            else:
+                arrays.append(np.array(column, dtype=object))
+        return arrays
+
+    def to_dataframe(self):
+        """Build a pandas DataFrame straight from the columns"""
+        pd = lazy_import("pandas")
+        if not self.columns:
+            return pd.DataFrame()
+        # Built by position, then named, so duplicate column names survive
+        df = pd.DataFrame(dict(enumerate(self.column_arrays())), copy=False)
+        df.columns = self.columns
+        return df
+
+    def to_rows(self) -> List[List]:
+        """Get the result as the usual list of row lists"""
+        return [list(row) for row in self]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a JSON-serializable, column-oriented representation"""
+        return {
+            "columns": self.columns,
+            "data": [column.tolist() if isinstance(column, array) else list(column)
+                     for column in self.data],
+            "num_rows": self.num_rows
+        }
+
+    def to_json(self) -> str:
+        """Serialize the result column by column"""
+        return json.dumps(self.to_dict(), default=str)
+
+    def __repr__(self):
+        return f"ColumnarResult(columns={self.columns}, rows={self.num_rows})"
@@ -1,7 +1,24 @@
 import sqlite3
 import os
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Iterator
 from config.settings import Settings
+from src.database.columnar import ColumnarResult
+from src.database.join_graph import JoinGraph
+from src.database.schema_format import SCHEMA_FORMATS, format_schema
+from src.database.profiler import ColumnProfiler, format_column_hint
+
+def _take_rows(batches: Iterator[List[Tuple]], max_rows: int) -> Iterator[List[Tuple]]:
+    """Pass batches through until `max_rows` rows, then close the cursor"""
+    taken = 0
+    try:
+        for batch in batches:
+            if taken + len(batch) >= max_rows:
+                yield batch[:max_rows - taken]
+                return
+            taken += len(batch)
+            yield batch
+    finally:
+        batches.close()
 
 class DatabaseConnection:
     """Manage database connections and operations"""
@@ -9,6 +26,9 @@ class DatabaseConnection:
     def __init__(self, db_path: str = None):
         self.db_path = db_path or Settings.DATABASE_PATH
         self.connection = None
+        self._schema_cache = None  # (schema_version, column profile, {format: schema text})
+        self.profiler: Optional[ColumnProfiler] = None
+        self._join_graph_cache = None  # (schema_version, JoinGraph)
         self._ensure_database_exists()
     
     def _ensure_database_exists(self):
@@ -27,7 +47,7 @@ class DatabaseConnection:
             CREATE TABLE IF NOT EXISTS employees (
                 id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
-                department_id INTEGER,
+                department_id INTEGER REFERENCES departments(id),
                 salary REAL,
                 hire_date TEXT
             )
@@ -45,7 +65,7 @@ class DatabaseConnection:
             CREATE TABLE IF NOT EXISTS projects (
                 id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
-                department_id INTEGER,
+                department_id INTEGER REFERENCES departments(id),
                 start_date TEXT,
                 end_date TEXT,
                 status TEXT
@@ -87,10 +107,18 @@ class DatabaseConnection:
             self.connection.close()
             self.connection = None
     
-    def execute_query(self, query: str) -> Tuple[Optional[Tuple[List, List]], Optional[str]]:
+    def execute_query(self, query: str, columnar: bool = False,
+                      max_rows: int = None) -> Tuple[Optional[Tuple[List, List]], Optional[str]]:
         """
         Execute a SQL query and return results
         
+        Args:
+            query: SQL query
+            columnar: Return rows as a ColumnarResult (column arrays) instead
+                of a list of row lists
+            max_rows: Stop reading after this many rows (the rest of the
+                result is never fetched)
+        
         Returns:
             Tuple of ((columns, rows), error)
         """
@@ -98,6 +126,17 @@ class DatabaseConnection:
             if not self.connection:
                 self.connect()
             
+            if columnar or max_rows is not None:
+                batch_size = Settings.QUERY_FETCH_BATCH_SIZE
+                if max_rows is not None:
+                    batch_size = max(min(batch_size, max_rows), 1)
+                columns, batches = self.iter_query(query, batch_size)
+                if max_rows is not None:
+                    batches = _take_rows(batches, max_rows)
+                if columnar:
+                    return (columns, ColumnarResult.from_batches(columns, batches)), None
+                return (columns, [list(row) for batch in batches for row in batch]), None
+            
             cursor = self.connection.cursor()
             cursor.execute(query)
             
@@ -111,34 +150,141 @@ class DatabaseConnection:
         except Exception as e:
             return None, str(e)
     
-    def get_schema(self) -> str:
-        """Get database schema as text"""
+    def iter_query(self, query: str, batch_size: int = None) -> Tuple[List[str], Iterator[List[Tuple]]]:
+        """
+        Execute a SQL query and stream its rows in fixed-size batches
+        
+        Unlike execute_query, errors are raised and rows are never fully
+        materialized, so memory stays bounded on large results.
+        
+        Returns:
+            Tuple of (columns, iterator over lists of row tuples)
+        """
+        if not self.connection:
+            self.connect()
+        
+        batch_size = batch_size or Settings.QUERY_FETCH_BATCH_SIZE
+        cursor = self.connection.cursor()
+        cursor.execute(query)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        
+        def batches():
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [tuple(row) for row in rows]
+            finally:
+                cursor.close()
+        
+        return columns, batches()
+    
+    def get_schema_version(self) -> int:
+        """Get SQLite's schema version counter (changes on every schema change)"""
+        if not self.connection:
+            self.connect()
+        return self.connection.execute("PRAGMA schema_version;").fetchone()[0]
+    
+    def start_profiler(self, background: bool = True) -> ColumnProfiler:
+        """
+        Start profiling columns so get_schema can annotate them
+        
+        Args:
+            background: Profile in a thread (get_schema stays unannotated until done)
+        """
+        if self.profiler is None:
+            self.profiler = ColumnProfiler(self.db_path)
+            self.profiler.start(background=background)
+        return self.profiler
+    
+    def cache_size(self) -> int:
+        """
+        Approximate bytes held by the schema texts, column profile (with its
+        value index) and join graph cached for this database
+        """
+        size = 0
+        if self._schema_cache is not None:
+            size += sum(len(text) for text in self._schema_cache[2].values())
+        if self.profiler is not None:
+            size += 2 * self.profiler.profile_size  # profile and value index
+        if self._join_graph_cache is not None:
+            paths = self._join_graph_cache[1].paths
+            size += 64 * sum(len(path) + 1 for path in paths.values())
+        return size
+    
+    def get_join_graph(self) -> JoinGraph:
+        """Get the foreign-key graph with shortest join paths (cached until the schema changes)"""
+        if not self.connection:
+            self.connect()
+        
+        schema_version = self.get_schema_version()
+        if self._join_graph_cache is None or self._join_graph_cache[0] != schema_version:
+            self._join_graph_cache = (schema_version, JoinGraph.from_connection(self.connection))
+        return self._join_graph_cache[1]
+    
+    def find_values(self, text: str) -> List[Tuple[str, str, str]]:
+        """
+        Find cell values mentioned in `text` (needs a finished column profile)
+        
+        Returns:
+            List of (value, table, column)
+        """
+        if self.profiler is None:
+            return []
+        if not self.connection:
+            self.connect()
+        if self.profiler.get(self.get_schema_version()) is None:
+            return []
+        return self.profiler.value_index.lookup(text)
+    
+    def get_schema(self, fmt: str = None) -> str:
+        """
+        Get database schema as text (cached until the schema changes)
+        
+        With a profiler running, columns are annotated with distinct counts,
+        ranges and sample values once the profile is ready.
+        
+        Args:
+            fmt: 'verbose', 'compact' or 'ddl' (defaults to Settings.SCHEMA_FORMAT)
+        """
+        fmt = fmt or Settings.SCHEMA_FORMAT
+        if fmt not in SCHEMA_FORMATS:
+            raise ValueError(f"Unknown schema format '{fmt}' (use one of: {', '.join(SCHEMA_FORMATS)})")
+        
         try:
             if not self.connection:
                 self.connect()
             
+            schema_version = self.get_schema_version()
+            profile = self.profiler.get(schema_version) if self.profiler else None
+            if (not self._schema_cache or self._schema_cache[0] != schema_version
+                    or self._schema_cache[1] is not profile):
+                self._schema_cache = (schema_version, profile, {})
+            texts = self._schema_cache[2]
+            if fmt in texts:
+                return texts[fmt]
+            
+            references = self.get_join_graph().references
             cursor = self.connection.cursor()
             
             # Get all tables
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
-            tables = cursor.fetchall()
-            
-            schema_text = "Database Schema:\n\n"
+            tables = []
             
-            for table in tables:
-                table_name = table[0]
+            for (table_name,) in cursor.fetchall():
                 cursor.execute(f"PRAGMA table_info({table_name});")
-                columns = cursor.fetchall()
+                column_stats = profile["tables"].get(table_name, {}) if profile else {}
                 
-                schema_text += f"Table: {table_name}\n"
-                for col in columns:
-                    col_name = col[1]
-                    col_type = col[2]
-                    pk = " (PRIMARY KEY)" if col[5] else ""
-                    schema_text += f"  - {col_name} {col_type}{pk}\n"
-                schema_text += "\n"
+                # PRAGMA table_info rows: (cid, name, type, notnull, default, pk)
+                tables.append((table_name, [
+                    (col[1], col[2], col[5], references.get((table_name, col[1])),
+                     format_column_hint(column_stats[col[1]]) if col[1] in column_stats else "")
+                    for col in cursor.fetchall()
+                ]))
             
-            return schema_text
+            texts[fmt] = format_schema(tables, fmt)
+            return texts[fmt]
         except Exception as e:
             return f"Error getting schema: {str(e)}"
     
@@ -148,6 +294,7 @@ class DatabaseConnection:
             if not self.connection:
                 self.connect()
             
+            references = self.get_join_graph().references
             cursor = self.connection.cursor()
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
             tables = cursor.fetchall()
@@ -164,7 +311,8 @@ class DatabaseConnection:
                         "name": col[1],
                         "type": col[2],
                         "nullable": not col[3],
-                        "primary_key": bool(col[5])
+                        "primary_key": bool(col[5]),
+                        "references": references.get((table_name, col[1]))
                     }
                     for col in columns
                 ]
@@ -0,0 +1,147 @@
+import sqlite3
+from collections import deque
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config.settings import Settings
+from src.database.profiler import quote_identifier, sql_identifier
+from src.database.value_index import normalize_text
+
+class ForeignKey:
+    """One (possibly multi-column) foreign key: from_table(columns) -> to_table(columns)"""
+
+    def __init__(self, from_table: str, to_table: str, column_pairs: List[Tuple[str, str]]):
+        self.from_table = from_table
+        self.to_table = to_table
+        self.column_pairs = column_pairs
+
+    def condition(self) -> str:
+        """Join condition, e.g. 'employees.department_id = departments.id'"""
+        from_table, to_table = sql_identifier(self.from_table), sql_identifier(self.to_table)
+        return " AND ".join(
+            f"{from_table}.{sql_identifier(from_column)} = {to_table}.{sql_identifier(to_column)}"
+            for from_column, to_column in self.column_pairs
+        )
+
+class JoinGraph:
+    """
+    Foreign-key graph of a database with shortest join paths between tables
+
+    Built once per schema version from `PRAGMA foreign_key_list`. Paths are
+    precomputed with a breadth-first search from every table, treating
+    foreign keys as undirected edges, so a question-time lookup is a
+    dictionary access.
+    """
+
+    def __init__(self, tables: List[str], foreign_keys: List[ForeignKey]):
+        self.tables = tables
+        self.foreign_keys = foreign_keys
+        self.references: Dict[Tuple[str, str], str] = {}  # (table, column) -> "table.column"
+        self.adjacency: Dict[str, List[Tuple[str, ForeignKey]]] = {table: [] for table in tables}
+
+        # SQLite names are case-insensitive: REFERENCES Student(id) targets table student
+        names = {table.lower(): table for table in tables}
+        for key in foreign_keys:
+            key.to_table = names.get(key.to_table.lower(), key.to_table)
+            key.from_table = names.get(key.from_table.lower(), key.from_table)
+
+        for key in foreign_keys:
+            for from_column, to_column in key.column_pairs:
+                self.references[(key.from_table, from_column)] = f"{key.to_table}.{to_column}"
+            if key.from_table in self.adjacency and key.to_table in self.adjacency:
+                self.adjacency[key.from_table].append((key.to_table, key))
+                self.adjacency[key.to_table].append((key.from_table, key))
+
+        self.paths: Dict[Tuple[str, str], List[ForeignKey]] = {}
+        for table in tables:
+            self._search_from(table)
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> "JoinGraph":
+        """Read tables and foreign keys from an open SQLite connection"""
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';"
+        )]
+
+        foreign_keys = []
+        for table in tables:
+            grouped: Dict[int, Tuple[str, List]] = {}
+            # Rows: (id, seq, table, from, to, on_update, on_delete, match)
+            for row in conn.execute(f"PRAGMA foreign_key_list({quote_identifier(table)});"):
+                key_id, _, to_table, from_column, to_column = row[0], row[1], row[2], row[3], row[4]
+                grouped.setdefault(key_id, (to_table, []))[1].append((from_column, to_column))
+
+            for to_table, pairs in grouped.values():
+                # A missing target column means the referenced table's primary key
+                if any(to_column is None for _, to_column in pairs):
+                    primary_key = [row[1] for row in sorted(
+                        (row for row in conn.execute(f"PRAGMA table_info({quote_identifier(to_table)});") if row[5]),
+                        key=lambda row: row[5]
+                    )]
+                    pairs = [(from_column, primary_key[idx] if idx < len(primary_key) else "rowid")
+                             for idx, (from_column, _) in enumerate(pairs)]
+                foreign_keys.append(ForeignKey(table, to_table, pairs))
+
+        return cls(tables, foreign_keys)
+
+    def _search_from(self, source: str):
+        """Breadth-first search recording the shortest path from `source` to every reachable table"""
+        parents: Dict[str, Optional[Tuple[str, ForeignKey]]] = {source: None}
+        queue = deque([source])
+
+        while queue:
+            table = queue.popleft()
+            for neighbor, key in self.adjacency[table]:
+                if neighbor not in parents:
+                    parents[neighbor] = (table, key)
+                    queue.append(neighbor)
+
+        for target in parents:
+            if target == source:
+                continue
+            path = []
+            table = target
+            while parents[table] is not None:
+                previous, key = parents[table]
+                path.append(key)
+                table = previous
+            self.paths[(source, target)] = path[::-1]
+
+    def shortest_path(self, source: str, target: str) -> Optional[List[ForeignKey]]:
+        """Foreign keys to join along from `source` to `target`, or None if unconnected"""
+        return self.paths.get((source, target))
+
+    def mentioned_tables(self, question: str) -> Set[str]:
+        """Tables whose name (singular or plural) appears in a question"""
+        words = {_singular(word) for word in normalize_text(question).split()}
+        return {
+            table for table in self.tables
+            if all(_singular(word) in words for word in normalize_text(table.replace("_", " ")).split())
+        }
+
+    def join_hints(self, tables: Iterable[str], max_hints: int = None) -> List[str]:
+        """
+        Format join paths between pairs of tables as prompt hints
+
+        Example: "- To join employees and projects: employees.department_id =
+        departments.id, projects.department_id = departments.id"
+        """
+        max_hints = max_hints or Settings.JOIN_HINTS_MAX
+        hints = []
+
+        for source, target in combinations(sorted(set(tables)), 2):
+            path = self.shortest_path(source, target)
+            if path:
+                conditions = ", ".join(key.condition() for key in path)
+                hints.append(f"- To join {source} and {target}: {conditions}")
+            if len(hints) >= max_hints:
+                break
+
+        return hints
+
+def _singular(word: str) -> str:
+    """Crude singular form so 'employees' matches 'employee'"""
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
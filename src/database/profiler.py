@@ -0,0 +1,277 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+from config.settings import Settings
+from src.database.value_index import ValueIndex
+
+# Bumped whenever the profile layout changes, so old sidecar files are recomputed
+PROFILE_FORMAT = 2
+
+_SIMPLE_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Keywords that tables and columns are commonly named after
+_RESERVED_WORDS = {
+    "ADD", "ALL", "ALTER", "AND", "AS", "ASC", "BETWEEN", "BY", "CASE", "CAST", "CHECK",
+    "COLLATE", "COLUMN", "CONSTRAINT", "CREATE", "CROSS", "DEFAULT", "DELETE", "DESC",
+    "DISTINCT", "DROP", "ELSE", "END", "ESCAPE", "EXCEPT", "EXISTS", "FILTER", "FOREIGN",
+    "FROM", "FULL", "GLOB", "GROUP", "GROUPS", "HAVING", "IN", "INDEX", "INNER", "INSERT",
+    "INTERSECT", "INTO", "IS", "ISNULL", "JOIN", "KEY", "LEFT", "LIKE", "LIMIT", "MATCH",
+    "NATURAL", "NOT", "NOTNULL", "NULL", "OFFSET", "ON", "OR", "ORDER", "OUTER", "OVER",
+    "PARTITION", "PRIMARY", "RANGE", "REFERENCES", "REGEXP", "RIGHT", "ROWS", "SELECT",
+    "SET", "TABLE", "THEN", "TO", "TRANSACTION", "UNION", "UNIQUE", "UPDATE", "USING",
+    "VALUES", "WHEN", "WHERE", "WINDOW", "WITH"
+}
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for SQLite"""
+    return '"' + name.replace('"', '""') + '"'
+
+def sql_identifier(name: str) -> str:
+    """Quote a table or column name only when SQL text needs it (spaces, keywords, ...)"""
+    if _SIMPLE_IDENTIFIER.match(name) and name.upper() not in _RESERVED_WORDS:
+        return name
+    return quote_identifier(name)
+
+class ColumnProfiler:
+    """
+    Per-column statistics used to annotate the schema prompt
+
+    For every column: distinct count, min/max and, for text columns with few
+    distinct values, the most frequent values. Statistics come from the first
+    `sample_rows` rows of each table, so profiling stays cheap on large
+    tables. The profile is computed once per data version (schema version
+    plus database file size and modification time), in a background thread,
+    and saved to a JSON sidecar file next to the database.
+
+    The full value lists of low-cardinality text columns are kept too and
+    feed `value_index`, which maps values mentioned in a question to columns.
+    """
+
+    def __init__(self, db_path: str, cache_path: str = None, top_k: int = None,
+                 sample_rows: int = None, max_distinct: int = None):
+        """
+        Args:
+            db_path: SQLite database to profile
+            cache_path: Sidecar file (defaults to '<db_path>.profile.json')
+            top_k: Sample values kept per text column
+            sample_rows: Rows read per table
+            max_distinct: Text columns with more distinct values get no sample values
+        """
+        self.db_path = db_path
+        self.cache_path = cache_path or f"{db_path}.profile.json"
+        self.top_k = top_k or Settings.COLUMN_PROFILE_TOP_K
+        self.sample_rows = sample_rows or Settings.COLUMN_PROFILE_SAMPLE_ROWS
+        self.max_distinct = max_distinct or Settings.COLUMN_PROFILE_MAX_DISTINCT
+        self.profile: Optional[Dict] = None
+        self.profile_size = 0  # characters of the serialized profile
+        self.value_index = ValueIndex()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._requested: Optional[List] = None
+
+    def fingerprint(self, schema_version: int) -> List:
+        """Identify the current data version of the database"""
+        stat = os.stat(self.db_path)
+        return [schema_version, stat.st_size, stat.st_mtime_ns]
+
+    def get(self, schema_version: int) -> Optional[Dict]:
+        """
+        Get the profile if it matches the current data version
+
+        A missing or outdated profile returns None and starts a background
+        refresh, so callers never wait for profiling.
+        """
+        fingerprint = self.fingerprint(schema_version)
+        profile = self.profile
+        if profile is not None and profile["fingerprint"] == fingerprint:
+            return profile
+
+        # Refresh once per data version (also after a failed attempt)
+        if fingerprint != self._requested:
+            self._requested = fingerprint
+            self.start(background=True)
+        return None
+
+    def start(self, background: bool = True):
+        """
+        Load the sidecar profile or compute a new one
+
+        Args:
+            background: Compute in a daemon thread instead of blocking
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            if self._load():
+                return
+
+            if background:
+                self._thread = threading.Thread(target=self.refresh, daemon=True,
+                                                name="column-profiler")
+                self._thread.start()
+                return
+
+        self.refresh()
+
+    def wait(self, timeout: float = None):
+        """Wait for a background refresh to finish"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _load(self) -> bool:
+        """Use the sidecar file if it matches the database; returns True on success"""
+        if not os.path.exists(self.cache_path):
+            return False
+
+        try:
+            with open(self.cache_path, "r") as f:
+                profile = json.load(f)
+            conn = sqlite3.connect(self.db_path)
+            try:
+                schema_version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+            finally:
+                conn.close()
+        except (OSError, ValueError, sqlite3.Error):
+            return False
+
+        if (profile.get("format") != PROFILE_FORMAT
+                or profile.get("fingerprint") != self.fingerprint(schema_version)):
+            return False
+
+        self._publish(profile)
+        return True
+
+    def _publish(self, profile: Dict):
+        """Make a profile and its value index current"""
+        value_index = ValueIndex()
+        for table, columns in profile["tables"].items():
+            for column, stats in columns.items():
+                if stats.get("values"):
+                    value_index.add(table, column, stats["values"])
+
+        self.value_index = value_index
+        self.profile_size = len(json.dumps(profile))
+        self.profile = profile
+
+    def refresh(self):
+        """Compute the profile now and write the sidecar file"""
+        try:
+            profile = self.compute()
+        except sqlite3.Error as e:
+            print(f"⚠️  Column profiling failed for {self.db_path}: {e}")
+            return
+
+        self._publish(profile)
+        try:
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(profile, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass  # read-only location: keep the profile in memory only
+
+    def compute(self) -> Dict:
+        """Profile every table with sampled queries on a separate read-only connection"""
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            schema_version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+            tables = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';"
+            )]
+            profile = {
+                "format": PROFILE_FORMAT,
+                "fingerprint": self.fingerprint(schema_version),
+                "tables": {table: self._profile_table(conn, table) for table in tables}
+            }
+        finally:
+            conn.close()
+
+        return profile
+
+    def _profile_table(self, conn: sqlite3.Connection, table: str) -> Dict[str, Dict]:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)});")]
+        if not columns:
+            return {}
+
+        sample = f"(SELECT * FROM {quote_identifier(table)} LIMIT {self.sample_rows})"
+        sampled_rows = conn.execute(f"SELECT COUNT(*) FROM {sample}").fetchone()[0]
+        sampled = sampled_rows >= self.sample_rows
+
+        # One pass for distinct counts and ranges of all columns
+        aggregates = ", ".join(
+            f"COUNT(DISTINCT {quote_identifier(column)}), "
+            f"MIN({quote_identifier(column)}), MAX({quote_identifier(column)})"
+            for column in columns
+        )
+        values = conn.execute(f"SELECT {aggregates} FROM {sample}").fetchone()
+
+        stats = {}
+        for idx, column in enumerate(columns):
+            distinct, minimum, maximum = values[idx * 3:idx * 3 + 3]
+            column_stats = {
+                "distinct": distinct,
+                "min": _json_value(minimum),
+                "max": _json_value(maximum),
+                "sampled": sampled,
+                "top": []
+            }
+
+            if isinstance(minimum, str) and 0 < distinct <= self.max_distinct:
+                quoted = quote_identifier(column)
+                column_stats["top"] = [row[0] for row in conn.execute(
+                    f"SELECT {quoted}, COUNT(*) AS n FROM {sample} "
+                    f"WHERE typeof({quoted}) = 'text' "
+                    f"GROUP BY {quoted} ORDER BY n DESC, {quoted} LIMIT {self.top_k}"
+                )]
+
+            # Value list of low-cardinality text columns for the value index,
+            # read from the same sample so profiling never scans a whole
+            # table (values that first appear past the sample are not indexed)
+            if isinstance(minimum, str) and distinct <= Settings.VALUE_INDEX_MAX_DISTINCT:
+                quoted = quote_identifier(column)
+                column_stats["values"] = [row[0] for row in conn.execute(
+                    f"SELECT DISTINCT {quoted} FROM {sample} WHERE typeof({quoted}) = 'text'"
+                )]
+
+            stats[column] = column_stats
+
+        return stats
+
+def _json_value(value: Any) -> Any:
+    """Keep values the sidecar file can store (BLOBs are dropped)"""
+    return None if isinstance(value, bytes) else value
+
+def _short(value: Any, max_length: int) -> str:
+    text = str(value)
+    return text if len(text) <= max_length else text[:max_length - 3] + "..."
+
+def format_column_hint(stats: Dict, top_k: int = None, max_length: int = None) -> str:
+    """
+    Format column statistics compactly for the schema text
+
+    Examples: "values: 'active', 'completed'", "7 distinct, e.g. 'HR', 'Sales'",
+    "~1200 distinct, 2018-07-12..2021-06-10". A leading "~" marks statistics
+    from a sample of the table.
+    """
+    top_k = top_k or Settings.COLUMN_PROFILE_TOP_K
+    max_length = max_length or Settings.COLUMN_PROFILE_MAX_VALUE_LENGTH
+
+    distinct = stats["distinct"]
+    if not distinct:
+        return ""
+
+    count = f"{'~' if stats['sampled'] else ''}{distinct} distinct"
+    top = ", ".join(f"'{_short(value, max_length)}'" for value in stats["top"])
+
+    if top and distinct <= top_k and not stats["sampled"]:
+        return f"values: {top}"
+    if top:
+        return f"{count}, e.g. {top}"
+    if stats["min"] is not None:
+        return f"{count}, {_short(stats['min'], max_length)}..{_short(stats['max'], max_length)}"
+    return count
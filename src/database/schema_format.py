@@ -0,0 +1,88 @@
+import re
+from typing import List, Optional, Tuple
+
+SCHEMA_FORMATS = ("verbose", "compact", "ddl")
+
+# (name, declared type, primary key position (0 = not part of the key),
+#  referenced "table.column" or None, statistics hint or "")
+Column = Tuple[str, str, int, Optional[str], str]
+
+_SIMPLE_IDENTIFIER = re.compile(r"^[A-Za-z_]\w*$")
+_TYPE_SIZE = re.compile(r"\s*\(.*\)$")
+
+def _name(identifier: str) -> str:
+    """Quote identifiers that are not plain words (e.g. Spider's 'Home Town')"""
+    if _SIMPLE_IDENTIFIER.match(identifier):
+        return identifier
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _short_type(col_type: str) -> str:
+    """Lower-case a declared type without its size: 'VARCHAR(255)' -> 'varchar'"""
+    short = _TYPE_SIZE.sub("", col_type).lower()
+    return "int" if short == "integer" else short
+
+def format_schema(tables: List[Tuple[str, List[Column]]], fmt: str = "verbose") -> str:
+    """
+    Render tables and columns as schema text for the prompt
+
+    Formats, from most to least tokens:
+    - verbose: "Table: employees" followed by one "  - id INTEGER (PRIMARY KEY)" line per column
+    - ddl: "CREATE TABLE employees (id INTEGER PRIMARY KEY, ...);" (no type sizes or constraints)
+    - compact: "employees(id:int*, department_id:int->departments.id, ...)"
+
+    Tables are always separated by a blank line, so prompt budgets can drop
+    trailing tables in every format.
+    """
+    if fmt not in SCHEMA_FORMATS:
+        raise ValueError(f"Unknown schema format '{fmt}' (use one of: {', '.join(SCHEMA_FORMATS)})")
+
+    format_table = _TABLE_FORMATTERS[fmt]
+    # The compact formats drop the heading: prompt templates already have one
+    header = "Database Schema:\n\n" if fmt == "verbose" else ""
+    return header + "".join(format_table(table, columns) + "\n\n" for table, columns in tables)
+
+def _format_verbose(table: str, columns: List[Column]) -> str:
+    lines = [f"Table: {table}"]
+    for name, col_type, pk, reference, hint in columns:
+        pk = " (PRIMARY KEY)" if pk else ""
+        fk = f" (REFERENCES {reference})" if reference else ""
+        hint = f" [{hint}]" if hint else ""
+        lines.append(f"  - {name} {col_type}{pk}{fk}{hint}")
+    return "\n".join(lines)
+
+def _format_compact(table: str, columns: List[Column]) -> str:
+    parts = []
+    for name, col_type, pk, reference, hint in columns:
+        col_type = _short_type(col_type)
+        part = _name(name) + (f":{col_type}" if col_type else "") + ("*" if pk else "")
+        if reference:
+            part += f"->{reference}"
+        if hint:
+            part += f"[{hint}]"
+        parts.append(part)
+    return f"{_name(table)}({', '.join(parts)})"
+
+def _format_ddl(table: str, columns: List[Column]) -> str:
+    primary_key = [name for name, _, pk, _, _ in sorted(columns, key=lambda col: col[2]) if pk]
+    parts = []
+    for name, col_type, pk, reference, hint in columns:
+        col_type = _TYPE_SIZE.sub("", col_type)
+        part = _name(name) + (f" {col_type}" if col_type else "")
+        if pk and len(primary_key) == 1:
+            part += " PRIMARY KEY"
+        if reference:
+            ref_table, _, ref_column = reference.partition(".")
+            part += f" REFERENCES {_name(ref_table)}({_name(ref_column)})"
+        if hint:
+            # Sample values come from the data: a '*/' in one must not end the comment
+            part += f" /* {hint.replace('*/', '* /')} */"
+        parts.append(part)
+    if len(primary_key) > 1:
+        parts.append(f"PRIMARY KEY ({', '.join(_name(name) for name in primary_key)})")
+    return f"CREATE TABLE {_name(table)} ({', '.join(parts)});"
+
+_TABLE_FORMATTERS = {
+    "verbose": _format_verbose,
+    "compact": _format_compact,
+    "ddl": _format_ddl
+}
@@ -0,0 +1,92 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+from config.settings import Settings
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Single words too common to be useful as value matches
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it many much no not of on or "
+    "show that the their there to was what when where which who with yes".split()
+)
+
+def normalize_text(text: str) -> str:
+    """Case-fold and reduce punctuation and whitespace to single spaces"""
+    return " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+
+class ValueIndex:
+    """
+    Inverted index from normalized text cell values to the columns holding them
+
+    Only low-cardinality text columns are indexed (see ColumnProfiler). A
+    question is matched by looking up its word n-grams, longest first, so a
+    lookup is a few dozen dictionary probes.
+    """
+
+    def __init__(self, max_tokens: int = None):
+        """
+        Args:
+            max_tokens: Longest value (in words) that is indexed
+        """
+        self.max_tokens = max_tokens or Settings.VALUE_INDEX_MAX_TOKENS
+        self.postings: Dict[str, Dict[Tuple[str, str], str]] = {}
+        self.longest = 0
+
+    def add(self, table: str, column: str, values: Iterable[str]):
+        """Index the distinct values of one column"""
+        for value in values:
+            key = normalize_text(value)
+            if len(key) < 2 or key in _STOPWORDS or key.replace(" ", "").isdigit():
+                continue
+
+            length = key.count(" ") + 1
+            if length > self.max_tokens:
+                continue
+
+            self.postings.setdefault(key, {}).setdefault((table, column), value)
+            self.longest = max(self.longest, length)
+
+    def lookup(self, question: str) -> List[Tuple[str, str, str]]:
+        """
+        Find indexed values mentioned in a question
+
+        Longer matches win over the words they contain ("Website Redesign"
+        over "Website").
+
+        Returns:
+            List of (value, table, column) in question order
+        """
+        tokens = normalize_text(question).split()
+        covered = [False] * len(tokens)
+        found = []
+
+        for length in range(min(self.longest, len(tokens)), 0, -1):
+            for start in range(len(tokens) - length + 1):
+                if any(covered[start:start + length]):
+                    continue
+
+                locations = self.postings.get(" ".join(tokens[start:start + length]))
+                if not locations:
+                    continue
+
+                covered[start:start + length] = [True] * length
+                found.extend((start, value, table, column)
+                             for (table, column), value in locations.items())
+
+        found.sort(key=lambda match: match[0])
+        return [(value, table, column) for _, value, table, column in found]
+
+    def __len__(self):
+        return len(self.postings)
+
+def format_value_hints(matches: List[Tuple[str, str, str]], max_hints: int = None) -> List[str]:
+    """Format value matches as prompt hints, one line per value"""
+    max_hints = max_hints or Settings.VALUE_INDEX_MAX_HINTS
+    locations: Dict[str, List[str]] = {}
+    for value, table, column in matches:
+        locations.setdefault(value, []).append(f"{table}.{column}")
+
+    return [
+        f"- '{value}' is a value of {', '.join(columns)}"
+        for value, columns in list(locations.items())[:max_hints]
+    ]
@@ -5,7 +5,9 @@ class AmbiguityHandler:
     """Handle ambiguous questions"""
     
     def __init__(self, model_name: str = None):
-        self.llm = LLMFactory.create_llm(model_name)
+        self.llm = LLMFactory.create_llm(model_name, stage="clarification")
+        # YES/NO answers only need a few tokens
+        self.detection_llm = LLMFactory.create_llm(model_name, stage="ambiguity")
         self.prompt_templates = PromptTemplates()
     
     def detect_ambiguity(self, question: str, schema: str) -> bool:
@@ -20,14 +22,14 @@ class AmbiguityHandler:
             True if ambiguous, False otherwise
         """
         
-        prompt = f"""Is the following question ambiguous given the database schema?
+        # Schema before the question keeps the prompt prefix cacheable
+        prompt = f"""Is the question below ambiguous given the database schema? Answer with YES or NO only.
 
-Question: {question}
 Schema: {schema}
 
-Answer with YES or NO only."""
+Question: {question}"""
         
-        response = self.llm.invoke(prompt).strip().upper()
+        response = self.detection_llm.invoke(prompt, stage="ambiguity").strip().upper()
         return "YES" in response
     
     def clarify(self, question: str, schema: str) -> str:
@@ -47,5 +49,5 @@ Answer with YES or NO only."""
             schema=schema
         )
         
-        clarification = self.llm.invoke(prompt).strip()
+        clarification = self.llm.invoke(prompt, stage="clarification").strip()
         return clarification
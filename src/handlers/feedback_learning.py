@@ -7,19 +7,22 @@ class FeedbackLearningSystem:
     Implements a closed feedback loop by incorporating user feedback into prompts
     """
     
+    EXAMPLES_HEADER = "Here are some examples of good queries from previous interactions:\n\n"
+    CORRECTIONS_HEADER = "Learn from these common mistakes:\n\n"
+    
     def __init__(self, feedback_handler: FeedbackHandler = None):
         self.feedback_handler = feedback_handler or FeedbackHandler()
     
-    def build_learned_examples(self, question: str, max_examples: int = 3) -> str:
+    def get_example_items(self, question: str, max_examples: int = 3) -> List[str]:
         """
-        Build few-shot examples from positive feedback
+        Get formatted few-shot examples from positive feedback, most relevant first
         
         Args:
             question: Current question to find similar examples
             max_examples: Maximum number of examples to include
             
         Returns:
-            Formatted examples string for prompt
+            List of formatted examples (one "Example N" block each)
         """
         # First try to get similar queries
         similar = self.feedback_handler.get_similar_queries(question, limit=max_examples)
@@ -32,17 +35,50 @@ class FeedbackLearningSystem:
         else:
             examples = similar[:max_examples]
         
-        if not examples:
+        return [
+            f"Example {idx}:\n"
+            f"Question: {example['question']}\n"
+            f"SQL: {example['sql_query']}\n\n"
+            for idx, example in enumerate(examples, 1)
+        ]
+    
+    def build_learned_examples(self, question: str, max_examples: int = 3) -> str:
+        """
+        Build few-shot examples from positive feedback
+        
+        Args:
+            question: Current question to find similar examples
+            max_examples: Maximum number of examples to include
+            
+        Returns:
+            Formatted examples string for prompt
+        """
+        items = self.get_example_items(question, max_examples)
+        
+        if not items:
             return ""
         
-        examples_text = "Here are some examples of good queries from previous interactions:\n\n"
+        return self.EXAMPLES_HEADER + "".join(items)
+    
+    def get_correction_items(self, max_corrections: int = 2) -> List[str]:
+        """
+        Get formatted user corrections, most recent first
         
-        for idx, example in enumerate(examples, 1):
-            examples_text += f"Example {idx}:\n"
-            examples_text += f"Question: {example['question']}\n"
-            examples_text += f"SQL: {example['sql_query']}\n\n"
+        Args:
+            max_corrections: Maximum number of corrections to include
+            
+        Returns:
+            List of formatted corrections (one "Mistake N" block each)
+        """
+        corrections = self.feedback_handler.get_corrected_examples(limit=max_corrections)
         
-        return examples_text
+        return [
+            f"Mistake {idx}:\n"
+            f"Question: {correction['question']}\n"
+            f"Wrong: {correction['original_query']}\n"
+            f"Correct: {correction['corrected_query']}\n\n"
+            for idx, correction in enumerate(corrections, 1)
+        ]
     
     def build_correction_guidance(self, max_corrections: int = 2) -> str:
         """
@@ -54,20 +90,12 @@ class FeedbackLearningSystem:
         Returns:
             Formatted correction guidance for prompt
         """
-        corrections = self.feedback_handler.get_corrected_examples(limit=max_corrections)
+        items = self.get_correction_items(max_corrections)
         
-        if not corrections:
+        if not items:
             return ""
         
-        guidance_text = "Learn from these common mistakes:\n\n"
-        
-        for idx, correction in enumerate(corrections, 1):
-            guidance_text += f"Mistake {idx}:\n"
-            guidance_text += f"Question: {correction['question']}\n"
-            guidance_text += f"Wrong: {correction['original_query']}\n"
-            guidance_text += f"Correct: {correction['corrected_query']}\n\n"
-        
-        return guidance_text
+        return self.CORRECTIONS_HEADER + "".join(items)
     
     def enhance_prompt_with_feedback(self, base_prompt: str, question: str, 
                                     use_examples: bool = True, 
@@ -96,16 +124,34 @@ class FeedbackLearningSystem:
             if corrections:
                 enhancements.append(corrections)
         
+        return self.inject_feedback(base_prompt, enhancements)
+    
+    def inject_feedback(self, base_prompt: str, enhancements: List[str]) -> str:
+        """
+        Insert formatted feedback sections before the question of a prompt
+        
+        The question is the last "Question:" of the prompt (few-shot prompts
+        have more in their examples), so the feedback lands after the schema
+        and the static prefix of the prompt stays cacheable.
+        
+        Args:
+            base_prompt: Rendered prompt
+            enhancements: Feedback sections (empty ones are skipped)
+            
+        Returns:
+            Prompt with feedback inserted
+        """
+        enhancements = [text for text in enhancements if text]
+        
         if not enhancements:
             return base_prompt
         
         # Insert enhancements before the actual question
-        enhanced = base_prompt.replace(
-            "Question:", 
-            "\n".join(enhancements) + "Now generate SQL for this question:\n\nQuestion:"
-        )
+        head, marker, tail = base_prompt.rpartition("Question:")
+        if not marker:
+            return base_prompt
         
-        return enhanced
+        return head + "\n".join(enhancements) + "Now generate SQL for this question:\n\nQuestion:" + tail
     
     def get_learning_status(self) -> Dict:
         """
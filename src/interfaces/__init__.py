@@ -1,4 +1,15 @@
-from .cli import CLI
-from .web import WebInterface
+import importlib
+
+# Interfaces are resolved lazily so that the CLI never pays for gradio/pandas
+_INTERFACES = {
+    "CLI": ".cli",
+    "WebInterface": ".web",
+}
+
+def __getattr__(name):
+    if name in _INTERFACES:
+        module = importlib.import_module(_INTERFACES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = ["CLI", "WebInterface"]
@@ -5,16 +5,24 @@ from src.handlers.ambiguity_handler import AmbiguityHandler
 from src.handlers.feedback_handler import FeedbackHandler
 from src.handlers.feedback_learning import FeedbackLearningSystem
 from src.llm.llm_comparator import LLMComparator
+from src.llm.llm_factory import LLMFactory
+from src.query.exporter import QueryExporter
+from src.utils.metrics import metrics
 
 class CLI:
     """Command-line interface for Text-To-SQL"""
     
+    # Result rows printed (and read: exports stream the query again instead)
+    DISPLAY_ROWS = 10
+    
     def __init__(self, model_name: str = None):
         self.chain = TextToSQLChain(model_name=model_name)
         self.ambiguity_handler = AmbiguityHandler(model_name)
         self.feedback_handler = FeedbackHandler()
         self.learning_system = FeedbackLearningSystem(self.feedback_handler)
         self.comparator = LLMComparator()
+        self.exporter = QueryExporter(self.chain.db)
+        self.last_sql = None
     
     def print_header(self):
         """Print CLI header"""
@@ -46,19 +54,22 @@ class CLI:
                 columns = result["results"]["columns"]
                 rows = result["results"]["rows"]
                 
-                print(f"📊 Results ({len(rows)} row(s)):")
+                truncated = result["results"].get("truncated")
+                count = f"first {len(rows)}" if truncated else len(rows)
+                print(f"📊 Results ({count} row(s)):")
                 print()
                 
                 # Print table header
                 print("   " + " | ".join(str(col) for col in columns))
                 print("   " + "-" * (len(" | ".join(str(col) for col in columns))))
                 
-                # Print rows (limit to 10)
-                for row in rows[:10]:
+                for row in rows[:self.DISPLAY_ROWS]:
                     print("   " + " | ".join(str(val) if val is not None else "NULL" for val in row))
                 
-                if len(rows) > 10:
-                    print(f"\n   ... and {len(rows) - 10} more rows")
+                if truncated:
+                    print("\n   ... more rows were not loaded; export the result to get all of them")
+                elif len(rows) > self.DISPLAY_ROWS:
+                    print(f"\n   ... and {len(rows) - self.DISPLAY_ROWS} more rows")
             
             print()
             print(f"💬 Summary:")
@@ -129,11 +140,39 @@ class CLI:
             
             if result['success']:
                 print(f"   ✅ Query: {result['query']}")
+                generation = result["generation"]
+                if generation["ttft"] is not None:
+                    print(f"   TTFT: {generation['ttft']:.2f}s, "
+                          f"{generation['tokens_per_second'] or 0:.1f} tokens/s, "
+                          f"load: {generation['load_time'] or 0:.2f}s")
             else:
                 print(f"   ❌ Error: {result.get('error', 'Unknown error')}")
         
         print("=" * 70)
     
+    def export_results(self, sql_query: str, path: str):
+        """Stream the rows of a query to a CSV, JSONL or Parquet file"""
+        try:
+            row_count = self.exporter.export(sql_query, path)
+            print(f"💾 Exported {row_count} row(s) to {path}")
+        except Exception as e:
+            print(f"❌ Export failed: {str(e)}")
+    
+    def print_metrics(self):
+        """Print latency histograms collected in this session"""
+        snapshot = metrics.snapshot()["metrics"]
+        
+        print("\n⏱️  LATENCY METRICS")
+        print("-" * 70)
+        if not snapshot:
+            print("   No queries run yet.")
+        for name, summary in snapshot.items():
+            if summary["count"] == 0:
+                continue
+            print(f"   {name:<32} n={summary['count']:<5} "
+                  f"p50={summary['p50']:.3f} p95={summary['p95']:.3f} p99={summary['p99']:.3f}")
+        print("-" * 70)
+    
     def interactive_mode(self):
         """Run interactive CLI mode"""
         self.print_header()
@@ -143,6 +182,8 @@ class CLI:
         print("  - Type 'compare' to compare models")
         print("  - Type 'stats' to see feedback statistics")
         print("  - Type 'learning' to see learning system status")
+        print("  - Type 'metrics' to see latency percentiles")
+        print("  - Type 'export <file>' to save the last result (.csv, .jsonl or .parquet)")
         print("  - Type 'quit' or 'exit' to quit")
         print()
         
@@ -173,9 +214,23 @@ class CLI:
                     print(f"   Average Rating: {stats['average_rating']}/5")
                     print(f"   Positive Feedback: {stats['positive_feedback']}")
                     print(f"   Total Corrections: {stats['total_corrections']}")
+                    llm_stats = LLMFactory.get_registry_stats()
+                    print(f"   LLM Clients: {llm_stats['instances']} "
+                          f"({llm_stats['open_connections']} open connection(s))")
                     print("-" * 70)
                     continue
                 
+                if question.lower() == 'metrics':
+                    self.print_metrics()
+                    continue
+                
+                if question.lower().startswith('export '):
+                    if self.last_sql:
+                        self.export_results(self.last_sql, question[len('export '):].strip())
+                    else:
+                        print("No result to export yet.")
+                    continue
+                
                 if question.lower() == 'learning':
                     status = self.learning_system.get_learning_status()
                     print("\n🎓 LEARNING SYSTEM STATUS")
@@ -206,12 +261,14 @@ class CLI:
                 
                 # Generate and execute query
                 print("\n⚙️  Generating SQL query...")
-                result = self.chain.run(question)
+                # Only the printed rows are read; 'export' streams the rest
+                result = self.chain.run(question, max_rows=self.DISPLAY_ROWS)
                 
                 self.print_result(result)
                 
                 # Get feedback if successful
                 if result["sql_query"] and not result["error"]:
+                    self.last_sql = result["sql_query"]
                     self.get_feedback(question, result["sql_query"])
                 
             except KeyboardInterrupt:
@@ -220,13 +277,24 @@ class CLI:
             except Exception as e:
                 print(f"\n❌ Error: {str(e)}")
     
-    def run_single_query(self, question: str):
-        """Run a single query (non-interactive)"""
+    def run_single_query(self, question: str, export_path: str = None):
+        """
+        Run a single query (non-interactive)
+        
+        Args:
+            question: Natural language question
+            export_path: Also stream the result rows to this file
+                (.csv, .jsonl or .parquet)
+        """
         self.print_header()
         print(f"Question: {question}\n")
         
-        result = self.chain.run(question)
+        # Only the printed rows are read; the export streams the full result
+        result = self.chain.run(question, max_rows=self.DISPLAY_ROWS)
         self.print_result(result)
+        
+        if export_path and result["sql_query"] and not result["error"]:
+            self.export_results(result["sql_query"], export_path)
     
     def close(self):
         """Clean up resources"""
@@ -1,11 +1,40 @@
-import gradio as gr
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
 from src.chain.text_to_sql_chain import TextToSQLChain
 from src.handlers.ambiguity_handler import AmbiguityHandler
 from src.handlers.feedback_handler import FeedbackHandler
 from src.handlers.feedback_learning import FeedbackLearningSystem
 from src.llm.llm_comparator import LLMComparator
+from src.query.exporter import EXPORT_FORMATS, QueryExporter
+from src.query.pager import ResultPager
 from config.settings import Settings
-import pandas as pd
+from src.utils.lazy_imports import lazy_import
+
+_export_dir = None
+_export_dir_lock = threading.Lock()
+
+def export_dir() -> str:
+    """One export directory per process, removed at exit"""
+    global _export_dir
+    with _export_dir_lock:
+        if _export_dir is None:
+            _export_dir = tempfile.mkdtemp(prefix="text_to_sql_export_")
+            atexit.register(shutil.rmtree, _export_dir, ignore_errors=True)
+        return _export_dir
+
+def _remove_old_exports(directory: str, max_age: float):
+    """Delete exports older than `max_age` seconds (they have been downloaded or abandoned)"""
+    cutoff = time.time() - max_age
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass  # removed by a concurrent export
 
 class WebInterface:
     """Gradio web interface for Text-To-SQL"""
@@ -18,16 +47,24 @@ class WebInterface:
         self.comparator = LLMComparator()
     
     def process_question(self, question: str, use_few_shot: bool, use_cot: bool):
-        """Process a natural language question"""
+        """
+        Process a natural language question
+        
+        Returns the SQL, summary, feedback status, first result page, the
+        session's result pager, a page description and the page number.
+        """
         if not question:
-            return "Please enter a question.", "", "", None
+            return "Please enter a question.", "", "", None, None, "", 1
         
         try:
             # Run the chain
             result = self.chain.run(
                 question, 
                 use_few_shot=use_few_shot,
-                use_chain_of_thought=use_cot
+                use_chain_of_thought=use_cot,
+                columnar=True,
+                # Larger results are paged from the database, so never read them whole
+                max_rows=Settings.WEB_MAX_CACHED_ROWS
             )
             
             if result["error"]:
@@ -39,23 +76,59 @@ class WebInterface:
                         error_msg += f"  Query: {attempt['query']}\n"
                     if attempt['error']:
                         error_msg += f"  Error: {attempt['error']}\n"
-                return error_msg, "", "", None
+                return error_msg, "", "", None, None, "", 1
             
             sql_query = result["sql_query"]
             summary = result["summary"]
             
-            # Format results as DataFrame
+            # Only the first page goes to the browser; the pager keeps (or
+            # re-queries) the rest for this session
             if result["results"]:
-                columns = result["results"]["columns"]
-                rows = result["results"]["rows"]
-                df = pd.DataFrame(rows, columns=columns)
+                results = result["results"]
+                # A cut result is counted with COUNT(*) and re-queried page by page
+                rows = None if results["truncated"] else results["rows"]
+                pager = ResultPager(self.chain.db, sql_query, results["columns"], rows)
+                df, page_info, page = self.show_page(pager, 1)
             else:
-                df = None
+                pager, df, page_info, page = None, None, "", 1
             
-            return sql_query, summary, "", df
+            return sql_query, summary, "", df, pager, page_info, page
             
         except Exception as e:
-            return f"❌ Error: {str(e)}", "", "", None
+            return f"❌ Error: {str(e)}", "", "", None, None, "", 1
+    
+    def show_page(self, pager: ResultPager, page: int):
+        """Get one page of the session's result as (DataFrame, description, page number)"""
+        if pager is None:
+            return None, "", 1
+        
+        try:
+            page, rows = pager.page(page)
+        except Exception as e:
+            return None, f"❌ Error loading page: {str(e)}", page
+        
+        if hasattr(rows, "to_dataframe"):
+            df = rows.to_dataframe()
+        else:
+            pd = lazy_import("pandas")
+            df = pd.DataFrame(rows, columns=pager.columns)
+        
+        return df, pager.describe(page), page
+    
+    def export_results(self, pager: ResultPager, fmt: str):
+        """Stream the session's full result to a downloadable file"""
+        if pager is None:
+            return None, "⚠️ No results to export."
+        
+        try:
+            directory = export_dir()
+            _remove_old_exports(directory, Settings.WEB_EXPORT_MAX_AGE)
+            fd, path = tempfile.mkstemp(prefix="results_", suffix=f".{fmt}", dir=directory)
+            os.close(fd)
+            row_count = QueryExporter(pager.db).export(pager.sql, path, fmt)
+            return path, f"💾 Exported {row_count:,} row(s) as {fmt.upper()}"
+        except Exception as e:
+            return None, f"❌ Export failed: {str(e)}"
     
     def submit_feedback(self, question: str, sql_query: str, rating: int, comment: str, corrected_query: str):
         """Submit user feedback with optional correction"""
@@ -91,6 +164,11 @@ class WebInterface:
                 if result['success']:
                     comparison_text += f"- **Status:** ✅ Success\n"
                     comparison_text += f"- **Query:** `{result['query']}`\n"
+                    generation = result["generation"]
+                    if generation["ttft"] is not None:
+                        comparison_text += f"- **TTFT:** {generation['ttft']:.2f}s\n"
+                        comparison_text += f"- **Tokens/s:** {generation['tokens_per_second'] or 0:.1f}\n"
+                        comparison_text += f"- **Load Time:** {generation['load_time'] or 0:.2f}s\n"
                 else:
                     comparison_text += f"- **Status:** ❌ Failed\n"
                     comparison_text += f"- **Error:** {result.get('error', 'Unknown')}\n"
@@ -143,6 +221,7 @@ class WebInterface:
     
     def launch(self, share: bool = False):
         """Launch Gradio interface"""
+        gr = lazy_import("gradio")
         
         with gr.Blocks(title="Text-To-SQL with Ollama") as demo:
             gr.Markdown("# 🤖 Text-To-SQL Application")
@@ -174,6 +253,17 @@ class WebInterface:
                 sql_output = gr.Textbox(label="Generated SQL Query", lines=3)
                 summary_output = gr.Textbox(label="Summary", lines=3)
                 results_output = gr.Dataframe(label="Query Results")
+                result_pager = gr.State(None)
+                with gr.Row():
+                    prev_page_btn = gr.Button("◀ Previous", size="sm")
+                    page_number = gr.Number(label="Page", value=1, precision=0, minimum=1)
+                    next_page_btn = gr.Button("Next ▶", size="sm")
+                page_info = gr.Markdown()
+                with gr.Row():
+                    export_format = gr.Radio(list(EXPORT_FORMATS), value="csv", label="Export Format")
+                    export_btn = gr.Button("Export Results")
+                export_file = gr.File(label="Exported File")
+                export_status = gr.Markdown()
                 
                 gr.Markdown("### Provide Feedback")
                 with gr.Row():
@@ -195,7 +285,31 @@ class WebInterface:
                 submit_btn.click(
                     fn=self.process_question,
                     inputs=[question_input, few_shot_checkbox, cot_checkbox],
-                    outputs=[sql_output, summary_output, feedback_output, results_output]
+                    outputs=[sql_output, summary_output, feedback_output, results_output,
+                             result_pager, page_info, page_number]
+                )
+                
+                page_outputs = [results_output, page_info, page_number]
+                prev_page_btn.click(
+                    fn=lambda pager, page: self.show_page(pager, (page or 1) - 1),
+                    inputs=[result_pager, page_number],
+                    outputs=page_outputs
+                )
+                next_page_btn.click(
+                    fn=lambda pager, page: self.show_page(pager, (page or 1) + 1),
+                    inputs=[result_pager, page_number],
+                    outputs=page_outputs
+                )
+                page_number.submit(
+                    fn=self.show_page,
+                    inputs=[result_pager, page_number],
+                    outputs=page_outputs
+                )
+                
+                export_btn.click(
+                    fn=self.export_results,
+                    inputs=[result_pager, export_format],
+                    outputs=[export_file, export_status]
                 )
                 
                 feedback_btn.click(
@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from src.utils.lazy_imports import lazy_import
+
+class Cassette:
+    """
+    On-disk store of prompt -> completion pairs for deterministic offline runs
+
+    Entries are gzip-compressed JSON lines keyed by a hash of the model,
+    its generation options and the prompt. Prompts themselves are not stored.
+    New entries are appended as extra gzip members, so recording never
+    rewrites the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def make_key(model: str, options: Dict, prompt: str) -> str:
+        """Build the lookup key for a model, its generation options and a prompt"""
+        payload = json.dumps([model, options, prompt], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        """Load existing entries; later recordings of the same key win"""
+        if not os.path.exists(self.path):
+            return
+
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Get a recorded entry, or None"""
+        return self.entries.get(key)
+
+    def record(self, entry: Dict):
+        """Append an entry to the cassette file"""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.entries[entry["key"]] = entry
+
+    def __len__(self):
+        return len(self.entries)
+
+def _llm_result(texts: List[str], generation_infos: List[Dict]):
+    """Build a LangChain LLMResult so wrappers behave like a real client"""
+    outputs = lazy_import("langchain_core.outputs")
+    return outputs.LLMResult(generations=[
+        [outputs.Generation(text=text, generation_info=info)]
+        for text, info in zip(texts, generation_infos)
+    ])
+
+class RecordingLLM:
+    """Pass prompts through to a live client and record every completion"""
+
+    def __init__(self, llm, cassette: Cassette, model_name: str, options: Dict):
+        self.llm = llm
+        self.cassette = cassette
+        self.model_name = model_name
+        self.options = options
+
+    def generate(self, prompts: List[str]):
+        texts, infos = [], []
+
+        for prompt in prompts:
+            start_time = time.perf_counter()
+            generation = self.llm.generate([prompt]).generations[0][0]
+            elapsed = time.perf_counter() - start_time
+
+            self.cassette.record({
+                "key": Cassette.make_key(self.model_name, self.options, prompt),
+                "model": self.model_name,
+                "completion": generation.text,
+                "generation_info": generation.generation_info or {},
+                "elapsed": elapsed
+            })
+            texts.append(generation.text)
+            infos.append(generation.generation_info or {})
+
+        return _llm_result(texts, infos)
+
+class ReplayLLM:
+    """Serve recorded completions, optionally sleeping for the recorded latency"""
+
+    def __init__(self, cassette: Cassette, model_name: str, options: Dict,
+                 simulate_latency: bool = False):
+        self.cassette = cassette
+        self.model_name = model_name
+        self.options = options
+        self.simulate_latency = simulate_latency
+
+    def generate(self, prompts: List[str]):
+        texts, infos = [], []
+
+        for prompt in prompts:
+            entry = self.cassette.get(Cassette.make_key(self.model_name, self.options, prompt))
+            if entry is None:
+                raise LookupError(
+                    f"No recorded completion for this {self.model_name} prompt in "
+                    f"cassette {self.cassette.path} (record it with LLM_MODE=record)"
+                )
+
+            if self.simulate_latency:
+                time.sleep(entry["elapsed"])
+
+            texts.append(entry["completion"])
+            infos.append(entry["generation_info"])
+
+        return _llm_result(texts, infos)
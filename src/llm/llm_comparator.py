@@ -1,5 +1,7 @@
 from typing import List, Dict
+from config.settings import Settings
 from src.llm.llm_factory import LLMFactory
+from src.query.sql_extractor import StreamingSQLExtractor
 import time
 
 class LLMComparator:
@@ -25,7 +27,7 @@ class LLMComparator:
             start_time = time.time()
             
             try:
-                llm = LLMFactory.create_llm(model)
+                llm = LLMFactory.create_llm(model, stage="comparison")
                 
                 prompt = f"""Given the database schema:
 {schema_context}
@@ -34,7 +36,15 @@ Generate a SQL query to answer: {question}
 
 Return ONLY the SQL query, nothing else."""
                 
-                sql_query = llm.invoke(prompt).strip()
+                if Settings.SQL_STREAMING:
+                    # Stop each model once its statement is complete, as QueryGenerator does
+                    extractor = StreamingSQLExtractor()
+                    _, generation = llm.stream_with_metrics(prompt, stage="comparison",
+                                                            until=extractor.feed)
+                    sql_query = extractor.finish()
+                else:
+                    sql_query, generation = llm.invoke_with_metrics(prompt, stage="comparison")
+                sql_query = sql_query.strip()
                 
                 # Clean the query
                 sql_query = self._clean_sql(sql_query)
@@ -44,6 +54,7 @@ Return ONLY the SQL query, nothing else."""
                 results[model] = {
                     "query": sql_query,
                     "execution_time": execution_time,
+                    "generation": generation,
                     "success": True
                 }
             except Exception as e:
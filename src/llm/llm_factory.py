@@ -1,37 +1,232 @@
-try:
-    from langchain_ollama import OllamaLLM
-except ImportError:
-    from langchain_community.llms import Ollama as OllamaLLM
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
 from config.settings import Settings
+from src.utils.lazy_imports import lazy_import
+from src.llm.metered_llm import MeteredLLM
+from src.llm.cassette import Cassette, RecordingLLM, ReplayLLM
 
 class LLMFactory:
-    """Factory to create Ollama LLM instances"""
+    """
+    Factory to create Ollama LLM instances
+
+    Generation options come from the stage's profile in
+    Settings.GENERATION_PROFILES. Clients are kept in a process-wide registry
+    keyed by (model, temperature, num_predict, num_ctx, stop), so every
+    component asking for the same configuration gets the same instance. All clients share one
+    keep-alive HTTP connection pool to the Ollama server, and are wrapped in
+    MeteredLLM so Ollama's generation metrics are captured on every call.
     
+    Settings.LLM_MODE selects the backend: "live" talks to Ollama, "record"
+    also writes every completion to a cassette, and "replay" serves
+    completions from the cassette without Ollama.
+    """
+    
+    LLM_MODES = ("live", "record", "replay")
+
+    _registry: Dict[Tuple, Any] = {}
+    _registry_lock = threading.Lock()
+    _transport = None
+    _cassette = None
+    _llm_class = None
+    _supports_client_kwargs = False
+    _requests = 0
+    _reuses = 0
+
+    @staticmethod
+    def get_generation_options(stage: str = None) -> Dict:
+        """
+        Get the generation options of a pipeline stage
+
+        Args:
+            stage: Key of Settings.GENERATION_PROFILES (unknown stages get "default")
+
+        Returns:
+            Dictionary with temperature, num_predict, num_ctx and stop
+        """
+        options = dict(Settings.GENERATION_PROFILES["default"])
+        options.update(Settings.GENERATION_PROFILES.get(stage or "default", {}))
+        return options
+
     @staticmethod
-    def create_llm(model_name: str = None, temperature: float = None):
+    def create_llm(model_name: str = None, temperature: float = None,
+                   num_predict: int = None, stage: str = None):
         """
-        Create an Ollama LLM instance
-        
+        Get an Ollama LLM instance, reusing a registered one when possible
+
         Args:
             model_name: Name of the Ollama model to use (e.g., 'llama3:latest')
-            temperature: Temperature for generation (0.0-1.0)
-            
+            temperature: Temperature for generation (0.0-1.0), overrides the stage profile
+            num_predict: Maximum number of tokens to generate, overrides the stage profile
+            stage: Pipeline stage whose generation profile to use
+
         Returns:
-            Ollama LLM instance
+            MeteredLLM wrapping an Ollama LLM instance
         """
         if model_name is None:
             model_name = Settings.DEFAULT_MODEL
-        
-        if temperature is None:
-            temperature = Settings.TEMPERATURE
-        
-        return OllamaLLM(
-            model=model_name,
-            base_url=Settings.OLLAMA_BASE_URL,
-            temperature=temperature,
-            num_predict=Settings.MAX_TOKENS
-        )
-    
+
+        options = LLMFactory.get_generation_options(stage)
+        if temperature is not None:
+            options["temperature"] = temperature
+        if num_predict is not None:
+            options["num_predict"] = num_predict
+
+        stop = tuple(options["stop"]) if options["stop"] else None
+        key = (model_name, float(options["temperature"]), int(options["num_predict"]),
+               options["num_ctx"], stop)
+
+        with LLMFactory._registry_lock:
+            LLMFactory._requests += 1
+            llm = LLMFactory._registry.get(key)
+            if llm is not None:
+                LLMFactory._reuses += 1
+                return llm
+
+            llm = LLMFactory._build_llm(model_name, options["temperature"], options["num_predict"],
+                                        options["num_ctx"], options["stop"])
+            LLMFactory._registry[key] = llm
+            return llm
+
+    @staticmethod
+    def _build_llm(model_name: str, temperature: float, num_predict: int,
+                   num_ctx: Optional[int] = None, stop: Optional[List[str]] = None):
+        """Build a new client for the configured backend mode"""
+        mode = Settings.LLM_MODE
+        if mode not in LLMFactory.LLM_MODES:
+            raise ValueError(f"Unknown LLM mode '{mode}', expected one of {LLMFactory.LLM_MODES}")
+
+        # Unset options are left to the server and kept out of cassette keys
+        options = {"temperature": temperature, "num_predict": num_predict}
+        if num_ctx is not None:
+            options["num_ctx"] = num_ctx
+        if stop:
+            options["stop"] = list(stop)
+
+        if mode == "replay":
+            llm = ReplayLLM(
+                LLMFactory._get_cassette(), model_name, options,
+                simulate_latency=Settings.LLM_REPLAY_SIMULATE_LATENCY
+            )
+            return MeteredLLM(llm, model_name)
+
+        # keep_alive pins the model (and its prompt cache) in server memory
+        # between requests; it is not a generation option, so cassettes
+        # recorded with another value still match
+        kwargs = {
+            "model": model_name,
+            "base_url": Settings.OLLAMA_BASE_URL,
+            "keep_alive": Settings.OLLAMA_KEEP_ALIVE,
+            **options
+        }
+
+        llm_class = LLMFactory._get_llm_class()
+        if LLMFactory._supports_client_kwargs:
+            kwargs["sync_client_kwargs"] = {"transport": LLMFactory._get_transport()}
+
+        llm = llm_class(**kwargs)
+        if mode == "record":
+            llm = RecordingLLM(llm, LLMFactory._get_cassette(), model_name, options)
+
+        return MeteredLLM(llm, model_name)
+
+    @staticmethod
+    def _get_cassette() -> Cassette:
+        """Open the configured cassette on first use"""
+        if LLMFactory._cassette is None:
+            LLMFactory._cassette = Cassette(Settings.LLM_CASSETTE_PATH)
+        return LLMFactory._cassette
+
+    @staticmethod
+    def configure(mode: str = None, cassette_path: str = None,
+                  simulate_latency: bool = None):
+        """
+        Switch the LLM backend mode and drop clients built for the old one
+
+        Args:
+            mode: "live", "record" or "replay"
+            cassette_path: Cassette file for record/replay
+            simulate_latency: In replay mode, sleep for the recorded latency
+        """
+        if mode is not None:
+            if mode not in LLMFactory.LLM_MODES:
+                raise ValueError(f"Unknown LLM mode '{mode}', expected one of {LLMFactory.LLM_MODES}")
+            Settings.LLM_MODE = mode
+        if cassette_path is not None:
+            Settings.LLM_CASSETTE_PATH = cassette_path
+        if simulate_latency is not None:
+            Settings.LLM_REPLAY_SIMULATE_LATENCY = simulate_latency
+
+        LLMFactory.clear_registry()
+        LLMFactory._cassette = None
+
+    @staticmethod
+    def _get_llm_class():
+        """Import the Ollama LLM class on first use (langchain is slow to import)"""
+        if LLMFactory._llm_class is None:
+            try:
+                LLMFactory._llm_class = lazy_import("langchain_ollama").OllamaLLM
+                LLMFactory._supports_client_kwargs = True
+            except ImportError:
+                LLMFactory._llm_class = lazy_import("langchain_community.llms").Ollama
+                LLMFactory._supports_client_kwargs = False
+        return LLMFactory._llm_class
+
+    @staticmethod
+    def _get_transport():
+        """Create the shared keep-alive HTTP transport on first use"""
+        if LLMFactory._transport is None:
+            httpx = lazy_import("httpx")
+
+            LLMFactory._transport = httpx.HTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=Settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=Settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=Settings.HTTP_KEEPALIVE_EXPIRY
+                )
+            )
+        return LLMFactory._transport
+
+    @staticmethod
+    def get_registry_stats() -> Dict:
+        """
+        Get client registry and connection pool statistics
+
+        Returns:
+            Dictionary with instance, request and connection counts
+        """
+        with LLMFactory._registry_lock:
+            stats = {
+                "instances": len(LLMFactory._registry),
+                "requests": LLMFactory._requests,
+                "reuses": LLMFactory._reuses,
+                "models": sorted({key[0] for key in LLMFactory._registry}),
+                "mode": Settings.LLM_MODE,
+                "open_connections": 0,
+                "idle_connections": 0
+            }
+
+        pool = getattr(LLMFactory._transport, "_pool", None)
+        for connection in getattr(pool, "connections", []):
+            if connection.is_closed():
+                continue
+            stats["open_connections"] += 1
+            if connection.is_idle():
+                stats["idle_connections"] += 1
+
+        return stats
+
+    @staticmethod
+    def clear_registry():
+        """Drop all registered clients and close the shared connection pool"""
+        with LLMFactory._registry_lock:
+            LLMFactory._registry.clear()
+            LLMFactory._requests = 0
+            LLMFactory._reuses = 0
+            if LLMFactory._transport is not None:
+                LLMFactory._transport.close()
+                LLMFactory._transport = None
+
     @staticmethod
     def get_available_models():
         """Get list of available models for comparison"""
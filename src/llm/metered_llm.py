@@ -0,0 +1,221 @@
+import time
+from typing import Callable, Dict, Optional, Tuple
+from src.utils.lazy_imports import lazy_import
+from src.utils.metrics import metrics
+
+# Ollama reports durations in nanoseconds
+_NS_PER_SECOND = 1e9
+
+def extract_generation_metrics(generation_info: Optional[Dict], wall_time: float) -> Dict:
+    """
+    Convert Ollama's generation_info into timing and throughput metrics
+
+    Args:
+        generation_info: Final chunk info returned by Ollama (may be None)
+        wall_time: Client-side duration of the call in seconds
+
+    Returns:
+        Dictionary with token counts, durations (seconds) and derived rates.
+        Fields Ollama did not report are None.
+    """
+    info = generation_info or {}
+
+    def seconds(field: str) -> Optional[float]:
+        value = info.get(field)
+        return value / _NS_PER_SECOND if value is not None else None
+
+    load_time = seconds("load_duration")
+    prompt_eval_time = seconds("prompt_eval_duration")
+    eval_time = seconds("eval_duration")
+    prompt_tokens = info.get("prompt_eval_count")
+    completion_tokens = info.get("eval_count")
+
+    ttft = None
+    if prompt_eval_time is not None:
+        ttft = (load_time or 0.0) + prompt_eval_time
+
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "load_time": load_time,
+        "prompt_eval_time": prompt_eval_time,
+        "eval_time": eval_time,
+        "total_time": seconds("total_duration"),
+        "ttft": ttft,
+        "prefill_tokens_per_second": (
+            prompt_tokens / prompt_eval_time if prompt_tokens and prompt_eval_time else None
+        ),
+        "tokens_per_second": (
+            completion_tokens / eval_time if completion_tokens and eval_time else None
+        ),
+        "wall_time": wall_time
+    }
+
+_final_info_handler_class = None
+
+def _final_info_handler(info: Dict):
+    """Callback handler that copies the final generation_info of a streamed call into `info`"""
+    global _final_info_handler_class
+    if _final_info_handler_class is None:
+        base = lazy_import("langchain_core.callbacks").BaseCallbackHandler
+
+        class FinalInfoHandler(base):
+            def __init__(self, info: Dict):
+                self.info = info
+
+            def on_llm_end(self, response, **kwargs):
+                if response.generations and response.generations[0]:
+                    self.info.update(response.generations[0][0].generation_info or {})
+
+        _final_info_handler_class = FinalInfoHandler
+    return _final_info_handler_class(info)
+
+class MeteredLLM:
+    """
+    Wrap an LLM client and capture Ollama generation metrics for every call
+
+    `invoke` keeps the plain LangChain contract (prompt in, text out);
+    `invoke_with_metrics` also returns the metrics of that call. Every call
+    is aggregated into the process-wide histograms as
+    `llm.<model>.<stage>.<field>`.
+    """
+
+    def __init__(self, llm, model_name: str):
+        self.llm = llm
+        self.model_name = model_name
+
+    def invoke(self, prompt: str, stage: str = "default") -> str:
+        """Generate a completion for `prompt`"""
+        text, _ = self.invoke_with_metrics(prompt, stage)
+        return text
+
+    def invoke_with_metrics(self, prompt: str, stage: str = "default") -> Tuple[str, Dict]:
+        """
+        Generate a completion and capture its generation metrics
+
+        Args:
+            prompt: Prompt text
+            stage: Pipeline stage making the call (e.g., 'sql_generation')
+
+        Returns:
+            Tuple of (completion text, metrics dictionary)
+        """
+        start_time = time.perf_counter()
+        text, generation_info = self._generate(prompt)
+        generation_metrics = extract_generation_metrics(
+            generation_info, time.perf_counter() - start_time
+        )
+        generation_metrics["model"] = self.model_name
+        generation_metrics["stage"] = stage
+
+        self._record(stage, generation_metrics)
+        return text, generation_metrics
+
+    def stream_with_metrics(self, prompt: str, stage: str = "default",
+                            until: Callable[[str], bool] = None) -> Tuple[str, Dict]:
+        """
+        Stream a completion and stop reading it once `until` is satisfied
+
+        Closing the stream closes the HTTP response, which makes Ollama stop
+        generating. Clients that cannot stream (stubs, record/replay) return
+        the whole completion, which is passed to `until` at once, so
+        cassettes always hold full completions.
+
+        Args:
+            prompt: Prompt text
+            stage: Pipeline stage making the call (e.g., 'sql_generation')
+            until: Called with each chunk; returning True cancels the rest
+
+        Returns:
+            Tuple of (text received, metrics dictionary). Streamed calls add
+            `client_ttft` (seconds to the first chunk) and `cancelled`.
+            Ollama reports no metrics for a cancelled call, so its `ttft` is
+            the client-side one and `completion_tokens` the chunk count
+            (Ollama streams one token per chunk).
+        """
+        if not hasattr(self.llm, "stream"):
+            text, generation_metrics = self.invoke_with_metrics(prompt, stage)
+            if until is not None:
+                until(text)
+            return text, generation_metrics
+
+        generation_info = {}
+        chunks = []
+        client_ttft = None
+        cancelled = False
+
+        start_time = time.perf_counter()
+        stream = self.llm.stream(prompt, config={"callbacks": [_final_info_handler(generation_info)]})
+        try:
+            for chunk in stream:
+                if client_ttft is None:
+                    client_ttft = time.perf_counter() - start_time
+                chunks.append(chunk)
+                if until is not None and until(chunk):
+                    cancelled = True
+                    break
+        finally:
+            stream.close()
+
+        generation_metrics = extract_generation_metrics(
+            generation_info, time.perf_counter() - start_time
+        )
+        generation_metrics["model"] = self.model_name
+        generation_metrics["stage"] = stage
+        generation_metrics["client_ttft"] = client_ttft
+        generation_metrics["cancelled"] = cancelled
+        if generation_metrics["ttft"] is None:
+            generation_metrics["ttft"] = client_ttft
+        if generation_metrics["completion_tokens"] is None:
+            generation_metrics["completion_tokens"] = len(chunks)
+
+        self._record(stage, generation_metrics)
+        return "".join(chunks), generation_metrics
+
+    def _generate(self, prompt: str) -> Tuple[str, Dict]:
+        """Call the wrapped client, keeping generation_info when it is available"""
+        if hasattr(self.llm, "generate"):
+            llm_result = self.llm.generate([prompt])
+            generation = llm_result.generations[0][0]
+            return generation.text, generation.generation_info or {}
+
+        return self.llm.invoke(prompt), {}
+
+    def _record(self, stage: str, generation_metrics: Dict):
+        """Aggregate metrics per model and per stage"""
+        prefix = f"llm.{self.model_name}.{stage}"
+        for field in ["ttft", "client_ttft", "load_time", "prompt_eval_time", "eval_time", "wall_time",
+                      "tokens_per_second", "prompt_tokens", "completion_tokens"]:
+            value = generation_metrics.get(field)
+            if value is not None:
+                metrics.observe(f"{prefix}.{field}", value)
+
+def summarize_llm_metrics(calls) -> Dict:
+    """
+    Sum token counts and durations over several calls
+
+    Args:
+        calls: Iterable of metrics dictionaries from invoke_with_metrics
+
+    Returns:
+        Dictionary with call count and summed tokens/durations
+    """
+    totals = {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "load_time": 0.0,
+        "prompt_eval_time": 0.0,
+        "eval_time": 0.0,
+        "wall_time": 0.0
+    }
+
+    for call in calls:
+        if not call:
+            continue
+        totals["calls"] += 1
+        for field in totals:
+            if field != "calls" and call.get(field) is not None:
+                totals[field] += call[field]
+
+    return totals
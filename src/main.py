@@ -6,6 +6,9 @@ Main entry point for CLI and Web interfaces
 
 import sys
 import os
+import time
+
+_PROCESS_START = time.perf_counter()
 
 # Add project root to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -13,10 +16,12 @@ sys.path.insert(0, project_root)
 
 import argparse
 import sys
-from src.interfaces.cli import CLI
-from src.interfaces.web import WebInterface
-from src.llm.llm_comparator import LLMComparator
 from config.settings import Settings
+from src.utils.lazy_imports import format_startup_profile
+
+# Interfaces are imported inside main() so that each mode only loads
+# the dependencies it needs (gradio/pandas are never imported for the CLI)
+_MODULES_LOADED = time.perf_counter()
 
 def main():
     parser = argparse.ArgumentParser(
@@ -38,6 +43,19 @@ Examples:
   
   # Use specific model
   python src/main.py --mode cli --model mistral:7b
+  
+  # Record completions once, then replay them offline
+  python src/main.py --mode cli --question "Show all departments" --llm-mode record
+  python src/main.py --mode cli --question "Show all departments" --llm-mode replay
+  
+  # Export latency histograms for monitoring
+  python src/main.py --mode web --metrics-dump data/metrics.json
+  
+  # Export the result of a single query (CSV, JSONL or Parquet)
+  python src/main.py --mode cli --question "Show all employees" --export employees.parquet
+  
+  # Show an import-time breakdown of startup
+  python src/main.py --mode cli --question "Show all departments" --startup-profile
         """
     )
     
@@ -73,7 +91,55 @@ Examples:
         help="Path to database file"
     )
     
+    parser.add_argument(
+        "--export",
+        type=str,
+        help="Stream the query result to a .csv, .jsonl or .parquet file (only for CLI mode with --question)"
+    )
+    
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Print an import-time breakdown of application startup"
+    )
+    
+    parser.add_argument(
+        "--llm-mode",
+        choices=["live", "record", "replay"],
+        default=Settings.LLM_MODE,
+        help="LLM backend: live Ollama, record completions to a cassette, or replay them offline"
+    )
+    
+    parser.add_argument(
+        "--cassette",
+        type=str,
+        default=Settings.LLM_CASSETTE_PATH,
+        help=f"Cassette file for record/replay (default: {Settings.LLM_CASSETTE_PATH})"
+    )
+    
+    parser.add_argument(
+        "--simulate-latency",
+        action="store_true",
+        help="In replay mode, sleep for the recorded LLM latency"
+    )
+    
+    parser.add_argument(
+        "--metrics-dump",
+        type=str,
+        default=Settings.METRICS_DUMP_PATH,
+        help="Periodically write latency histograms as JSON to this path"
+    )
+    
     args = parser.parse_args()
+    phases = {"core imports": _MODULES_LOADED - _PROCESS_START}
+    
+    if args.llm_mode != "live":
+        from src.llm.llm_factory import LLMFactory
+        LLMFactory.configure(args.llm_mode, args.cassette, args.simulate_latency)
+    
+    if args.metrics_dump:
+        from src.utils.metrics import metrics
+        metrics.start_periodic_dump(args.metrics_dump, Settings.METRICS_DUMP_INTERVAL)
     
     try:
         if args.mode == "web":
@@ -81,7 +147,14 @@ Examples:
             print(f"📦 Using model: {args.model}")
             print(f"🔗 Opening at http://localhost:{Settings.WEB_PORT}")
             
+            phase_start = time.perf_counter()
+            from src.interfaces.web import WebInterface
             interface = WebInterface(model_name=args.model)
+            phases["web interface init"] = time.perf_counter() - phase_start
+            
+            if args.startup_profile:
+                print(format_startup_profile(phases, time.perf_counter() - _PROCESS_START))
+            
             interface.launch(share=args.share)
             
         elif args.mode == "compare":
@@ -92,11 +165,17 @@ Examples:
             print("🔄 Comparing models...")
             print(f"Question: {args.question}\n")
             
+            phase_start = time.perf_counter()
             from src.chain.text_to_sql_chain import TextToSQLChain
+            from src.llm.llm_comparator import LLMComparator
             chain = TextToSQLChain(db_path=args.db_path)
             
             comparator = LLMComparator()
+            phases["compare init"] = time.perf_counter() - phase_start
+            
+            phase_start = time.perf_counter()
             results = comparator.compare_models(args.question, chain.schema)
+            phases["compare models"] = time.perf_counter() - phase_start
             
             print("=" * 70)
             print("COMPARISON RESULTS")
@@ -108,6 +187,11 @@ Examples:
                 
                 if result['success']:
                     print(f"   ✅ Query: {result['query']}")
+                    generation = result["generation"]
+                    if generation["ttft"] is not None:
+                        print(f"   TTFT: {generation['ttft']:.2f}s, "
+                              f"{generation['tokens_per_second'] or 0:.1f} tokens/s, "
+                              f"load: {generation['load_time'] or 0:.2f}s")
                 else:
                     print(f"   ❌ Error: {result.get('error', 'Unknown error')}")
             
@@ -115,17 +199,25 @@ Examples:
             chain.close()
             
         else:  # CLI mode
+            phase_start = time.perf_counter()
+            from src.interfaces.cli import CLI
             cli = CLI(model_name=args.model)
+            phases["cli init"] = time.perf_counter() - phase_start
             
             try:
                 if args.question:
                     # Run single query
-                    cli.run_single_query(args.question)
+                    phase_start = time.perf_counter()
+                    cli.run_single_query(args.question, export_path=args.export)
+                    phases["single query"] = time.perf_counter() - phase_start
                 else:
                     # Run interactive mode
                     cli.interactive_mode()
             finally:
                 cli.close()
+        
+        if args.startup_profile and args.mode != "web":
+            print(format_startup_profile(phases, time.perf_counter() - _PROCESS_START))
                 
     except KeyboardInterrupt:
         print("\n\n👋 Goodbye!")
@@ -0,0 +1,262 @@
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+from config.settings import Settings
+from src.database.connection import DatabaseConnection
+from src.database.profiler import quote_identifier
+
+COST_GUARD_POLICIES = ("reject", "limit", "regenerate")
+
+# SQLite's own guesses without statistics: rows matching an equality
+# lookup, and the share of rows left by each bound of a range (x > ?)
+_DEFAULT_SEARCH_ROWS = 10
+_RANGE_BOUND_DIVISOR = 4
+
+_LOOP = re.compile(r"^(SCAN|SEARCH) (\S+)(?: AS (\S+))?(.*)$")
+_SUBQUERY_NAME = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (\S+)")
+_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\S+) \(")
+_CONSTRAINT = re.compile(r"\(([^)]*)\)\s*$")
+# Words that can follow a table name without being its alias
+_CLAUSE_KEYWORDS = (
+    "ON|USING|WHERE|GROUP|ORDER|HAVING|LIMIT|OFFSET|WINDOW|UNION|INTERSECT|EXCEPT|"
+    "JOIN|INNER|LEFT|RIGHT|FULL|CROSS|NATURAL|OUTER|INDEXED|NOT|RETURNING|FROM|SELECT|AS"
+)
+_TABLE_REFERENCE = re.compile(
+    r"(?:\bFROM|\bJOIN|,)\s+(\"[^\"]+\"|`[^`]+`|\[[^\]]+\]|\w+)"
+    rf"(?:\s+(?:AS\s+)?(?!(?:{_CLAUSE_KEYWORDS})\b)(\w+))?",
+    re.IGNORECASE
+)
+_AGGREGATE = re.compile(r"\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(", re.IGNORECASE)
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+\d+(?:\s*(?:,|OFFSET)\s*\d+)?\s*;?\s*$", re.IGNORECASE)
+
+class QueryCostGuard:
+    """
+    Estimate what a query will cost from its plan before it runs
+
+    `EXPLAIN QUERY PLAN` gives the nested loops SQLite will run. Each loop
+    multiplies the rows examined: a SCAN by the table's rows, a SEARCH by the
+    rows per key of its index. Row counts come from `sqlite_stat1` (written
+    by ANALYZE) and, for tables without statistics, from MAX(rowid), which
+    needs no scan. Full scans of large tables and inner loops that scan a
+    whole table for each outer row (a missing join condition) are reported
+    as issues. Queries estimated to examine more than `max_rows` rows get
+    the policy's action:
+
+    - "reject": do not run the query
+    - "limit": append a LIMIT, when the query streams rows (no sorting or
+      aggregation), so execution stops early; otherwise reject
+    - "regenerate": report the issues to the generator as an error
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, policy: str = None,
+                 max_rows: int = None, large_table_rows: int = None, limit: int = None):
+        """
+        Args:
+            db_connection: Database the queries run against
+            policy: "reject", "limit" or "regenerate" (defaults to Settings.COST_GUARD_POLICY)
+            max_rows: Most rows a query may examine (defaults to Settings.COST_GUARD_MAX_ROWS)
+            large_table_rows: Tables at least this big are reported when scanned in full
+            limit: LIMIT added by the "limit" policy
+        """
+        self.db = db_connection
+        self.policy = policy or Settings.COST_GUARD_POLICY
+        if self.policy not in COST_GUARD_POLICIES:
+            raise ValueError(f"Unknown cost guard policy '{self.policy}', expected one of {COST_GUARD_POLICIES}")
+        self.max_rows = max_rows or Settings.COST_GUARD_MAX_ROWS
+        self.large_table_rows = large_table_rows or Settings.COST_GUARD_LARGE_TABLE_ROWS
+        self.limit = limit or Settings.COST_GUARD_LIMIT
+
+    def check(self, query: str) -> Dict:
+        """
+        Analyze a query and decide whether it may run
+
+        Args:
+            query: SQL query
+
+        Returns:
+            Dictionary with the action ("allow", "limit", "reject" or
+            "regenerate"), the query to run, the estimated rows examined, the
+            issues found, the reason for the action and the plan lines
+        """
+        decision = {
+            "action": "allow",
+            "query": query,
+            "estimated_rows": None,
+            "issues": [],
+            "reason": None,
+            "plan": []
+        }
+
+        if not self.db.connection:
+            self.db.connect()
+        try:
+            plan = [tuple(row) for row in self.db.connection.execute(f"EXPLAIN QUERY PLAN {query}")]
+        except sqlite3.Error:
+            # Execution reports the same error to the retry loop
+            return decision
+
+        decision["plan"] = [detail for _, _, _, detail in plan]
+        estimated_rows, issues = _Estimate(self, query, plan, self._stat1()).run()
+        decision["estimated_rows"] = estimated_rows
+        decision["issues"] = issues
+
+        if estimated_rows <= self.max_rows:
+            return decision
+
+        streams = not (_AGGREGATE.search(query) or any("TEMP B-TREE" in line for line in decision["plan"]))
+        if streams and _TRAILING_LIMIT.search(query):
+            decision["reason"] = "bounded by its LIMIT"
+            return decision
+
+        summary = "; ".join(issues) or "large tables joined"
+        decision["reason"] = (
+            f"Query would examine about {estimated_rows:,} rows (limit {self.max_rows:,}): {summary}"
+        )
+
+        if self.policy == "limit" and streams:
+            decision["action"] = "limit"
+            # On its own line, so a trailing comment cannot swallow it
+            decision["query"] = f"{query.rstrip().rstrip(';')}\nLIMIT {self.limit}"
+        elif self.policy == "limit":
+            decision["action"] = "reject"
+            decision["reason"] += " (a LIMIT does not bound a sorted or aggregated query)"
+        else:
+            decision["action"] = self.policy
+        return decision
+
+    def _table_rows(self, tables: List[str], stats: Dict) -> Dict[str, Optional[int]]:
+        """Estimate row counts from sqlite_stat1, else MAX(rowid) (None when unknown)"""
+        rows = {}
+        for table in tables:
+            if table in stats["tables"]:
+                rows[table] = stats["tables"][table]
+                continue
+            try:
+                row = self.db.connection.execute(
+                    f"SELECT MAX(rowid) FROM {quote_identifier(table)}"
+                ).fetchone()
+                rows[table] = row[0] or 0
+            except sqlite3.Error:
+                rows[table] = None  # WITHOUT ROWID table
+        return rows
+
+    def _stat1(self) -> Dict:
+        """Table row counts and per-index rows-per-key lists from sqlite_stat1"""
+        stats = {"tables": {}, "indexes": {}}
+        try:
+            rows = self.db.connection.execute("SELECT tbl, idx, stat FROM sqlite_stat1").fetchall()
+        except sqlite3.Error:
+            return stats  # never analyzed
+
+        for table, index, stat in rows:
+            counts = [int(value) for value in stat.split() if value.isdigit()]
+            if not counts:
+                continue
+            # The first number of every entry is the table's row count
+            stats["tables"][table] = max(stats["tables"].get(table, 0), counts[0])
+            if index:
+                stats["indexes"][index] = counts
+        return stats
+
+class _Estimate:
+    """Walk one query plan and multiply the rows of its nested loops"""
+
+    def __init__(self, guard: QueryCostGuard, query: str, plan: List[Tuple], stats: Dict):
+        self.guard = guard
+        self.stats = stats
+        self.children: Dict[int, List[Tuple[int, str]]] = {}
+        for node_id, parent, _, detail in plan:
+            self.children.setdefault(parent, []).append((node_id, detail))
+
+        tables = [row[0] for row in guard.db.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type='table'"
+        )]
+        self.tables = {table.lower(): table for table in tables}
+        self.aliases = {}
+        for name, alias in _TABLE_REFERENCE.findall(query):
+            table = self.tables.get(name.strip('"`[]').lower())
+            if table and alias:
+                self.aliases[alias.lower()] = table
+
+        self.rows = guard._table_rows(sorted(set(self.aliases.values()) | self._planned_tables()), stats)
+        self.subqueries: Dict[str, int] = {}  # materialized subquery -> estimated rows
+        self.issues: List[str] = []
+
+    def run(self) -> Tuple[int, List[str]]:
+        return self._block(0), self.issues
+
+    def _planned_tables(self) -> set:
+        names = set()
+        for entries in self.children.values():
+            for _, detail in entries:
+                match = _LOOP.match(detail)
+                if match and match.group(2).lower() in self.tables:
+                    names.add(self.tables[match.group(2).lower()])
+        return names
+
+    def _resolve(self, name: str) -> Optional[str]:
+        key = name.strip('"`[]').lower()
+        return self.aliases.get(key) or self.tables.get(key)
+
+    def _block(self, parent: int) -> int:
+        """Rows examined by one query block: its loops multiplied, plus its subqueries"""
+        loop_rows = 1
+        extra = 0
+        loops = 0
+        for node_id, detail in self.children.get(parent, []):
+            match = _LOOP.match(detail)
+            if match and detail != "SCAN CONSTANT ROW":
+                kind, name, _, rest = match.groups()
+                factor, setup = self._loop_rows(kind, name, rest)
+                if kind == "SCAN":
+                    self._report_scan(name, factor, loop_rows if loops else None)
+                extra += setup
+                loop_rows *= max(factor, 1)
+                loops += 1
+                continue
+
+            subquery = _SUBQUERY_NAME.match(detail)
+            block_rows = self._block(node_id)
+            if subquery:
+                self.subqueries[subquery.group(1).lower()] = block_rows
+            if detail.startswith("CORRELATED"):
+                block_rows *= loop_rows  # runs once per row of the loops so far
+            extra += block_rows
+        return loop_rows + extra
+
+    def _loop_rows(self, kind: str, name: str, rest: str) -> Tuple[int, int]:
+        """Rows one loop visits per outer row, and the rows read once to set it up"""
+        table = self._resolve(name)
+        table_rows = self.rows.get(table) if table else self.subqueries.get(name.lower())
+
+        if kind == "SCAN":
+            return table_rows or 1, 0
+
+        # An automatic index is built from a full scan before the loop runs
+        setup = (table_rows or 0) if "AUTOMATIC" in rest else 0
+        constraint = _CONSTRAINT.search(rest)
+        terms = constraint.group(1) if constraint else ""
+        equalities = terms.count("=?")
+        bounds = terms.count(">?") + terms.count("<?")
+
+        if "PRIMARY KEY" in rest and equalities:
+            return 1, setup
+
+        rows = None
+        index = _INDEX.search(rest)
+        counts = self.stats["indexes"].get(index.group(1)) if index else None
+        if counts and equalities:
+            # stat: "<rows> <rows per key of column 1> <... of columns 1-2> ..."
+            rows = counts[min(equalities, len(counts) - 1)]
+        if rows is None:
+            rows = _DEFAULT_SEARCH_ROWS if equalities else (table_rows or _DEFAULT_SEARCH_ROWS)
+        return max(rows // _RANGE_BOUND_DIVISOR ** bounds, 1), setup
+
+    def _report_scan(self, name: str, rows: int, outer_rows: Optional[int]):
+        label = self._resolve(name) or name
+        if outer_rows is not None and outer_rows > 1 and rows > 1:
+            self.issues.append(
+                f"{label} is scanned in full for each of ~{outer_rows:,} outer rows (missing join condition?)"
+            )
+        elif rows >= self.guard.large_table_rows:
+            self.issues.append(f"full scan of {label} (~{rows:,} rows)")
@@ -7,16 +7,23 @@ class QueryExecutor:
     def __init__(self, db_connection: DatabaseConnection):
         self.db = db_connection
     
-    def execute(self, query: str) -> Tuple[Optional[Tuple[List, List]], Optional[str]]:
+    def execute(self, query: str, columnar: bool = False,
+                max_rows: int = None) -> Tuple[Optional[Tuple[List, List]], Optional[str]]:
         """
         Execute query and return results
         
+        Args:
+            query: SQL query
+            columnar: Return rows as a ColumnarResult instead of row lists
+            max_rows: Stop reading after this many rows
+        
         Returns:
             Tuple of ((columns, rows), error)
         """
-        return self.db.execute_query(query)
+        return self.db.execute_query(query, columnar=columnar, max_rows=max_rows)
     
-    def format_results(self, columns: List, rows: List, max_rows: int = 10) -> str:
+    def format_results(self, columns: List, rows: List, max_rows: int = 10,
+                       truncated: bool = False) -> str:
         """
         Format query results as text
         
@@ -24,6 +31,7 @@ class QueryExecutor:
             columns: Column names
             rows: Result rows
             max_rows: Maximum rows to display
+            truncated: The rows are only the first part of the result
             
         Returns:
             Formatted result string
@@ -31,7 +39,10 @@ class QueryExecutor:
         if not rows:
             return "No results found."
         
-        result_text = f"Found {len(rows)} result(s):\n\n"
+        if truncated:
+            result_text = f"Found more than {len(rows)} result(s), showing the first ones:\n\n"
+        else:
+            result_text = f"Found {len(rows)} result(s):\n\n"
         
         # Add column headers
         result_text += " | ".join(str(col) for col in columns) + "\n"
@@ -0,0 +1,145 @@
+import csv
+import json
+import os
+from typing import Iterator, List, Tuple
+from src.database.connection import DatabaseConnection
+from src.utils.lazy_imports import lazy_import
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+class QueryExporter:
+    """
+    Stream query results to CSV, JSONL or Parquet files
+
+    Rows are fetched from the SQLite cursor in fixed-size batches and written
+    as they arrive, so memory use does not grow with the result size. Parquet
+    needs the optional pyarrow package. Files are written next to the target
+    and renamed into place, so a failed export never leaves a partial file.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection):
+        self.db = db_connection
+
+    @staticmethod
+    def detect_format(path: str) -> str:
+        """Get the export format from a file extension"""
+        extension = os.path.splitext(path)[1].lstrip(".").lower()
+        if extension == "json":
+            extension = "jsonl"
+        if extension not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Unsupported export format '{extension}' (use one of: {', '.join(EXPORT_FORMATS)})"
+            )
+        return extension
+
+    def export(self, query: str, path: str, fmt: str = None, batch_size: int = None) -> int:
+        """
+        Run a query and write its rows to a file
+
+        Args:
+            query: SQL query
+            path: Output file
+            fmt: 'csv', 'jsonl' or 'parquet' (defaults to the file extension)
+            batch_size: Rows fetched and written at a time
+                (defaults to Settings.QUERY_FETCH_BATCH_SIZE)
+
+        Returns:
+            Number of rows written
+        """
+        fmt = fmt or self.detect_format(path)
+        writer = getattr(self, f"_write_{fmt}", None)
+        if fmt not in EXPORT_FORMATS or writer is None:
+            raise ValueError(f"Unsupported export format '{fmt}'")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        columns, batches = self.db.iter_query(query, batch_size)
+        tmp_path = f"{path}.tmp"
+        try:
+            row_count = writer(tmp_path, columns, batches)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return row_count
+
+    def _write_csv(self, path: str, columns: List[str], batches: Iterator[List[Tuple]]) -> int:
+        row_count = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for batch in batches:
+                writer.writerows(batch)
+                row_count += len(batch)
+        return row_count
+
+    def _write_jsonl(self, path: str, columns: List[str], batches: Iterator[List[Tuple]]) -> int:
+        row_count = 0
+        encode = json.JSONEncoder(default=str).encode
+        with open(path, "w", encoding="utf-8") as f:
+            for batch in batches:
+                f.write("".join(encode(dict(zip(columns, row))) + "\n" for row in batch))
+                row_count += len(batch)
+        return row_count
+
+    def _write_parquet(self, path: str, columns: List[str], batches: Iterator[List[Tuple]]) -> int:
+        try:
+            pa = lazy_import("pyarrow")
+            pq = lazy_import("pyarrow.parquet")
+        except ImportError:
+            raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+
+        row_count = 0
+        schema = None
+        writer = None
+        try:
+            for batch in batches:
+                values = list(zip(*batch))
+
+                # SQLite has no fixed column types, so the schema comes from
+                # the values in the first batch
+                if writer is None:
+                    schema = pa.schema([
+                        (name, _arrow_type(pa, column)) for name, column in zip(columns, values)
+                    ])
+                    writer = pq.ParquetWriter(path, schema)
+
+                arrays = []
+                for field, column in zip(schema, values):
+                    try:
+                        arrays.append(_arrow_array(pa, column, field.type))
+                    except (pa.ArrowInvalid, pa.ArrowTypeError):
+                        raise ValueError(
+                            f"Column '{field.name}' changes type after row {row_count}; "
+                            f"export to CSV or JSONL instead"
+                        )
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                row_count += len(batch)
+
+            if writer is None:
+                pq.write_table(pa.table({name: pa.array([], pa.string()) for name in columns}), path)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return row_count
+
+def _arrow_type(pa, values: Tuple):
+    """Pick an Arrow type for a column from a sample of its values"""
+    types = {type(value) for value in values if value is not None}
+    if types and types <= {int}:
+        return pa.int64()
+    if types and types <= {int, float}:
+        return pa.float64()
+    if types == {bytes}:
+        return pa.binary()
+    return pa.string()
+
+def _arrow_array(pa, values: Tuple, arrow_type):
+    """Convert one column of a batch, stringifying values of string columns"""
+    if arrow_type == pa.string():
+        values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+    return pa.array(values, type=arrow_type)
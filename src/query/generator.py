@@ -1,20 +1,32 @@
+from config.settings import Settings
 from src.llm.llm_factory import LLMFactory
 from src.utils.prompts import PromptTemplates
+from src.query.sql_extractor import StreamingSQLExtractor
 from src.query.validator import SQLValidator
+from src.handlers.feedback_handler import FeedbackHandler
 from src.handlers.feedback_learning import FeedbackLearningSystem
-from typing import Optional
+from src.utils.metrics import timed
+from src.utils.prompt_builder import PromptBuilder, fit_items
+from typing import Dict, List, Optional, Tuple
 
 class QueryGenerator:
     """Generate SQL queries from natural language"""
     
-    def __init__(self, model_name: str = None):
-        self.llm = LLMFactory.create_llm(model_name)
+    # Rendered after the schema: grounding hints such as which column holds
+    # a value mentioned in the question
+    HINTS_HEADER = "Hints:\n"
+    
+    def __init__(self, model_name: str = None, feedback_handler: FeedbackHandler = None):
+        # Error correction also produces SQL, so both stages share this profile
+        self.llm = LLMFactory.create_llm(model_name, stage="sql_generation")
         self.validator = SQLValidator()
         self.prompt_templates = PromptTemplates()
-        self.learning_system = FeedbackLearningSystem()
+        self.learning_system = FeedbackLearningSystem(feedback_handler)
     
     def generate(self, question: str, schema: str, use_few_shot: bool = False, 
-                 use_chain_of_thought: bool = False, use_feedback_learning: bool = True) -> str:
+                 use_chain_of_thought: bool = False, use_feedback_learning: bool = True,
+                 timings: Dict[str, float] = None, llm_metrics: Dict = None,
+                 hints: List[str] = None) -> str:
         """
         Generate SQL query from question
         
@@ -24,42 +36,69 @@ class QueryGenerator:
             use_few_shot: Use few-shot prompting
             use_chain_of_thought: Use chain-of-thought prompting
             use_feedback_learning: Use learned examples from feedback
+            timings: Optional dict that receives per-stage durations in seconds
+            llm_metrics: Optional dict that receives the Ollama generation metrics
+            hints: Optional hint lines shown after the schema
             
         Returns:
             Generated SQL query
         """
         
         if use_chain_of_thought:
-            prompt = self.prompt_templates.CHAIN_OF_THOUGHT_PROMPT.format(
-                schema=schema,
-                question=question
-            )
+            template = self.prompt_templates.CHAIN_OF_THOUGHT_PROMPT
         elif use_few_shot:
-            prompt = self.prompt_templates.FEW_SHOT_PROMPT.format(
-                schema=schema,
-                question=question
-            )
+            template = self.prompt_templates.FEW_SHOT_PROMPT
         else:
-            prompt = self.prompt_templates.SQL_GENERATION_PROMPT.format(
-                schema=schema,
-                question=question
-            )
+            template = self.prompt_templates.SQL_GENERATION_PROMPT
+        
+        # Look up learned examples if feedback learning is enabled and data is available
+        example_items, correction_items = [], []
+        with timed(timings, "feedback_lookup"):
+            if use_feedback_learning and self.learning_system.feedback_handler.has_learning_data():
+                example_items = self.learning_system.get_example_items(question, max_examples=3)
+                correction_items = self.learning_system.get_correction_items(max_corrections=2)
         
-        # Enhance with feedback learning if enabled and data is available
-        if use_feedback_learning and self.learning_system.feedback_handler.has_learning_data():
-            prompt = self.learning_system.enhance_prompt_with_feedback(
-                prompt, question, use_examples=True, use_corrections=True
+        with timed(timings, "prompt_build"):
+            builder = PromptBuilder(template, stage="sql_generation")
+            builder.add_section("question", question, required=True)
+            builder.add_section("schema", items=self._schema_items(schema), required=True)
+            builder.add_section(
+                "examples", items=example_items, priority=1, separator="",
+                header=self.learning_system.EXAMPLES_HEADER
             )
+            builder.add_section(
+                "corrections", items=correction_items, priority=2, separator="",
+                header=self.learning_system.CORRECTIONS_HEADER
+            )
+            # Hints are short and point at exact columns, so they outlive feedback
+            builder.add_section(
+                "hints", items=hints or [], priority=3, separator="\n", header=self.HINTS_HEADER
+            )
+            
+            prompt = builder.build(lambda texts: self.learning_system.inject_feedback(
+                template.format(schema=self._schema_with_hints(texts), question=texts["question"]),
+                [texts["examples"], texts["corrections"]]
+            ))
         
-        sql_query = self.llm.invoke(prompt).strip()
+        with timed(timings, "llm"):
+            sql_query, call_metrics = self._complete_sql(prompt, stage="sql_generation")
+            sql_query = sql_query.strip()
+        
+        if llm_metrics is not None:
+            llm_metrics.update(call_metrics)
+            llm_metrics["prompt_estimated_tokens"] = builder.report["tokens"]
         
         # Clean the query
-        sql_query = self.validator.clean_sql(sql_query)
+        with timed(timings, "sql_cleaning"):
+            sql_query = self.validator.clean_sql(sql_query)
         
         return sql_query
     
     def regenerate_with_error(self, question: str, schema: str, 
-                            original_query: str, error: str) -> str:
+                            original_query: str, error: str,
+                            timings: Dict[str, float] = None,
+                            llm_metrics: Dict = None,
+                            hints: List[str] = None) -> str:
         """
         Regenerate query after error
         
@@ -68,18 +107,66 @@ class QueryGenerator:
             schema: Database schema
             original_query: Query that failed
             error: Error message
+            timings: Optional dict that receives per-stage durations in seconds
+            llm_metrics: Optional dict that receives the Ollama generation metrics
+            hints: Optional hint lines shown after the schema
             
         Returns:
             Corrected SQL query
         """
         
-        prompt = self.prompt_templates.ERROR_CORRECTION_PROMPT.format(
-            sql_query=original_query,
-            error=error,
-            schema=schema
-        )
+        with timed(timings, "prompt_build"):
+            builder = PromptBuilder(
+                self.prompt_templates.ERROR_CORRECTION_PROMPT, stage="error_correction"
+            )
+            builder.add_section("sql_query", original_query, required=True)
+            builder.add_section("error", error, required=True)
+            builder.add_section("schema", items=self._schema_items(schema), required=True)
+            builder.add_section(
+                "hints", items=hints or [], priority=1, separator="\n", header=self.HINTS_HEADER
+            )
+            prompt = builder.build(lambda texts: self.prompt_templates.ERROR_CORRECTION_PROMPT.format(
+                sql_query=texts["sql_query"], error=texts["error"],
+                schema=self._schema_with_hints(texts)
+            ))
+        
+        with timed(timings, "llm"):
+            sql_query, call_metrics = self._complete_sql(prompt, stage="error_correction")
+            sql_query = sql_query.strip()
+        
+        if llm_metrics is not None:
+            llm_metrics.update(call_metrics)
+            llm_metrics["prompt_estimated_tokens"] = builder.report["tokens"]
         
-        sql_query = self.llm.invoke(prompt).strip()
-        sql_query = self.validator.clean_sql(sql_query)
+        with timed(timings, "sql_cleaning"):
+            sql_query = self.validator.clean_sql(sql_query)
         
         return sql_query
+    
+    def _complete_sql(self, prompt: str, stage: str) -> Tuple[str, Dict]:
+        """Get the SQL of a completion, cancelling the generation once a statement is complete"""
+        if not Settings.SQL_STREAMING:
+            return self.llm.invoke_with_metrics(prompt, stage=stage)
+        
+        extractor = StreamingSQLExtractor()
+        _, call_metrics = self.llm.stream_with_metrics(prompt, stage=stage, until=extractor.feed)
+        return extractor.finish(), call_metrics
+    
+    @staticmethod
+    def _schema_items(schema: str) -> List[str]:
+        """
+        Split the schema into table blocks cut to PROMPT_SCHEMA_TOKEN_BUDGET
+
+        The cut ignores the question, hints and feedback, so the schema (and
+        with it the cached prompt prefix) is the same for every request
+        against a database; only the per-request text is trimmed to the stage
+        budget.
+        """
+        return fit_items(schema.split("\n\n"), Settings.PROMPT_SCHEMA_TOKEN_BUDGET)
+    
+    @staticmethod
+    def _schema_with_hints(texts: Dict[str, str]) -> str:
+        """Render the schema section followed by the hints section, if any"""
+        if not texts["hints"]:
+            return texts["schema"]
+        return f"{texts['schema'].rstrip()}\n\n{texts['hints']}"
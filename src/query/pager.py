@@ -0,0 +1,90 @@
+from src.database.connection import DatabaseConnection
+from config.settings import Settings
+from typing import List, Sequence, Tuple
+
+class ResultPager:
+    """
+    Serve a query result one page at a time
+
+    Results up to `max_cached_rows` rows are kept and sliced. Larger results
+    are dropped and each page is re-read with LIMIT/OFFSET, so the memory held
+    per pager (one per web session) stays bounded whatever the result size.
+    """
+
+    def __init__(self, db: DatabaseConnection, sql: str, columns: List[str],
+                 rows: Sequence = None, page_size: int = None, max_cached_rows: int = None):
+        """
+        Args:
+            db: Connection the query runs on
+            sql: Query that produced the result
+            columns: Result column names
+            rows: Already fetched rows, if any (counted instead of re-counting)
+            page_size: Rows per page (defaults to Settings.WEB_PAGE_SIZE)
+            max_cached_rows: Largest result kept in memory (defaults to
+                Settings.WEB_MAX_CACHED_ROWS)
+        """
+        self.db = db
+        self.sql = sql.strip().rstrip(';')
+        # Wrapped queries close their parenthesis on a new line, so a
+        # trailing "-- comment" cannot swallow it
+        self.columns = columns
+        self.page_size = page_size or Settings.WEB_PAGE_SIZE
+        max_cached_rows = max_cached_rows if max_cached_rows is not None else Settings.WEB_MAX_CACHED_ROWS
+
+        if rows is None:
+            self.total_rows = self._count_rows()
+        else:
+            self.total_rows = len(rows)
+
+        self.rows = rows if rows is not None and self.total_rows <= max_cached_rows else None
+
+    def _count_rows(self) -> int:
+        result, error = self.db.execute_query(f"SELECT COUNT(*) FROM ({self.sql}\n)")
+        if error:
+            raise RuntimeError(error)
+        return result[1][0][0]
+
+    @property
+    def num_pages(self) -> int:
+        return max(1, -(-self.total_rows // self.page_size))
+
+    @property
+    def cached(self) -> bool:
+        return self.rows is not None
+
+    def clamp(self, page: int) -> int:
+        """Limit a page number to the valid range"""
+        return min(max(int(page or 1), 1), self.num_pages)
+
+    def page(self, page: int) -> Tuple[int, Sequence]:
+        """
+        Get one page of rows
+
+        Args:
+            page: 1-based page number (clamped to the valid range)
+
+        Returns:
+            Tuple of (page number actually served, rows)
+        """
+        page = self.clamp(page)
+        offset = (page - 1) * self.page_size
+
+        if self.cached:
+            return page, self.rows[offset:offset + self.page_size]
+
+        result, error = self.db.execute_query(
+            f"SELECT * FROM ({self.sql}\n) LIMIT {self.page_size} OFFSET {offset}", columnar=True
+        )
+        if error:
+            raise RuntimeError(error)
+        return page, result[1]
+
+    def describe(self, page: int) -> str:
+        """Describe which rows a page shows, e.g. 'Rows 101-200 of 5,000 (page 2 of 50)'"""
+        if not self.total_rows:
+            return "No rows"
+
+        page = self.clamp(page)
+        first = (page - 1) * self.page_size + 1
+        last = min(page * self.page_size, self.total_rows)
+        return f"Rows {first:,}-{last:,} of {self.total_rows:,} (page {page:,} of {self.num_pages:,})"
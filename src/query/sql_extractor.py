@@ -0,0 +1,252 @@
+import re
+from typing import Optional
+
+# A statement starts with one of these keywords; the lookahead is the
+# longest keyword plus one boundary character
+_START_KEYWORD = re.compile(r"(SELECT|WITH)\b", re.IGNORECASE)
+_START_LOOKAHEAD = len("SELECT") + 1
+_FENCE = "```"
+
+class StreamingSQLExtractor:
+    """
+    Find the first complete SQL statement in a completion while it streams
+
+    Feed the completion chunk by chunk; `feed` returns True as soon as a
+    statement is complete, so the caller can cancel the rest of the
+    generation (e.g. the explanation a chain-of-thought prompt writes after
+    the query). A statement starts at a SELECT/WITH keyword at the start of
+    the response, at the start of a later line (upper case only, so prose
+    such as "Select the name column" is skipped) or as the first word of a
+    code fence. It is complete at a ';' outside strings, comments and
+    parentheses, or at the closing code fence of a statement that started in
+    a code block. A fence reached by a statement that started outside one
+    means that "statement" was prose (e.g. "Select the names of all
+    employees."): it is dropped and the code block is scanned instead. Code
+    blocks that do not hold a statement are skipped.
+
+    Only characters whose meaning cannot change with the next chunk are
+    scanned, so splitting the text differently never changes the result.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False  # a complete statement was found
+        self._finished = False  # no more chunks will come
+        self._pos = 0
+        self._state = "prose"  # prose, fence_header, skip_block or sql
+        self._start = None
+        self._fenced = False  # the statement started inside a code fence
+        self._end = None
+        self._depth = 0
+        self._quote = None
+        self._comment = None  # "line" or "block"
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add a chunk of the completion
+
+        Args:
+            chunk: Next piece of streamed text
+
+        Returns:
+            True once a complete statement has been seen
+        """
+        if not self.done:
+            self.text += chunk
+            self._scan()
+        return self.done
+
+    def finish(self) -> str:
+        """
+        Mark the end of the completion and get the text to clean
+
+        Returns:
+            The complete statement if one was found; else the statement that
+            was still open when the stream ended, if its parentheses, strings
+            and comments are closed; else the whole completion
+        """
+        self._finished = True
+        self._scan()
+        if self.done:
+            return self.text[self._start:self._end]
+        if (self._state == "sql" and self._depth == 0 and self._quote is None
+                and self._comment != "block"):
+            return self.text[self._start:]
+        return self.text
+
+    @property
+    def sql(self) -> Optional[str]:
+        """The complete statement, or None while none was found"""
+        return self.text[self._start:self._end] if self.done else None
+
+    def _available(self, count: int) -> bool:
+        """Whether `count` characters from the scan position are known for good"""
+        return self._finished or self._pos + count <= len(self.text)
+
+    def _scan(self):
+        text = self.text
+        while not self.done and self._pos < len(text):
+            step = getattr(self, f"_scan_{self._state}")()
+            if step is None:
+                return  # needs more text
+            self._pos += step
+
+    def _scan_prose(self) -> Optional[int]:
+        text, pos = self.text, self._pos
+        if text[pos] == "`":
+            if not self._available(len(_FENCE)):
+                return None
+            if text.startswith(_FENCE, pos):
+                self._state = "fence_header"
+                return len(_FENCE)
+            return 1
+
+        at_line_start = pos == 0 or text[pos - 1] == "\n"
+        if not at_line_start:
+            return 1
+
+        line = text[pos:]
+        indent = len(line) - len(line.lstrip(" \t"))
+        if pos + indent == len(text) and not self._finished:
+            return None
+        if not self._available(indent + _START_LOOKAHEAD):
+            return None
+
+        # Any case at the start of the response, upper case on later lines
+        match = _START_KEYWORD.match(text, pos + indent)
+        first_line = not text[:pos].strip()
+        if match and (first_line or match.group(1).isupper()):
+            self._begin(pos + indent, fenced=False)
+            return indent
+        return 1
+
+    def _scan_fence_header(self) -> Optional[int]:
+        """Skip the language tag of an opened fence and check the block holds a statement"""
+        text, pos = self.text, self._pos
+        newline = text.find("\n", pos)
+        if newline == -1:
+            if not self._finished:
+                return None
+            newline = len(text) - 1
+
+        body = newline + 1
+        content = text[body:]
+        indent = len(content) - len(content.lstrip())
+        if body + indent == len(text) and not self._finished:
+            return None
+        if not self._finished and body + indent + _START_LOOKAHEAD > len(text):
+            return None
+
+        if _START_KEYWORD.match(text, body + indent):
+            self._begin(body + indent, fenced=True)
+        else:
+            self._state = "skip_block"
+        return body + indent - pos
+
+    def _scan_skip_block(self) -> Optional[int]:
+        text, pos = self.text, self._pos
+        if text[pos] != "`":
+            return 1
+        if not self._available(len(_FENCE)):
+            return None
+        if text.startswith(_FENCE, pos):
+            self._state = "prose"
+            return len(_FENCE)
+        return 1
+
+    def _scan_sql(self) -> Optional[int]:
+        text, pos = self.text, self._pos
+        char = text[pos]
+
+        # Checked before strings and comments: prose such as "the employees'
+        # names" opens a quote that never closes
+        if char == "`" and not self._fenced:
+            if not self._available(len(_FENCE)):
+                return None
+            if text.startswith(_FENCE, pos):
+                self._restart_in_fence()
+                return len(_FENCE)
+
+        if self._comment == "line":
+            if char == "\n":
+                self._comment = None
+            return 1
+        if self._comment == "block":
+            if char != "*":
+                return 1
+            if not self._available(2):
+                return None
+            if text.startswith("*/", pos):
+                self._comment = None
+                return 2
+            return 1
+
+        if self._quote is not None:
+            if char != self._quote:
+                return 1
+            if not self._available(2):
+                return None
+            if text.startswith(char * 2, pos):
+                return 2  # escaped quote
+            self._quote = None
+            return 1
+
+        if char == "`":
+            if not self._available(len(_FENCE)):
+                return None
+            if text.startswith(_FENCE, pos):
+                self._complete(pos)
+                return len(_FENCE)
+            self._quote = char
+            return 1
+        if char in "'\"":
+            self._quote = char
+        elif char == "[":
+            self._quote = "]"
+        elif char in "-/":
+            if not self._available(2):
+                return None
+            if text.startswith("--", pos):
+                self._comment = "line"
+                return 2
+            if text.startswith("/*", pos):
+                self._comment = "block"
+                return 2
+        elif char == "(":
+            self._depth += 1
+        elif char == ")":
+            self._depth = max(self._depth - 1, 0)
+        elif char == ";" and self._depth == 0:
+            self._complete(pos + 1)
+        return 1
+
+    def _begin(self, start: int, fenced: bool):
+        self._state = "sql"
+        self._start = start
+        self._fenced = fenced
+
+    def _restart_in_fence(self):
+        """Drop a prose-started statement at an opening fence and scan the code block"""
+        self._state = "fence_header"
+        self._start = None
+        self._depth = 0
+        self._quote = None
+        self._comment = None
+
+    def _complete(self, end: int):
+        self._end = end
+        self.done = True
+
+def extract_sql(text: str) -> str:
+    """
+    Get the first complete SQL statement of a finished completion
+
+    Args:
+        text: Whole completion
+
+    Returns:
+        Same text StreamingSQLExtractor.finish gives for this completion
+    """
+    extractor = StreamingSQLExtractor()
+    extractor.feed(text)
+    return extractor.finish()
@@ -1,5 +1,5 @@
-import sqlparse
 from typing import Tuple, Optional
+from src.utils.lazy_imports import lazy_import
 
 class SQLValidator:
     """Validate SQL queries"""
@@ -13,6 +13,7 @@ class SQLValidator:
         """
         try:
             # Parse the query
+            sqlparse = lazy_import("sqlparse")
             parsed = sqlparse.parse(query)
             
             if not parsed:
@@ -50,6 +51,7 @@ class SQLValidator:
                 raise ValueError(f"Dangerous keyword detected: {keyword}")
         
         # Format the query
+        sqlparse = lazy_import("sqlparse")
         formatted = sqlparse.format(query, reindent=True, keyword_case='upper')
         return formatted
     
@@ -0,0 +1,58 @@
+import importlib
+import sys
+import time
+from typing import Dict, Optional
+
+# Wall-clock seconds spent importing each module loaded through lazy_import
+_IMPORT_TIMES: Dict[str, float] = {}
+
+def lazy_import(module_name: str):
+    """
+    Import a heavy module on first use and record how long it took
+
+    Args:
+        module_name: Dotted module name (e.g., 'pandas')
+
+    Returns:
+        The imported module
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    start_time = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _IMPORT_TIMES[module_name] = time.perf_counter() - start_time
+
+    return module
+
+def get_import_times() -> Dict[str, float]:
+    """Get recorded import times in seconds, slowest first"""
+    return dict(sorted(_IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True))
+
+def format_startup_profile(phases: Dict[str, float], total: Optional[float] = None) -> str:
+    """
+    Format an import-time breakdown for display
+
+    Args:
+        phases: Named startup phases with their duration in seconds
+        total: Total time since process start in seconds
+
+    Returns:
+        Formatted profile text
+    """
+    lines = ["Startup profile:", "  Phases:"]
+    for name, seconds in phases.items():
+        lines.append(f"    {name:<32} {seconds * 1000:9.1f} ms")
+
+    lines.append("  Lazy imports:")
+    import_times = get_import_times()
+    if not import_times:
+        lines.append("    (none)")
+    for name, seconds in import_times.items():
+        lines.append(f"    {name:<32} {seconds * 1000:9.1f} ms")
+
+    if total is not None:
+        lines.append(f"  {'Total':<34} {total * 1000:9.1f} ms")
+
+    return "\n".join(lines)
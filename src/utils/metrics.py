@@ -0,0 +1,162 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+def nearest_rank(ordered: List[float], percent: float) -> float:
+    """Get the nearest-rank percentile of an already sorted, non-empty list"""
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+class LatencyHistogram:
+    """
+    Bounded in-process histogram of observed values
+
+    Keeps the most recent samples (a sliding window) so percentiles reflect
+    current behaviour while memory stays constant.
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        """Record one observation"""
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Get the nearest-rank percentile of the current window"""
+        if not self.samples:
+            return None
+        return nearest_rank(sorted(self.samples), percent)
+
+    def summary(self) -> Dict:
+        """Get count, mean and p50/p95/p99 of the current window"""
+        if not self.samples:
+            return {"count": 0}
+
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": nearest_rank(ordered, 50),
+            "p95": nearest_rank(ordered, 95),
+            "p99": nearest_rank(ordered, 99),
+            "max": ordered[-1]
+        }
+
+class MetricsRegistry:
+    """Thread-safe collection of named histograms"""
+
+    def __init__(self, max_samples: int = 10000):
+        self.max_samples = max_samples
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._dump_thread = None
+        self._dump_stop = threading.Event()
+
+    def observe(self, name: str, value: float):
+        """Record a value in the histogram called `name`"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = LatencyHistogram(self.max_samples)
+                self._histograms[name] = histogram
+            histogram.observe(value)
+
+    def observe_timings(self, prefix: str, timings: Dict[str, float]):
+        """Record every entry of a stage -> seconds mapping under `prefix`"""
+        for stage, seconds in timings.items():
+            self.observe(f"{prefix}.{stage}", seconds)
+
+    def names(self) -> List[str]:
+        """Get all histogram names"""
+        with self._lock:
+            return sorted(self._histograms)
+
+    def snapshot(self) -> Dict:
+        """
+        Get a JSON-serializable snapshot of all histograms
+
+        Returns:
+            Dictionary with a timestamp and per-histogram summaries
+        """
+        with self._lock:
+            histograms = {name: hist.summary() for name, hist in sorted(self._histograms.items())}
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "metrics": histograms
+        }
+
+    def reset(self):
+        """Drop all recorded values"""
+        with self._lock:
+            self._histograms.clear()
+
+    def dump_json(self, path: str):
+        """Atomically write a snapshot to `path`"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_periodic_dump(self, path: str, interval: float = 60.0):
+        """
+        Dump a snapshot to `path` every `interval` seconds in the background
+
+        A final snapshot is also written when the process exits, so monitoring
+        can scrape the file at any time.
+        """
+        if self._dump_thread is not None:
+            return self._dump_thread
+
+        def run():
+            while not self._dump_stop.wait(interval):
+                self.dump_json(path)
+
+        self._dump_thread = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        self._dump_thread.start()
+        atexit.register(self.dump_json, path)
+        return self._dump_thread
+
+    def stop_periodic_dump(self):
+        """Stop the background dump thread"""
+        if self._dump_thread is not None:
+            self._dump_stop.set()
+            self._dump_thread.join()
+            self._dump_thread = None
+            self._dump_stop.clear()
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str):
+    """
+    Time a block and add the elapsed seconds to `timings[stage]`
+
+    Does nothing when `timings` is None, so callers can make timing optional.
+    """
+    if timings is None:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start_time
+
+# Process-wide registry used by the chain and the LLM clients
+metrics = MetricsRegistry()
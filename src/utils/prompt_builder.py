@@ -0,0 +1,181 @@
+import logging
+import math
+from typing import Callable, Dict, List, Optional
+from config.settings import Settings
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in `text`
+
+    Uses the characters-per-token ratio from Settings, which is close enough
+    for budgeting without loading a model-specific tokenizer.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / Settings.CHARS_PER_TOKEN)
+
+def fit_items(items: List[str], budget: Optional[int], separator: str = "\n\n") -> List[str]:
+    """
+    Keep the leading items whose joined text fits in `budget` tokens
+
+    Args:
+        items: Ordered items
+        budget: Token budget (None keeps every item)
+        separator: Separator the items are joined with
+
+    Returns:
+        The longest prefix of `items` within budget
+    """
+    if budget is None:
+        return list(items)
+
+    kept, length = [], 0
+    for item in items:
+        length += len(item) + (len(separator) if kept else 0)
+        # Same estimate as estimate_tokens(separator.join(kept)), without re-joining
+        if math.ceil(length / Settings.CHARS_PER_TOKEN) > budget:
+            break
+        kept.append(item)
+    return kept
+
+class PromptSection:
+    """A named, trimmable part of a prompt made of ordered items"""
+
+    def __init__(self, name: str, items: List[str], header: str = "",
+                 priority: int = 0, required: bool = False, separator: str = "\n\n"):
+        self.name = name
+        self.items = list(items)
+        self.header = header
+        self.priority = priority
+        self.required = required
+        self.separator = separator
+        self.original_tokens = estimate_tokens(self.text)
+
+    @property
+    def text(self) -> str:
+        """Rendered section text (empty when every item was trimmed)"""
+        if not self.items:
+            return ""
+        return self.header + self.separator.join(self.items)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+class PromptBuilder:
+    """
+    Build a prompt from sections while enforcing a per-stage token budget
+
+    Sections are trimmed item by item from the end, lowest priority first,
+    until the rendered prompt fits. Required sections are never trimmed.
+    """
+
+    def __init__(self, template: str, stage: str, budget: Optional[int] = None):
+        """
+        Args:
+            template: Format string with one placeholder per section
+            stage: Pipeline stage used to look up the budget and label logs
+            budget: Token budget (defaults to Settings.PROMPT_TOKEN_BUDGETS[stage])
+        """
+        self.template = template
+        self.stage = stage
+        self.budget = budget if budget is not None else Settings.PROMPT_TOKEN_BUDGETS.get(stage)
+        self.sections: Dict[str, PromptSection] = {}
+        self.report: Dict = {}
+
+    def add_section(self, name: str, text: str = None, items: List[str] = None,
+                    header: str = "", priority: int = 0, required: bool = False,
+                    separator: str = "\n\n") -> "PromptBuilder":
+        """
+        Add a section; pass either its full `text` or its trimmable `items`
+
+        Args:
+            name: Placeholder name in the template
+            text: Section text (kept whole, or dropped entirely when trimmed)
+            items: Ordered units that can be dropped one at a time from the end
+            header: Text rendered before the items (dropped with the last item)
+            priority: Higher priority sections are trimmed later
+            required: Never trim this section
+            separator: Separator between items
+        """
+        if items is None:
+            items = [text] if text else []
+        self.sections[name] = PromptSection(name, items, header, priority, required, separator)
+        return self
+
+    def build(self, render: Callable[[Dict[str, str]], str] = None) -> str:
+        """
+        Render the prompt within budget
+
+        Args:
+            render: Optional callable mapping section texts to the final prompt
+                    (defaults to formatting the template)
+
+        Returns:
+            Prompt text
+        """
+        if render is None:
+            render = lambda texts: self.template.format(**texts)
+
+        prompt = render(self._texts())
+        prompt_tokens = estimate_tokens(prompt)
+
+        while self.budget is not None and prompt_tokens > self.budget:
+            if not self._trim(prompt_tokens - self.budget):
+                logger.warning(
+                    "%s prompt needs %d tokens after trimming, over its budget of %d",
+                    self.stage, prompt_tokens, self.budget
+                )
+                break
+            prompt = render(self._texts())
+            prompt_tokens = estimate_tokens(prompt)
+
+        self._report(prompt_tokens)
+        return prompt
+
+    def _texts(self) -> Dict[str, str]:
+        return {name: section.text for name, section in self.sections.items()}
+
+    def _trim(self, overflow: int) -> bool:
+        """Drop items worth about `overflow` tokens; return False if nothing is left to drop"""
+        trimmed = False
+        candidates = sorted(
+            (section for section in self.sections.values() if not section.required),
+            key=lambda section: section.priority
+        )
+
+        for section in candidates:
+            while section.items and overflow > 0:
+                item = section.items.pop()
+                overflow -= estimate_tokens(item + section.separator)
+                if not section.items:
+                    overflow -= estimate_tokens(section.header)
+                trimmed = True
+            if overflow <= 0:
+                break
+
+        return trimmed
+
+    def _report(self, prompt_tokens: int):
+        """Log and record the final prompt size"""
+        self.report = {
+            "stage": self.stage,
+            "budget": self.budget,
+            "tokens": prompt_tokens,
+            "sections": {
+                name: {"tokens": section.tokens, "original_tokens": section.original_tokens}
+                for name, section in self.sections.items()
+            }
+        }
+        metrics.observe(f"prompt.{self.stage}.tokens", prompt_tokens)
+
+        logger.info(
+            "%s prompt: ~%d tokens (budget %s) %s", self.stage, prompt_tokens, self.budget,
+            ", ".join(
+                f"{name}={section.tokens}/{section.original_tokens}"
+                for name, section in self.sections.items()
+            )
+        )
@@ -1,12 +1,18 @@
 class PromptTemplates:
-    """Prompt templates for different tasks"""
+    """
+    Prompt templates for different tasks
+
+    Layout rule: static instructions first, then the schema, then everything
+    that changes per request (hints, feedback examples, the question, a
+    failing query). The text up to the end of the schema is then
+    byte-identical for every request against a database, so Ollama reuses its
+    KV cache for that prefix instead of re-evaluating the schema. SQL
+    generation and error correction share one prefix (SQL_PREFIX), so a
+    retry reuses the cache of the attempt before it.
+    """
     
-    SQL_GENERATION_PROMPT = """You are a SQL expert. Given a database schema and a natural language question, generate a valid SQL query.
-
-Database Schema:
-{schema}
-
-Question: {question}
+    # Shared static prefix of the SQL prompts; ends with the schema
+    SQL_PREFIX = """You are a SQL expert. Given a database schema and a natural language question, generate a valid SQL query.
 
 Important rules:
 - Return ONLY the SQL query, nothing else
@@ -17,33 +23,39 @@ Important rules:
 - Use GROUP BY for aggregations
 - Return SELECT statements only
 
+Database Schema:
+{schema}
+
+"""
+
+    SQL_GENERATION_PROMPT = SQL_PREFIX + """Question: {question}
+
 SQL Query:"""
 
-    CLARIFICATION_PROMPT = """The following question might be ambiguous: "{question}"
+    CLARIFICATION_PROMPT = """Analyze if the question below is ambiguous given the schema. If it is ambiguous, provide 2-3 possible interpretations.
+If it's clear, respond with "CLEAR".
 
 Database Schema:
 {schema}
 
-Analyze if this question is ambiguous given the schema. If it is ambiguous, provide 2-3 possible interpretations.
-If it's clear, respond with "CLEAR"."""
+Question: {question}"""
 
-    SUMMARIZATION_PROMPT = """Given a SQL query and its results, provide a natural language summary.
+    SUMMARIZATION_PROMPT = """Given a SQL query and its results, provide a clear, concise summary of the results in natural language that directly answers the original question.
 
 Question: {question}
 SQL Query: {sql_query}
 Results: {results}
 
-Provide a clear, concise summary of the results in natural language that directly answers the original question."""
+Summary:"""
 
-    ERROR_CORRECTION_PROMPT = """The following SQL query has an error:
+    ERROR_CORRECTION_PROMPT = SQL_PREFIX + """The following SQL query has an error:
 
 SQL Query: {sql_query}
 Error: {error}
 
-Database Schema:
-{schema}
+Generate a corrected SQL query that fixes this error. Return ONLY the corrected SQL query, nothing else.
 
-Generate a corrected SQL query that fixes this error. Return ONLY the corrected SQL query, nothing else."""
+SQL Query:"""
 
     FEW_SHOT_PROMPT = """You are a SQL expert. Here are some examples:
 
@@ -70,25 +82,24 @@ SQL Query:"""
 
     CHAIN_OF_THOUGHT_PROMPT = """You are a SQL expert. Let's think step by step.
 
-Database Schema:
-{schema}
-
-Question: {question}
-
-First, let's break down what we need to do:
+For the question below, first break down what we need to do:
 1. Identify which tables are needed
 2. Determine what columns to select
 3. Decide if JOINs are needed
 4. Consider any filters (WHERE clauses)
 5. Think about aggregations or sorting
 
-Now generate the SQL query. Return ONLY the final SQL query."""
-
-    FEEDBACK_ENHANCED_PROMPT = """You are a SQL expert. Learn from previous successful queries and common mistakes.
+Then generate the SQL query. Return ONLY the final SQL query.
 
 Database Schema:
 {schema}
 
+Question: {question}
+
+SQL Query:"""
+
+    FEEDBACK_ENHANCED_PROMPT = SQL_PREFIX + """Learn from previous successful queries and common mistakes.
+
 {feedback_examples}
 
 {feedback_corrections}
@@ -14,6 +14,14 @@ from src.database.connection import DatabaseConnection
 from src.query.validator import SQLValidator
 from src.query.generator import QueryGenerator
 from src.query.executor import QueryExecutor
+from config.settings import Settings
+import tempfile
+
+# Tests build the sample and feedback databases (and their column profile
+# caches) in a temporary directory instead of data/
+_TEST_DATA_DIR = tempfile.mkdtemp(prefix="text_to_sql_tests_")
+Settings.DATABASE_PATH = os.path.join(_TEST_DATA_DIR, "sample_database.db")
+Settings.FEEDBACK_DB_PATH = os.path.join(_TEST_DATA_DIR, "feedback.db")
 
 
 def test_database_connection():
@@ -69,6 +77,49 @@ def test_query_executor():
     print("✅ Query executor test passed")
 
 
+def test_lazy_imports():
+    """Test that the CLI path never imports gradio, pandas or sqlparse"""
+    import subprocess
+    
+    # A fresh interpreter, so modules imported by other tests do not count
+    code = """
+import os, sys, tempfile
+sys.path.insert(0, sys.argv[1])
+from config.settings import Settings
+work_dir = tempfile.mkdtemp()
+Settings.DATABASE_PATH = os.path.join(work_dir, "sample.db")
+Settings.FEEDBACK_DB_PATH = os.path.join(work_dir, "feedback.db")
+
+import src.main
+import src.interfaces
+from src.interfaces import CLI
+CLI()
+print(sorted(name for name in ("gradio", "pandas", "sqlparse") if name in sys.modules))
+
+try:
+    src.interfaces.Missing
+except AttributeError:
+    print("AttributeError")
+
+from src.utils.lazy_imports import format_startup_profile, lazy_import
+print(format_startup_profile({"settings": 0.0125}))
+lazy_import("pandas")
+print(format_startup_profile({"settings": 0.0125}, total=1.5))
+"""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    output = subprocess.run([sys.executable, "-c", code, root], capture_output=True, text=True,
+                            check=True, cwd=root).stdout
+    loaded, missing, profile = output.split("\n", 2)
+    
+    assert loaded == "[]"
+    assert missing == "AttributeError"
+    before, after = profile.split("Startup profile:")[1:]
+    assert "settings" in before and "12.5 ms" in before and "Total" not in before
+    assert "pandas" not in before and "pandas" in after
+    assert after.rstrip().endswith("1500.0 ms")
+    print("✅ Lazy imports test passed")
+
+
 def test_clean_sql():
     """Test SQL cleaning"""
     validator = SQLValidator()
@@ -88,6 +139,1073 @@ def test_clean_sql():
     print("✅ SQL cleaning test passed")
 
 
+def test_llm_registry_reuses_clients():
+    """Test that LLMFactory hands out one client per configuration"""
+    from src.llm.llm_factory import LLMFactory
+    
+    LLMFactory.clear_registry()
+    
+    first = LLMFactory.create_llm("llama3:latest")
+    second = LLMFactory.create_llm("llama3:latest")
+    other = LLMFactory.create_llm("llama3:latest", temperature=0.7)
+    
+    assert first is second
+    assert other is not first
+    
+    stats = LLMFactory.get_registry_stats()
+    assert stats["instances"] == 2
+    assert stats["reuses"] == 1
+    
+    LLMFactory.clear_registry()
+    print("✅ LLM registry test passed")
+
+
+class StubLLM:
+    """Offline stand-in for an Ollama client that returns a fixed completion"""
+    
+    def __init__(self, completion: str):
+        self.completion = completion
+    
+    def invoke(self, prompt: str) -> str:
+        return self.completion
+
+
+class RecordingStubLLM(StubLLM):
+    """StubLLM that also keeps every prompt it receives"""
+    
+    def __init__(self, completion: str):
+        super().__init__(completion)
+        self.prompts = []
+    
+    def invoke(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return self.completion
+
+
+def test_chain_stage_timings():
+    """Test that the chain reports per-stage and per-attempt timings"""
+    from src.chain.text_to_sql_chain import TextToSQLChain
+    from src.utils.metrics import metrics
+    
+    from src.llm.metered_llm import MeteredLLM
+    
+    chain = TextToSQLChain()
+    chain.generator.llm = MeteredLLM(StubLLM("SELECT COUNT(*) FROM employees"), "stub")
+    chain.summarizer.llm = MeteredLLM(StubLLM("There are 7 employees."), "stub")
+    
+    result = chain.run("How many employees are there?", use_feedback_learning=False)
+    chain.close()
+    
+    assert result["error"] is None
+    assert result["attempts"][0]["timings"]["llm"] >= 0
+    for stage in ["prompt_build", "llm", "validation", "execution", "summarization", "total"]:
+        assert stage in result["timings"]
+    
+    assert result["attempts"][0]["llm_metrics"]["stage"] == "sql_generation"
+    assert result["llm_metrics"]["total"]["calls"] == 2
+    
+    snapshot = metrics.snapshot()["metrics"]
+    assert snapshot["chain.stage.total"]["count"] >= 1
+    assert snapshot["llm.stub.summarization.wall_time"]["count"] >= 1
+    assert "p99" in snapshot["chain.attempt.llm"]
+    print("✅ Chain stage timings test passed")
+
+
+def test_extract_generation_metrics():
+    """Test conversion of Ollama generation_info into latency metrics"""
+    from src.llm.metered_llm import extract_generation_metrics
+    
+    info = {
+        "load_duration": 500_000_000,
+        "prompt_eval_count": 200,
+        "prompt_eval_duration": 250_000_000,
+        "eval_count": 40,
+        "eval_duration": 800_000_000,
+        "total_duration": 1_600_000_000
+    }
+    result = extract_generation_metrics(info, wall_time=1.7)
+    
+    assert result["ttft"] == 0.75
+    assert result["tokens_per_second"] == 50.0
+    assert result["prefill_tokens_per_second"] == 800.0
+    assert extract_generation_metrics(None, 0.1)["ttft"] is None
+    print("✅ Generation metrics test passed")
+
+
+def test_prompt_builder_budget():
+    """Test that over-budget prompts lose low-priority sections first"""
+    from src.utils.prompt_builder import PromptBuilder, estimate_tokens
+    
+    template = "{schema}\n{examples}\nQuestion: {question}"
+    schema_items = [f"Table: t{idx}\n  - id INTEGER" for idx in range(5)]
+    example_items = [f"Example {idx}: " + "x" * 400 for idx in range(3)]
+    
+    builder = PromptBuilder(template, stage="test", budget=120)
+    builder.add_section("question", "How many rows?", required=True)
+    builder.add_section("schema", items=schema_items, priority=2)
+    builder.add_section("examples", items=example_items, priority=1)
+    prompt = builder.build()
+    
+    assert estimate_tokens(prompt) <= 120
+    assert "How many rows?" in prompt
+    assert all(item in prompt for item in schema_items)
+    assert builder.report["sections"]["examples"]["tokens"] < \
+        builder.report["sections"]["examples"]["original_tokens"]
+    print("✅ Prompt builder budget test passed")
+
+
+def test_llm_record_replay():
+    """Test that replay mode serves recorded completions without Ollama"""
+    import tempfile
+    from src.llm.cassette import Cassette, RecordingLLM
+    from src.llm.llm_factory import LLMFactory
+    from src.llm.metered_llm import MeteredLLM
+    from config.settings import Settings
+    
+    class FakeOllama:
+        def generate(self, prompts):
+            from langchain_core.outputs import Generation, LLMResult
+            return LLMResult(generations=[[Generation(
+                text="SELECT 1", generation_info={"eval_count": 3, "eval_duration": 1_000_000}
+            )]])
+    
+    work_dir = tempfile.mkdtemp()
+    cassette_path = os.path.join(work_dir, "llm.jsonl.gz")
+    previous = (Settings.LLM_MODE, Settings.LLM_CASSETTE_PATH, Settings.LLM_REPLAY_SIMULATE_LATENCY)
+    options = {
+        name: value for name, value in LLMFactory.get_generation_options().items() if value is not None
+    }
+    
+    recorder = MeteredLLM(
+        RecordingLLM(FakeOllama(), Cassette(cassette_path), "fake:latest", options), "fake:latest"
+    )
+    assert recorder.invoke("prompt") == "SELECT 1"
+    
+    try:
+        LLMFactory.configure("replay", cassette_path)
+        replayed = LLMFactory.create_llm("fake:latest")
+        text, generation = replayed.invoke_with_metrics("prompt")
+        
+        assert text == "SELECT 1"
+        assert generation["completion_tokens"] == 3
+        try:
+            replayed.invoke("unrecorded prompt")
+            assert False, "Should have raised LookupError"
+        except LookupError:
+            pass
+    finally:
+        LLMFactory.configure(*previous)
+    
+    print("✅ LLM record/replay test passed")
+
+
+def test_generation_profiles():
+    """Test that each stage gets a client with its own generation options"""
+    import tempfile
+    from src.llm.llm_factory import LLMFactory
+    from config.settings import Settings
+    
+    previous = (Settings.LLM_MODE, Settings.LLM_CASSETTE_PATH, Settings.LLM_REPLAY_SIMULATE_LATENCY)
+    
+    try:
+        LLMFactory.configure("replay", os.path.join(tempfile.mkdtemp(), "llm.jsonl.gz"))
+        sql = LLMFactory.create_llm("llama3:latest", stage="sql_generation")
+        ambiguity = LLMFactory.create_llm("llama3:latest", stage="ambiguity")
+        default = LLMFactory.create_llm("llama3:latest")
+        
+        assert sql is LLMFactory.create_llm("llama3:latest", stage="sql_generation")
+        assert len({id(sql), id(ambiguity), id(default)}) == 3
+        
+        # Stage options layer over the defaults; explicit arguments win
+        assert "stop" not in sql.llm.options  # a server-side ';' stop would cut 'a;b'
+        assert sql.llm.options["num_predict"] == Settings.GENERATION_PROFILES["sql_generation"]["num_predict"]
+        assert ambiguity.llm.options["temperature"] == 0.0
+        assert "stop" not in default.llm.options
+        assert default.llm.options["num_predict"] == Settings.MAX_TOKENS
+        assert len({llm.llm.options["num_ctx"] for llm in (sql, ambiguity, default)}) == 1
+        
+        override = LLMFactory.create_llm("llama3:latest", num_predict=64, stage="sql_generation")
+        assert override.llm.options["num_predict"] == 64
+        assert override.llm.options["temperature"] == Settings.TEMPERATURE
+    finally:
+        LLMFactory.configure(*previous)
+    
+    print("✅ Generation profiles test passed")
+
+
+def test_sql_normalizer():
+    """Test exact-match normalization of equivalent SQL"""
+    from benchmarks.sql_normalizer import canonical_form, exact_match, exact_match_batch
+    
+    gold = "SELECT count(*) FROM singer"
+    assert exact_match("select COUNT( * ) from singer;", gold)
+    assert exact_match("SELECT T1.name AS n FROM singer AS T1", "SELECT name FROM singer")
+    assert not exact_match("SELECT name FROM singer", gold)
+    assert exact_match_batch([(gold, gold), ("SELECT 1", gold)]) == [True, False]
+    assert canonical_form(gold) is canonical_form(gold)  # memoized
+    print("✅ SQL normalizer test passed")
+
+
+def test_result_compare():
+    """Test streamed result comparison for execution accuracy"""
+    from benchmarks.result_compare import batched, results_match
+    
+    gold = [(1, None), ("a", 0.1 + 0.2), (None, 3)]
+    shuffled = [(None, 3), (1, None), ("a", 0.3)]
+    
+    assert results_match(batched(shuffled, 2), batched(gold, 2))
+    assert not results_match(batched(shuffled, 2), batched(gold, 2), ordered=True)
+    assert not results_match(batched(shuffled[:2], 2), batched(gold, 2))
+    assert not results_match(batched(gold + gold[:1], 2), batched(gold + gold[1:2], 2))
+    print("✅ Result comparison test passed")
+
+
+def make_spider_fixture(data_path: str) -> str:
+    """Create a one-database Spider layout ("shop") and return the database path"""
+    import sqlite3
+    
+    db_dir = os.path.join(data_path, "spider_data", "spider_data", "database", "shop")
+    os.makedirs(db_dir, exist_ok=True)
+    db_path = os.path.join(db_dir, "shop.sqlite")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, price REAL)")
+    conn.executemany("INSERT INTO items VALUES (?, ?, ?)", [(1, "pen", 1.5), (2, "book", 12.0), (3, "lamp", 30.0)])
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def spider_record(index: int, predicted_sql, gold_sql: str = "SELECT COUNT(*) FROM items",
+                  db_id: str = "shop", **fields) -> dict:
+    """Per-example benchmark record as written by SpiderBenchmark.evaluate_example"""
+    record = {
+        "index": index, "db_id": db_id, "question": "How many items?", "gold_sql": gold_sql,
+        "model": "stub", "strategy": "zero_shot", "schema_format": "verbose",
+        "predicted_sql": predicted_sql, "exact_match": False, "execution_match": False,
+        "skipped": False, "error": None, "latency": 1.0, "attempts": 1,
+        "prompt_tokens": 0, "completion_tokens": 0, "eval_time": 0.0, "stage_times": {}
+    }
+    record.update(fields)
+    return record
+
+
+def test_spider_rescore():
+    """Test rescoring saved predictions, including a truncated file and a changed database"""
+    import json
+    import tempfile
+    from benchmarks.gold_cache import GoldResultCache
+    from benchmarks.spider_benchmark import SpiderBenchmark, _rescore_group
+    
+    data_path = tempfile.mkdtemp()
+    db_path = make_spider_fixture(data_path)
+    cache_dir = os.path.join(data_path, "cache", "gold")
+    predictions_path = os.path.join(data_path, "predictions.jsonl")
+    records = [
+        spider_record(0, "select count(*) from items;"),
+        spider_record(1, "SELECT 3"),
+        spider_record(2, None),
+        spider_record(3, "SELECT 1", db_id="missing")
+    ]
+    with open(predictions_path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(json.dumps(spider_record(4, "SELECT 1"))[:40])  # run died mid-write
+    
+    benchmark = SpiderBenchmark(data_path=data_path)
+    result = benchmark.rescore(predictions_path, workers=1)
+    with open(result["output"]) as f:
+        rescored = [json.loads(line) for line in f]
+    
+    assert [r["index"] for r in rescored] == [0, 1, 2, 3]
+    assert [(r["exact_match"], r["execution_match"]) for r in rescored] == [
+        (True, True), (False, True), (False, False), (False, False)
+    ]
+    assert rescored[3]["skipped"]
+    assert result["summary"]["stub/zero_shot"]["execution_accuracy"] == 50
+    
+    # Gold results are cached per database until the file changes
+    cache = GoldResultCache(cache_dir, "shop", db_path)
+    assert cache.results["SELECT COUNT(*) FROM items"][0][1] == [[3]]
+    
+    conn = DatabaseConnection(db_path)
+    conn.connect()
+    conn.connection.execute("INSERT INTO items VALUES (4, 'mug', 8.0)")
+    conn.connection.commit()
+    conn.disconnect()
+    stat = os.stat(db_path)
+    os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))  # coarse file system clocks
+    
+    assert GoldResultCache(cache_dir, "shop", db_path).results == {}
+    rescored = _rescore_group(data_path, cache_dir, "shop", [spider_record(1, "SELECT 3")])
+    assert not rescored[0]["execution_match"]
+    assert GoldResultCache(cache_dir, "shop", db_path).results["SELECT COUNT(*) FROM items"][0][1] == [[4]]
+    print("✅ Spider rescore test passed")
+
+
+def test_benchmark_checkpoint():
+    """Test appending, resuming and recovering a benchmark checkpoint"""
+    import tempfile
+    from benchmarks.checkpoint import BenchmarkCheckpoint
+    
+    path = os.path.join(tempfile.mkdtemp(), "reports", "spider.checkpoint.jsonl")
+    checkpoint = BenchmarkCheckpoint(path)
+    checkpoint.append(spider_record(0, "SELECT 1"))
+    checkpoint.append(spider_record(1, "SELECT 2"))
+    checkpoint.append(spider_record(0, "SELECT 1", strategy="few_shot"))
+    
+    # Reopening with resume keeps finished examples, so a run can skip them
+    resumed = BenchmarkCheckpoint(path, resume=True)
+    assert len(resumed) == 3
+    assert resumed.get(1, "stub", "zero_shot")["predicted_sql"] == "SELECT 2"
+    assert resumed.get(0, "stub", "few_shot") is not None
+    assert resumed.get(2, "stub", "zero_shot") is None
+    
+    # A crash mid-write leaves a partial line, which is dropped and cut off
+    with open(path, 'a') as f:
+        f.write('{"index": 2, "model": "st')
+    resumed = BenchmarkCheckpoint(path, resume=True)
+    assert len(resumed) == 3 and resumed.get(2, "stub", "zero_shot") is None
+    resumed.append(spider_record(2, "SELECT 3"))
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 4 and BenchmarkCheckpoint.read(path)[(2, "stub", "zero_shot")]["predicted_sql"] == "SELECT 3"
+    
+    # Without resume the run starts over
+    assert len(BenchmarkCheckpoint(path)) == 0 and not os.path.exists(path)
+    print("✅ Benchmark checkpoint test passed")
+
+
+def test_spider_matrix():
+    """Test that the model x strategy matrix runs each gold query once per example"""
+    import json
+    import tempfile
+    from benchmarks import spider_benchmark
+    from src.llm.metered_llm import MeteredLLM
+    
+    data_path = tempfile.mkdtemp()
+    make_spider_fixture(data_path)
+    gold = "SELECT COUNT(*) FROM items"
+    dataset = [{"db_id": "shop", "question": "How many items?", "query": gold},
+               {"db_id": "shop", "question": "How many items are there?", "query": gold}]
+    with open(os.path.join(data_path, "dev.json"), 'w') as f:
+        json.dump(dataset, f)
+    
+    completions = {"good": "select count(*) from items", "bad": "SELECT name FROM items"}
+    gold_runs = []
+    
+    class CountingConnection(DatabaseConnection):
+        def execute_query(self, query, *args, **kwargs):
+            if query == gold:
+                gold_runs.append(query)
+            return super().execute_query(query, *args, **kwargs)
+    
+    def stub_chain(*args, model_name=None, **kwargs):
+        chain = real_chain(*args, model_name=model_name, **kwargs)
+        chain.generator.llm = MeteredLLM(StubLLM(completions[model_name]), model_name)
+        chain.summarizer.llm = MeteredLLM(StubLLM("3 items."), model_name)
+        return chain
+    
+    real_chain = spider_benchmark.TextToSQLChain
+    real_connection = spider_benchmark.DatabaseConnection
+    spider_benchmark.TextToSQLChain, spider_benchmark.DatabaseConnection = stub_chain, CountingConnection
+    try:
+        benchmark = spider_benchmark.SpiderBenchmark(data_path=data_path)
+        result = benchmark.run_matrix(["good", "bad"], ["zero_shot", "few_shot"])
+        assert len(gold_runs) == len(dataset)
+        
+        records = benchmark.results
+        assert sorted((r["index"], r["model"], r["strategy"]) for r in records) == sorted(
+            (idx, model, strategy) for idx in range(2) for model in completions
+            for strategy in ("zero_shot", "few_shot")
+        )
+        summary = result["summary"]
+        assert set(summary) == {"bad/few_shot", "bad/zero_shot", "good/few_shot", "good/zero_shot"}
+        assert summary["good/zero_shot"]["execution_accuracy"] == 100
+        assert summary["good/few_shot"]["exact_match_accuracy"] == 100
+        assert summary["bad/zero_shot"]["execution_accuracy"] == 0
+        
+        # Resuming a finished matrix reuses every record and runs nothing
+        resumed = benchmark.run_matrix(["good", "bad"], ["zero_shot", "few_shot"], resume=True)
+        assert len(gold_runs) == len(dataset) and len(benchmark.results) == 8
+        assert resumed["summary"] == summary
+    finally:
+        spider_benchmark.TextToSQLChain, spider_benchmark.DatabaseConnection = real_chain, real_connection
+    print("✅ Spider matrix test passed")
+
+
+def test_spider_report():
+    """Test the benchmark aggregates, the JSON/CSV report and chain cleanup on errors"""
+    import csv
+    import json
+    import tempfile
+    from benchmarks import spider_benchmark
+    from benchmarks.spider_benchmark import SpiderBenchmark
+    
+    records = [
+        spider_record(idx, "SELECT 1", latency=float(idx + 1), exact_match=idx < 4,
+                      execution_match=idx < 5, stage_times={"llm": 0.5, "execution": 0.25})
+        for idx in range(20)
+    ]
+    records.append(spider_record(20, None, latency=None, skipped=True, error="Database not found"))
+    
+    entry = SpiderBenchmark.summarize_records(records)["stub/zero_shot"]
+    assert entry["total_samples"] == 21
+    assert entry["latency_p50"] == 10.0 and entry["latency_p95"] == 19.0
+    assert entry["latency_mean"] == 210 / 20
+    assert entry["throughput"] == 20 / 210  # examples per second of generation
+    assert entry["accuracy_per_second"] == 5 / 210
+    assert entry["execution_accuracy"] == 5 / 21 * 100 and entry["exact_match_accuracy"] == 4 / 21 * 100
+    assert entry["stage_times_mean"] == {"llm": 0.5, "execution": 0.25}
+    
+    report_dir = os.path.join(tempfile.mkdtemp(), "reports")
+    paths = SpiderBenchmark.write_report(records, {"stub/zero_shot": entry}, report_dir, "run")
+    with open(paths["json"]) as f:
+        report = json.load(f)
+    assert report["summary"]["stub/zero_shot"] == entry and len(report["examples"]) == 21
+    with open(paths["csv"], newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 21 and rows[0]["stage_llm"] == "0.5" and rows[0]["latency"] == "1.0"
+    assert rows[20]["error"] == "Database not found" and rows[20]["stage_llm"] == ""
+    
+    # A chain the example opened is closed even when the run fails
+    data_path = tempfile.mkdtemp()
+    make_spider_fixture(data_path)
+    closed = []
+    
+    class FailingChain:
+        def __init__(self, *args, **kwargs):
+            pass
+        
+        def run(self, *args, **kwargs):
+            raise RuntimeError("Ollama is not running")
+        
+        def close(self):
+            closed.append(True)
+    
+    real_chain = spider_benchmark.TextToSQLChain
+    spider_benchmark.TextToSQLChain = FailingChain
+    try:
+        example = {"db_id": "shop", "question": "How many items?", "query": "SELECT COUNT(*) FROM items"}
+        record = SpiderBenchmark(data_path=data_path).evaluate_example(0, example, 1)
+    finally:
+        spider_benchmark.TextToSQLChain = real_chain
+    assert record["error"] == "Ollama is not running" and closed == [True]
+    print("✅ Spider report test passed")
+
+
+def test_columnar_results():
+    """Test columnar query results against the row-list format"""
+    db = DatabaseConnection()
+    query = "SELECT id, name, salary FROM employees ORDER BY id"
+    (columns, rows), error = db.execute_query(query)
+    (_, columnar), columnar_error = db.execute_query(query, columnar=True)
+    
+    assert error is None and columnar_error is None
+    assert len(columnar) == len(rows)
+    assert columnar.to_rows() == rows
+    assert list(columnar[:2]) == [tuple(row) for row in rows[:2]]
+    assert columnar.column("id").typecode == "q"
+    assert columnar.to_dataframe()["name"].tolist() == [row[1] for row in rows]
+    assert columnar.to_dict()["columns"] == columns
+    
+    # Joins can return several columns with the same name
+    join = ("SELECT e.id, e.name, d.id, d.name FROM employees e "
+            "JOIN departments d ON d.id = e.department_id ORDER BY e.id")
+    (columns, rows), _ = db.execute_query(join)
+    df = db.execute_query(join, columnar=True)[0][1].to_dataframe()
+    assert list(df.columns) == columns == ["id", "name", "id", "name"]
+    assert df.values.tolist() == rows
+    db.disconnect()
+    print("✅ Columnar results test passed")
+
+
+def test_result_pager():
+    """Test cached and re-queried result pages"""
+    from src.query.pager import ResultPager
+    
+    db = DatabaseConnection()
+    query = "SELECT id FROM employees ORDER BY id;"
+    (columns, rows), _ = db.execute_query(query, columnar=True)
+    
+    cached = ResultPager(db, query, columns, rows, page_size=3)
+    requeried = ResultPager(db, query, columns, rows, page_size=3, max_cached_rows=2)
+    counted = ResultPager(db, query, columns, page_size=3)
+    
+    assert cached.cached and not requeried.cached
+    assert counted.total_rows == len(rows) and cached.num_pages == 3
+    for page in (1, 2, 3):
+        assert list(cached.page(page)[1]) == list(requeried.page(page)[1])
+    page, last_rows = requeried.page(99)
+    assert page == 3 and list(last_rows) == [(7,)]
+    assert cached.describe(2) == "Rows 4-6 of 7 (page 2 of 3)"
+    
+    # A trailing line comment does not swallow the wrapping parenthesis
+    commented = ResultPager(db, "SELECT id FROM employees ORDER BY id -- all of them", columns,
+                            page_size=3, max_cached_rows=0)
+    assert commented.total_rows == 7 and list(commented.page(3)[1]) == [(7,)]
+    db.disconnect()
+    print("✅ Result pager test passed")
+
+
+def test_web_result_paging():
+    """Test that the web UI reads at most WEB_MAX_CACHED_ROWS + 1 rows of a large result"""
+    import tempfile
+    from config.settings import Settings
+    from src.chain.text_to_sql_chain import TextToSQLChain
+    from src.interfaces.web import WebInterface, export_dir
+    from src.llm.metered_llm import MeteredLLM
+    
+    db = DatabaseConnection(os.path.join(tempfile.mkdtemp(), "paging.db"))
+    db.connect()
+    db.connection.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+    db.connection.executemany("INSERT INTO t VALUES (?, ?)", [(i, f"row {i}") for i in range(1, 251)])
+    db.connection.commit()
+    
+    fetched = {}  # query -> rows read
+    iter_query = db.iter_query
+    
+    def counting_iter_query(query, batch_size=None):
+        columns, batches = iter_query(query, batch_size)
+        
+        def counted():
+            for batch in batches:
+                fetched[query] = fetched.get(query, 0) + len(batch)
+                yield batch
+        return columns, counted()
+    
+    db.iter_query = counting_iter_query
+    saved = Settings.WEB_MAX_CACHED_ROWS, Settings.WEB_PAGE_SIZE
+    Settings.WEB_MAX_CACHED_ROWS, Settings.WEB_PAGE_SIZE = 100, 40
+    try:
+        web = WebInterface.__new__(WebInterface)
+        web.chain = TextToSQLChain(db_connection=db)
+        web.chain.generator.llm = MeteredLLM(StubLLM("SELECT * FROM t ORDER BY id"), "stub")
+        web.chain.summarizer.llm = MeteredLLM(StubLLM("250 rows."), "stub")
+        
+        outputs = web.process_question("Show every row", False, False)
+        assert len(outputs) == 7
+        sql, summary, status, df, pager, page_info, page = outputs
+        assert sql == "SELECT * FROM t ORDER BY id" and summary == "250 rows."
+        # The result itself, then page 1 re-read with LIMIT/OFFSET
+        assert fetched["SELECT * FROM t ORDER BY id"] == 101
+        assert max(fetched.values()) <= 101
+        assert not pager.cached and pager.total_rows == 250
+        assert len(df) == 40 and page == 1 and page_info == "Rows 1-40 of 250 (page 1 of 7)"
+        
+        df, page_info, page = web.show_page(pager, 3)
+        assert page == 3 and df["id"].tolist() == list(range(81, 121))
+        assert web.show_page(None, 2) == (None, "", 1)
+        assert web.process_question("", False, False)[0] == "Please enter a question."
+        
+        # Small results stay cached in the pager
+        web.chain.generator.llm = MeteredLLM(StubLLM("SELECT * FROM t WHERE id <= 5"), "stub")
+        pager = web.process_question("Show five rows", False, False)[4]
+        assert pager.cached and pager.total_rows == 5
+        
+        # Exports share one directory and old ones are cleaned up
+        first, status = web.export_results(pager, "csv")
+        second, _ = web.export_results(pager, "csv")
+        assert status == "💾 Exported 5 row(s) as CSV"
+        assert first != second and os.path.dirname(first) == os.path.dirname(second) == export_dir()
+        os.utime(first, (0, 0))
+        third, _ = web.export_results(pager, "jsonl")
+        assert not os.path.exists(first) and os.path.exists(second) and os.path.exists(third)
+        web.chain.close()
+    finally:
+        Settings.WEB_MAX_CACHED_ROWS, Settings.WEB_PAGE_SIZE = saved
+    print("✅ Web result paging test passed")
+
+
+def test_query_export():
+    """Test streaming export to CSV and JSONL"""
+    import csv
+    import json
+    import tempfile
+    from src.query.exporter import QueryExporter
+    
+    db = DatabaseConnection()
+    exporter = QueryExporter(db)
+    query = "SELECT id, name, salary FROM employees ORDER BY id"
+    (columns, rows), _ = db.execute_query(query)
+    work_dir = tempfile.mkdtemp()
+    
+    csv_path = os.path.join(work_dir, "out.csv")
+    assert exporter.export(query, csv_path, batch_size=2) == len(rows)
+    with open(csv_path, newline="") as f:
+        exported = list(csv.reader(f))
+    assert exported[0] == columns
+    assert [row[1] for row in exported[1:]] == [row[1] for row in rows]
+    
+    jsonl_path = os.path.join(work_dir, "out.jsonl")
+    assert exporter.export(query, jsonl_path, batch_size=2) == len(rows)
+    with open(jsonl_path) as f:
+        assert [json.loads(line) for line in f] == [dict(zip(columns, row)) for row in rows]
+    
+    try:
+        exporter.export(query, os.path.join(work_dir, "out.xlsx"))
+        assert False, "Should have raised ValueError"
+    except ValueError:
+        pass
+    
+    # The CLI reads only the rows it prints; the export streams all of them
+    import contextlib
+    import io
+    from src.chain.text_to_sql_chain import TextToSQLChain
+    from src.interfaces.cli import CLI
+    from src.llm.metered_llm import MeteredLLM
+    
+    cli = CLI.__new__(CLI)
+    cli.DISPLAY_ROWS = 3
+    cli.chain = TextToSQLChain(db_connection=db)
+    cli.exporter = QueryExporter(db)
+    cli.chain.generator.llm = MeteredLLM(StubLLM(query), "stub")
+    summarizer = RecordingStubLLM("Seven employees.")
+    cli.chain.summarizer.llm = MeteredLLM(summarizer, "stub")
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        cli.run_single_query("List the employees", export_path=csv_path)
+    assert "Found more than 3 result(s)" in summarizer.prompts[0]
+    assert "Results (first 3 row(s))" in output.getvalue()
+    assert "more rows were not loaded" in output.getvalue()
+    assert f"Exported {len(rows)} row(s)" in output.getvalue()
+    cli.chain.close()
+    db.disconnect()
+    print("✅ Query export test passed")
+
+
+def test_column_profiler():
+    """Test column statistics in the schema text"""
+    import tempfile
+    from src.database.profiler import ColumnProfiler
+    
+    db_path = os.path.join(tempfile.mkdtemp(), "profiled.db")
+    db = DatabaseConnection(db_path)
+    assert "values:" not in db.get_schema()
+    
+    profiler = db.start_profiler(background=False)
+    schema = db.get_schema()
+    assert "status TEXT [values: 'active', 'completed']" in schema
+    assert "salary REAL [7 distinct, 60000.0..95000.0]" in schema
+    
+    # The sidecar file is reused by the next profiler
+    reloaded = ColumnProfiler(db_path)
+    reloaded.start(background=False)
+    assert reloaded.profile == profiler.profile
+    
+    # Value lists come from the sampled rows only, like the other statistics
+    sampled = ColumnProfiler(db_path, cache_path=db_path + ".sampled.json", sample_rows=3)
+    sampled.start(background=False)
+    names = sampled.profile["tables"]["employees"]["name"]
+    assert names["sampled"] and len(names["values"]) == 3
+    db.disconnect()
+    print("✅ Column profiler test passed")
+
+
+def test_value_index_hints():
+    """Test that cell values in the question become column hints in the prompt"""
+    import tempfile
+    from src.chain.text_to_sql_chain import TextToSQLChain
+    from src.database.value_index import ValueIndex
+    from src.llm.metered_llm import MeteredLLM
+    
+    index = ValueIndex()
+    index.add("projects", "name", ["Website Redesign", "Mobile App"])
+    index.add("projects", "status", ["active"])
+    assert index.lookup("Is the website redesign project ACTIVE?") == [
+        ("Website Redesign", "projects", "name"), ("active", "projects", "status")
+    ]
+    assert index.lookup("How many websites are there?") == []
+    
+    db = DatabaseConnection(os.path.join(tempfile.mkdtemp(), "hints.db"))
+    db.start_profiler(background=False)
+    chain = TextToSQLChain(db_connection=db)
+    generator_llm = RecordingStubLLM("SELECT COUNT(*) FROM employees")
+    chain.generator.llm = MeteredLLM(generator_llm, "stub")
+    chain.summarizer.llm = MeteredLLM(StubLLM("There are 3 employees."), "stub")
+    
+    chain.run("How many employees work in Engineering?", use_feedback_learning=False)
+    db.disconnect()
+    assert "- 'Engineering' is a value of departments.name" in generator_llm.prompts[-1]
+    print("✅ Value index hints test passed")
+
+
+def test_join_graph_hints():
+    """Test foreign-key join paths in the schema and in prompt hints"""
+    import sqlite3
+    import tempfile
+    from src.database.join_graph import ForeignKey, JoinGraph
+    
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE countries (code TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE cities (id INTEGER PRIMARY KEY, country_code TEXT REFERENCES countries);
+        CREATE TABLE airports (id INTEGER PRIMARY KEY, city_id INTEGER REFERENCES cities(id));
+        CREATE TABLE notes (id INTEGER PRIMARY KEY);
+    """)
+    graph = JoinGraph.from_connection(conn)
+    conn.close()
+    
+    assert graph.references[("cities", "country_code")] == "countries.code"
+    assert [key.condition() for key in graph.shortest_path("airports", "countries")] == [
+        "airports.city_id = cities.id", "cities.country_code = countries.code"
+    ]
+    assert graph.shortest_path("notes", "cities") is None
+    assert graph.mentioned_tables("Which airports are in a country starting with F?") == {"airports", "countries"}
+    assert graph.join_hints({"airports", "countries", "notes"}) == [
+        "- To join airports and countries: airports.city_id = cities.id, cities.country_code = countries.code"
+    ]
+    
+    # Targets match table names case-insensitively; odd names are quoted in hints
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE student (stuid INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE "has pet" (stuid INTEGER REFERENCES Student(StuID));
+    """)
+    graph = JoinGraph.from_connection(conn)
+    assert graph.references[("has pet", "stuid")] == "student.StuID"
+    hint = graph.join_hints({"student", "has pet"})[0]
+    assert hint == '- To join has pet and student: "has pet".stuid = student.StuID'
+    conn.execute(f"SELECT * FROM \"has pet\" JOIN student ON {hint.split(': ')[1]}")
+    conn.close()
+    assert ForeignKey("order", "group", [("key", "id")]).condition() == '"order"."key" = "group".id'
+    
+    # Sample database: references in the schema, join path in the hints
+    from src.chain.text_to_sql_chain import TextToSQLChain
+    db = DatabaseConnection(os.path.join(tempfile.mkdtemp(), "joins.db"))
+    assert "department_id INTEGER (REFERENCES departments.id)" in db.get_schema()
+    assert db.get_schema_dict()["projects"][2]["references"] == "departments.id"
+    
+    chain = TextToSQLChain(db_connection=db)
+    hints = chain.get_schema_hints("Which employees work on the Website Redesign project?")
+    db.disconnect()
+    assert "- To join employees and projects: employees.department_id = departments.id, " \
+           "projects.department_id = departments.id" in hints
+    print("✅ Join graph hints test passed")
+
+
+def test_schema_formats():
+    """Test the compact and DDL schema encodings"""
+    import sqlite3
+    import tempfile
+    
+    db_path = os.path.join(tempfile.mkdtemp(), "formats.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE singer (id INTEGER PRIMARY KEY, "Home Town" varchar(50));
+        CREATE TABLE song (singer_id INTEGER REFERENCES singer(id), title TEXT,
+                           PRIMARY KEY (singer_id, title));
+    """)
+    conn.close()
+    
+    db = DatabaseConnection(db_path)
+    assert db.get_schema() == db.get_schema("verbose")
+    assert db.get_schema("compact") == (
+        'singer(id:int*, "Home Town":varchar)\n\n'
+        'song(singer_id:int*->singer.id, title:text*)\n\n'
+    )
+    ddl = db.get_schema("ddl")
+    assert ddl == (
+        'CREATE TABLE singer (id INTEGER PRIMARY KEY, "Home Town" varchar);\n\n'
+        'CREATE TABLE song (singer_id INTEGER REFERENCES singer(id), title TEXT, '
+        'PRIMARY KEY (singer_id, title));\n\n'
+    )
+    sqlite3.connect(":memory:").executescript(ddl)  # the DDL is valid SQLite
+    
+    # Sample values cannot close the hint comment
+    from src.database.schema_format import format_schema
+    hinted = format_schema([("t", [("v", "TEXT", 0, None, "values: 'a */ DROP TABLE t; /*'")])], "ddl")
+    assert hinted.count("*/") == 1 and hinted.rstrip().endswith("*/);")
+    sqlite3.connect(":memory:").executescript(hinted)
+    
+    try:
+        db.get_schema("yaml")
+        assert False, "Unknown schema format should raise"
+    except ValueError:
+        pass
+    db.disconnect()
+    print("✅ Schema formats test passed")
+
+
+def test_chain_manager():
+    """Test routing by database id with LRU eviction and per-database feedback"""
+    import tempfile
+    from src.chain.chain_manager import ChainManager
+    from src.llm.metered_llm import MeteredLLM
+    
+    work_dir = tempfile.mkdtemp()
+    for db_id in ("alpha", "beta", "gamma"):
+        DatabaseConnection(os.path.join(work_dir, f"{db_id}.db"))
+    
+    manager = ChainManager(database_dir=work_dir, max_databases=2,
+                           feedback_dir=os.path.join(work_dir, "feedback"))
+    
+    with manager.chain("alpha") as chain:
+        assert chain.db.db_path == os.path.join(work_dir, "alpha.db")
+        chain.generator.llm = MeteredLLM(StubLLM("SELECT COUNT(*) FROM employees"), "stub")
+        chain.summarizer.llm = MeteredLLM(StubLLM("There are 7 employees."), "stub")
+    result = manager.run("alpha", "How many employees are there?")
+    assert result["results"]["rows"] == [[7]]
+    assert manager.feedback_handler("alpha").db_path == os.path.join(work_dir, "feedback", "alpha.db")
+    
+    # Warm chains are reused; the least recently used one is closed
+    with manager.chain("beta"):
+        pass
+    with manager.chain("gamma"):
+        pass
+    stats = manager.stats()
+    assert stats["databases"] == ["beta", "gamma"]
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+    
+    # Chains in use are never evicted, even over the byte budget
+    manager.max_bytes = 1
+    with manager.chain("beta"):
+        with manager.chain("alpha"):
+            assert manager.stats()["databases"] == ["beta", "alpha"]
+        assert manager.stats()["databases"] == ["beta"]
+    assert manager.stats()["databases"] == []
+    
+    # Requests to one database take turns on its chain
+    import threading
+    import time
+    active, peak = [], []
+    
+    def borrow():
+        with manager.chain("alpha"):
+            active.append(1)
+            peak.append(len(active))
+            time.sleep(0.01)
+            active.pop()
+    
+    threads = [threading.Thread(target=borrow) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 1 and len(peak) == 4
+    
+    for bad_id in ("missing", "../alpha"):
+        try:
+            manager.resolve(bad_id)
+            assert False, f"{bad_id} should not resolve"
+        except ValueError:
+            pass
+    manager.close()
+    print("✅ Chain manager test passed")
+
+
+def test_prompt_prefix_stability():
+    """Test that SQL prompts for one database share the instructions-and-schema prefix"""
+    import tempfile
+    from src.handlers.feedback_handler import FeedbackHandler
+    from src.llm.metered_llm import MeteredLLM
+    from src.query.generator import QueryGenerator
+    
+    feedback = FeedbackHandler(os.path.join(tempfile.mkdtemp(), "feedback.db"))
+    for idx in range(3):
+        feedback.add_feedback(f"How many employees are in department {idx}?",
+                              f"SELECT COUNT(*) FROM employees WHERE department_id = {idx}", 5)
+    
+    generator = QueryGenerator(feedback_handler=feedback)
+    llm = RecordingStubLLM("SELECT 1")
+    generator.llm = MeteredLLM(llm, "stub")
+    
+    db = DatabaseConnection(os.path.join(tempfile.mkdtemp(), "prefix.db"))
+    schema = db.get_schema()
+    db.disconnect()
+    prefix = generator.prompt_templates.SQL_PREFIX.format(schema=schema).rstrip()
+    
+    generator.generate("How many employees are there?", schema)
+    generator.generate("List all departments", schema, hints=["- 'HR' is a value of departments.name"])
+    generator.regenerate_with_error("List all departments", schema, "SELECT * FROM department",
+                                    "no such table: department")
+    assert all(prompt.startswith(prefix) for prompt in llm.prompts)
+    assert llm.prompts[0].rindex("Here are some examples") > len(prefix)
+    
+    # Wide schemas are cut to their own budget, not to what the question leaves over
+    from config.settings import Settings
+    wide_schema = "\n\n".join(f"Table: t{idx}\n  - id INTEGER\n  - name TEXT" for idx in range(200))
+    saved = Settings.PROMPT_SCHEMA_TOKEN_BUDGET
+    Settings.PROMPT_SCHEMA_TOKEN_BUDGET = 1000
+    try:
+        generator.generate("How many rows are in t0?", wide_schema, use_feedback_learning=False)
+        generator.generate("List the names in t1 " + "and t2 " * 300, wide_schema,
+                           hints=["- 'x' is a value of t1.name"] * 20)
+        generator.regenerate_with_error("List t1", wide_schema, "SELECT * FROM t", "no such table: t")
+    finally:
+        Settings.PROMPT_SCHEMA_TOKEN_BUDGET = saved
+    wide_prefix = llm.prompts[-3][:llm.prompts[-3].index("Question:")]
+    assert "Table: t0" in wide_prefix and "Table: t199" not in wide_prefix
+    assert all(prompt.startswith(wide_prefix) for prompt in llm.prompts[-2:])
+    
+    # Feedback goes before the real question only, not into the few-shot examples
+    generator.generate("How many employees are there?", schema, use_few_shot=True)
+    assert llm.prompts[-1].count("Here are some examples of good queries") == 1
+    assert llm.prompts[-1].index("Here are some examples of good queries") > llm.prompts[-1].index(schema.strip())
+    print("✅ Prompt prefix stability test passed")
+
+
+def test_streaming_sql_extraction():
+    """Test that SQL generation stops reading the stream once the statement is complete"""
+    from src.llm.metered_llm import MeteredLLM
+    from src.query.generator import QueryGenerator
+    from src.query.sql_extractor import StreamingSQLExtractor, extract_sql
+    
+    completion = (
+        "Let's think step by step.\n1. Select the name column of employees\n\n"
+        "```sql\nSELECT name FROM employees WHERE dept = 'R;D' AND id IN (SELECT 1);\n```\n"
+        "This query returns the names of the employees in R;D."
+    )
+    
+    class StreamingStubLLM:
+        def __init__(self, text: str):
+            self.text = text
+            self.sent = 0
+            self.closed = False
+        
+        def stream(self, prompt, config=None):
+            try:
+                for start in range(0, len(self.text), 3):
+                    self.sent += 1
+                    yield self.text[start:start + 3]
+            finally:
+                self.closed = True
+    
+    # Chunk boundaries never change the statement found
+    expected = "SELECT name FROM employees WHERE dept = 'R;D' AND id IN (SELECT 1);"
+    assert extract_sql(completion) == expected
+    for size in (1, 2, 7):
+        extractor = StreamingSQLExtractor()
+        for start in range(0, len(completion), size):
+            if extractor.feed(completion[start:start + size]):
+                break
+        assert extractor.finish() == expected
+    
+    # Prose, code blocks without SQL and unterminated statements
+    assert extract_sql("```\nStep 1\n```\n```sql\nselect 1\n```") == "select 1\n"
+    assert extract_sql("SELECT a FROM t") == "SELECT a FROM t"
+    assert extract_sql("I don't know.") == "I don't know."
+    
+    # A first line of prose that starts like SQL gives way to the code block after it
+    for opener in ("Select the names of all employees.", "With a join: the employees' names"):
+        prose_first = f"{opener}\n```sql\nSELECT name FROM employees;\n```"
+        assert extract_sql(prose_first) == "SELECT name FROM employees;"
+        extractor = StreamingSQLExtractor()
+        for char in prose_first:
+            if extractor.feed(char):
+                break
+        assert extractor.sql == "SELECT name FROM employees;"
+    
+    llm = StreamingStubLLM(completion)
+    generator = QueryGenerator()
+    generator.llm = MeteredLLM(llm, "stub")
+    llm_metrics = {}
+    sql = generator.generate("Names in R;D?", "Table: employees", use_chain_of_thought=True,
+                             use_feedback_learning=False, llm_metrics=llm_metrics)
+    
+    assert sql == expected
+    assert llm.closed and llm.sent < -(-len(completion) // 3)
+    assert llm_metrics["cancelled"] is True
+    assert llm_metrics["completion_tokens"] == llm.sent
+    assert llm_metrics["ttft"] == llm_metrics["client_ttft"]
+    
+    # Model comparison stops reading at the statement's end too
+    from src.llm.llm_comparator import LLMComparator
+    from src.llm.llm_factory import LLMFactory
+    
+    llm = StreamingStubLLM(completion)
+    create_llm = LLMFactory.__dict__["create_llm"]
+    LLMFactory.create_llm = staticmethod(lambda *args, **kwargs: MeteredLLM(llm, "stub"))
+    try:
+        comparator = LLMComparator.__new__(LLMComparator)
+        comparator.models = ["stub"]
+        result = comparator.compare_models("Names in R;D?", "Table: employees")["stub"]
+    finally:
+        LLMFactory.create_llm = create_llm
+    assert result["success"] and result["query"] == expected
+    assert llm.closed and llm.sent < -(-len(completion) // 3)
+    
+    print("✅ Streaming SQL extraction test passed")
+
+
+def test_cost_guard():
+    """Test that expensive plans are rejected, limited or regenerated before execution"""
+    import sqlite3
+    import tempfile
+    from src.chain.text_to_sql_chain import TextToSQLChain
+    from src.llm.metered_llm import MeteredLLM
+    from src.query.cost_guard import QueryCostGuard, _TABLE_REFERENCE
+    
+    class SequenceStubLLM:
+        def __init__(self, completions):
+            self.completions = list(completions)
+        
+        def invoke(self, prompt: str) -> str:
+            return self.completions.pop(0)
+    
+    db_path = os.path.join(tempfile.mkdtemp(), "orders.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id));
+    """)
+    conn.executemany("INSERT INTO customers VALUES (?, ?)", [(i, f"c{i}") for i in range(1, 2001)])
+    conn.executemany("INSERT INTO orders VALUES (?, ?)", [(i, i % 2000 + 1) for i in range(1, 2001)])
+    conn.commit()
+    conn.close()
+    
+    cross = "SELECT o.id, c.name FROM orders o, customers c"
+    joined = "SELECT o.id, c.name FROM orders o JOIN customers c ON c.id = o.customer_id"
+    db = DatabaseConnection(db_path)
+    guard = QueryCostGuard(db, policy="reject", max_rows=100_000, large_table_rows=1000)
+    
+    decision = guard.check(cross)
+    assert decision["action"] == "reject"
+    assert decision["estimated_rows"] >= 2000 * 2000
+    assert any("customers is scanned in full" in issue for issue in decision["issues"])
+    assert guard.check(joined)["action"] == "allow"
+    assert guard.check(cross + " LIMIT 5")["reason"] == "bounded by its LIMIT"
+    
+    # Statistics from ANALYZE give the same row counts
+    db.connection.execute("ANALYZE")
+    assert guard.check(cross)["estimated_rows"] == decision["estimated_rows"] == 2000 * 2000
+    assert guard.check(joined)["estimated_rows"] == 2000
+    
+    limiter = QueryCostGuard(db, policy="limit", max_rows=100_000, limit=50)
+    limited = limiter.check(cross)
+    assert limited["action"] == "limit" and limited["query"].endswith("LIMIT 50")
+    assert len(db.execute_query(limited["query"])[0][1]) == 50
+    assert limiter.check("SELECT COUNT(*) FROM orders, customers")["action"] == "reject"
+    db.disconnect()
+    
+    with TextToSQLChain(db_path=db_path) as chain:
+        chain.cost_guard = QueryCostGuard(chain.db, policy="regenerate", max_rows=100_000)
+        chain.generator.llm = MeteredLLM(SequenceStubLLM([cross, joined]), "stub")
+        chain.summarizer.llm = MeteredLLM(StubLLM("2000 orders."), "stub")
+        result = chain.run("Which customer placed each order?", use_feedback_learning=False)
+    
+    assert len(result["attempts"]) == 2
+    assert "missing join condition" in result["attempts"][0]["error"]
+    assert result["attempts"][0]["cost_guard"]["action"] == "regenerate"
+    assert result["cost_guard"]["action"] == "allow"
+    assert result["sql_query"] == joined and len(result["results"]["rows"]) == 2000
+    
+    # Retries that stay too expensive report why the last query was blocked
+    with TextToSQLChain(db_path=db_path) as chain:
+        chain.cost_guard = QueryCostGuard(chain.db, policy="regenerate", max_rows=100_000)
+        chain.generator.llm = MeteredLLM(SequenceStubLLM([cross, cross]), "stub")
+        result = chain.run("Which customer placed each order?", max_retries=1, use_feedback_learning=False)
+    assert result["error"] == result["attempts"][-1]["cost_guard"]["reason"]
+    assert "missing join condition" in result["error"]
+    
+    # Clause keywords after a table name are not aliases
+    assert _TABLE_REFERENCE.findall("SELECT * FROM orders JOIN customers ON 1 LIMIT 5") == \
+        [("orders", ""), ("customers", "")]
+    assert _TABLE_REFERENCE.findall("SELECT * FROM orders o, customers AS c WHERE 1") == \
+        [("orders", "o"), ("customers", "c")]
+    
+    print("✅ Cost guard test passed")
+
+
 def test_end_to_end():
     """Test end-to-end query generation and execution"""
     try:
@@ -115,7 +1233,32 @@ if __name__ == "__main__":
         test_database_connection()
         test_sql_validator()
         test_query_executor()
+        test_lazy_imports()
         test_clean_sql()
+        test_llm_registry_reuses_clients()
+        test_chain_stage_timings()
+        test_extract_generation_metrics()
+        test_prompt_builder_budget()
+        test_llm_record_replay()
+        test_generation_profiles()
+        test_sql_normalizer()
+        test_result_compare()
+        test_spider_rescore()
+        test_benchmark_checkpoint()
+        test_spider_matrix()
+        test_spider_report()
+        test_columnar_results()
+        test_result_pager()
+        test_web_result_paging()
+        test_query_export()
+        test_column_profiler()
+        test_value_index_hints()
+        test_join_graph_hints()
+        test_schema_formats()
+        test_chain_manager()
+        test_prompt_prefix_stability()
+        test_streaming_sql_extraction()
+        test_cost_guard()
         test_end_to_end()
         
         print("\n" + "=" * 50)